@@ -1,27 +1,57 @@
 # -*- coding: utf-8 -*-
 import sys
-from PyQt5.QtWidgets import QApplication, QWidget, QMainWindow
-from PyQt5.QtCore import QFile, QTextStream
-from ui_lightcmdr import *
-import qdarktheme
-from modules import *
 import time
 
-start = time.time()
+start = time.perf_counter()
+
+import tracing
+
+# --trace <file.json>: record a Chrome trace of the session, written on exit
+TRACE_PATH = sys.argv[sys.argv.index("--trace") + 1] if "--trace" in sys.argv[:-1] else None
+if TRACE_PATH:
+    tracing.enable()
 
 def gtime():
-    return round(time.time() - start, 2)
+    return round(time.perf_counter() - start, 3)
+
+
+from PyQt5.QtWidgets import QApplication, QWidget, QMainWindow, QSplashScreen
+from PyQt5.QtGui import QPixmap, QColor
+from PyQt5.QtCore import QFile, QTextStream, QTimer, Qt
+from modules import *
 
+# Heavy subsystems are imported where they are first used; the prewarm thread below loads
+# them in the background so that first use is cheap
+PREWARM = ["numpy", "librosa", "OpenGL.GL", "res.render.audio", "res.compiler.compiler"]
+
+term(gtime(), "imports ok")
 
 app = QApplication(sys.argv)
+
+# Splash first so something is on screen before the stylesheet and main form are built
+pixmap = QPixmap("icons/lc-beta-icon.ico")
+if pixmap.isNull():
+    pixmap = QPixmap(320, 120)
+    pixmap.fill(QColor(25, 35, 45))
+splash = QSplashScreen(pixmap)
+splash.showMessage("LightCommander - loading...", Qt.AlignBottom | Qt.AlignHCenter, Qt.white)
+splash.show()
+app.processEvents()
+term(gtime(), "splash ok")
+
 #app.setStyleSheet(qdarktheme.load_stylesheet())
 term(gtime(), "Loading Stylesheet 'stylesheet.qss'")
 try:
-    file = QFile("stylesheet.qss")
-    file.open(QFile.ReadOnly | QFile.Text)
-    stream = QTextStream(file)
+    if "--raw-qss" in sys.argv:
+        file = QFile("stylesheet.qss")
+        file.open(QFile.ReadOnly | QFile.Text)
+        sheet = QTextStream(file).readAll()
+    else:
+        # minified to the classes the main window uses, cached in res/compiler/temp/qss/
+        from res.compiler.qss import stylesheet_for_ui
+        sheet = stylesheet_for_ui("stylesheet.qss", ["MapMaker/MapDesigner.ui"])
     term(gtime(), "Stylesheet Loaded")
-    app.setStyleSheet(stream.readAll())
+    app.setStyleSheet(sheet)
     term(gtime(), "Stylesheet Applied")
 except Exception as e:
     term(gtime(), "Stylesheet Error: " + str(e))
@@ -38,6 +68,7 @@ window.frameref = 0
 
 term(gtime(), "vset ok")
 try:
+    from ui_lightcmdr import Ui_MainWindow
     form = Ui_MainWindow()
     term(gtime(), "form ok")
 except Exception as e:
@@ -61,6 +92,7 @@ except Exception as e:
 
 
 window.show()
+splash.finish(window)
 
 term(gtime(), "starting window..")
 
@@ -70,5 +102,17 @@ statusMessage(window, "GENERAL", "OK  (User interaction pending)")
 
 term(gtime(), "Awaiting user input")
 
+if "--no-prewarm" not in sys.argv:
+    QTimer.singleShot(0, lambda: prewarm(
+        PREWARM, lambda name, sec, err: term(gtime(), f"prewarm {name} " + (f"error: {err}" if err else f"ok ({sec:.3f}s)"))))
+
+# used by test/startup.py to measure cold start
+if "--exit-after-start" in sys.argv:
+    QTimer.singleShot(0, lambda: term(gtime(), "first event loop pass"))
+    QTimer.singleShot(0, app.quit)
+
 
-sys.exit(app.exec_())
\ No newline at end of file
+code = app.exec_()
+if TRACE_PATH:
+    term(gtime(), "trace written to " + tracing.dump_chrome(TRACE_PATH))
+sys.exit(code)
@@ -1,36 +1,152 @@
 """"""
+import importlib
+import importlib.util
+import sys
+import threading
+import time
+
+import tracing
 from PyQt5.QtWidgets import QStatusBar, QLabel
-from PyQt5.QtCore import Qt  # Import Qt for alignment
+from PyQt5.QtCore import Qt, QTimer  # Import Qt for alignment
 
 
-def statusMessage(window, item_status_tip, other=None):
-    permanent_message_label = window.statusBar().findChild(QLabel, "permanentStatusLabel")
+STATUS_MAX_RATE = 10  # label updates per second
+
+
+class StatusModel:
+    """
+    State behind the permanent status-bar label (condition, frameref, item status).
+
+    set() only stores the fields; the label text is rendered and pushed at most `max_rate`
+    times per second (later changes inside the window are coalesced into one trailing
+    update) and not at all when the rendered text is unchanged.
+    """
+
+    def __init__(self, window, max_rate=STATUS_MAX_RATE):
+        self.window = window
+        self.condition = getattr(window, "condition", "")
+        self.frameref = getattr(window, "frameref", 0)
+        self.item_status = ""
+        self.other = None
+        self.interval = 1.0 / max_rate
+        self.pushes = 0
+        self._text = None
+        self._last_push = -1.0
+        self._label = self._make_label()
+        self._timer = QTimer(window)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self.flush)
 
-    if not permanent_message_label:
-        permanent_message_label = QLabel()
-        permanent_message_label.setMinimumWidth(100)
-        permanent_message_label.setObjectName("permanentStatusLabel")  # Give it a unique object name for easy retrieval
-        permanent_message_label.setAlignment(Qt.AlignLeft | Qt.AlignVCenter)  # Align to the LEFT
-        window.statusBar().addWidget(permanent_message_label)  # Use addWidget() for left alignment
-    current_temporary_message = window.statusBar().currentMessage()
+    def _make_label(self):
+        status_bar = self.window.statusBar()
+        label = status_bar.findChild(QLabel, "permanentStatusLabel")
+        if not label:
+            label = QLabel()
+            label.setMinimumWidth(100)
+            label.setObjectName("permanentStatusLabel")  # Give it a unique object name for easy retrieval
+            label.setAlignment(Qt.AlignLeft | Qt.AlignVCenter)  # Align to the LEFT
+            status_bar.addWidget(label)  # Use addWidget() for left alignment
+        return label
 
-    # Construct the message for the permanent label
-    permanent_parts = [f"{window.condition}\t", f"REF:{window.frameref}\t"]
+    def set(self, **fields):
+        for key, value in fields.items():
+            setattr(self, key, value)
+        if self._timer.isActive():
+            return  # a trailing update is already scheduled
+        wait = self._last_push + self.interval - time.monotonic()
+        if wait <= 0:
+            self.flush()
+        else:
+            self._timer.start(int(wait * 1000) + 1)
 
-    new_permanent_text = f"{item_status_tip}"
-    if other is not None:
-        new_permanent_text += f" : {other}"
+    def render(self):
+        # Construct the message for the permanent label
+        permanent_parts = [f"{self.condition}\t", f"REF:{self.frameref}\t"]
 
-    # Set the text of the permanent label
-    permanent_message_label.setText("   ".join(permanent_parts + [new_permanent_text]) + "\t")
+        new_permanent_text = f"{self.item_status}"
+        if self.other is not None:
+            new_permanent_text += f" : {self.other}"
+        return "   ".join(permanent_parts + [new_permanent_text]) + "\t"
 
-    # If you want to ensure no *temporary* showMessage() is active, you can still clear it,
-    # though with a left-aligned permanent widget, showMessage() messages might appear to its right.
-    window.statusBar().clearMessage()
+    def flush(self):
+        self._timer.stop()
+        self._last_push = time.monotonic()
+        text = self.render()
+        if text == self._text:
+            return
+        self._text = text
+        self._label.setText(text)
+        self.pushes += 1
+
+        # With a left-aligned permanent widget, showMessage() messages would appear to its right
+        status_bar = self.window.statusBar()
+        if status_bar.currentMessage():
+            status_bar.clearMessage()
+
+
+def status_model(window):
+    """The window's StatusModel, created on first use."""
+    model = getattr(window, "status", None)
+    if model is None:
+        model = window.status = StatusModel(window)
+    return model
+
+
+def statusMessage(window, item_status_tip, other=None):
+    status_model(window).set(condition=window.condition, frameref=window.frameref,
+                             item_status=item_status_tip, other=other)
 
 
 def setTitle(window, reg, proj, ver, itm="None"):
     window.setWindowTitle(f"LightCommander - {reg} - {proj} - {ver} - {itm}")
 
+def _print_sink(time, text):
+    print(f"[{time}] {text}")
+
+
+tracing.add_sink(_print_sink)
+
+
 def term(time, text):
-    print(f"[{time}] {text}")
\ No newline at end of file
+    """Startup/status log line; recorded as a trace mark and printed by the console sink."""
+    tracing.mark(text, "term", time)
+
+
+def lazy_import(name):
+    """
+    Return module `name` without executing it; the real import happens on first attribute
+    access. Already imported modules are returned as-is.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ImportError(f"No module named '{name}'")
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
+
+
+def prewarm(names, report=None):
+    """
+    Import `names` on a background thread so lazily imported subsystems are ready before
+    first use. `report(name, seconds, error)` is called after each one. Returns the thread.
+    """
+    def run():
+        for name in names:
+            t0 = time.perf_counter()
+            error = None
+            try:
+                module = importlib.import_module(name)
+                getattr(module, "__doc__", None)  # forces a lazy module to load
+            except Exception as e:
+                error = e
+            if report is not None:
+                report(name, time.perf_counter() - t0, error)
+
+    thread = threading.Thread(target=run, name="prewarm", daemon=True)
+    thread.start()
+    return thread
@@ -1,7 +1,5 @@
 import sys
 
-from v2.basic import TT_MUL, TT_DIV, TT_PLUS, TT_MINUS
-
 # read arguments
 # program_path = sys.argv[1]
 
@@ -223,10 +221,10 @@ class Parser:
             return NumberNode(tok)
 
     def term(self):
-        return self.bin_op(self.factor, (TT_MUL, TT_DIV))
+        return self.bin_op(self.factor, (TOKEN_MUL, TOKEN_DIV))
 
     def expr(self):
-        return self.bin_op(self.term, (TT_PLUS, TT_MINUS))
+        return self.bin_op(self.term, (TOKEN_PLUS, TOKEN_MINUS))
 
     def bin_op(self, func, ops):
         left = self.factor()
@@ -0,0 +1,600 @@
+# Editor document model for MapDesigner: the compiled map held in persistent (immutable,
+# structurally shared) maps, with an undo/redo command log.
+#
+# Every dict from parse_custom_format becomes a PMap, a hash trie of small dicts. Setting a
+# value copies only the trie nodes on the path to it (a handful of dicts of at most 32
+# entries) at each level of the map, and every untouched subtree is shared between the old
+# and the new version. An undo step records (path, old value, new value), so its memory is
+# proportional to the edit rather than to the map, and a snapshot is just a reference to the
+# current root: the autosave thread can serialise it while editing carries on.
+#
+#     doc = MapDocument(load_map("res/map/test/test-1.map"), "test-1")
+#     doc.set(doc.item_path("item.light") + ("posZ",), 250)
+#     with doc.transaction("move rig"):
+#         ...
+#     doc.undo()
+
+import gc
+import json
+import os
+import threading
+from collections import namedtuple
+from contextlib import contextmanager
+
+UNDO_LIMIT = 1000
+AUTOSAVE_INTERVAL = 30.0  # seconds
+SAVE_ROOT = "save"
+
+_SHIFT = 5
+_MASK = (1 << _SHIFT) - 1
+_MAX_DEPTH = 64 // _SHIFT + 1
+_HASH_BITS = (1 << 64) - 1
+
+MISSING = object()
+
+
+##########################
+# PERSISTENT MAP
+##########################
+
+class _Bucket(dict):
+    """Keys whose 64-bit hashes collide completely, stored by key below the last trie level."""
+
+
+def _chunk(h, depth):
+    return (h >> (depth * _SHIFT)) & _MASK
+
+
+def _node_with(entry, depth):
+    """A new trie node at `depth` holding a single entry (key, value, seq)."""
+    if depth >= _MAX_DEPTH:
+        return _Bucket({entry[0]: entry})
+    return {_chunk(hash(entry[0]) & _HASH_BITS, depth): entry}
+
+
+def _assoc(node, key, h, value, seq, depth):
+    """Copy of `node` with key set; returns (node, added). An existing key keeps its seq."""
+    if type(node) is _Bucket:
+        new = _Bucket(node)
+        old = node.get(key)
+        new[key] = (key, value, seq if old is None else old[2])
+        return new, old is None
+    chunk = _chunk(h, depth)
+    current = node.get(chunk)
+    new = dict(node)
+    if current is None:
+        new[chunk] = (key, value, seq)
+        return new, True
+    if type(current) is tuple:
+        if current[0] == key:
+            new[chunk] = (key, value, current[2])
+            return new, False
+        child, _ = _assoc(_node_with(current, depth + 1), key, h, value, seq, depth + 1)
+        new[chunk] = child
+        return new, True
+    new[chunk], added = _assoc(current, key, h, value, seq, depth + 1)
+    return new, added
+
+
+def _dissoc(node, key, h, depth):
+    """Copy of `node` without key, or `node` itself if the key is absent."""
+    if type(node) is _Bucket:
+        if key not in node:
+            return node
+        new = _Bucket(node)
+        del new[key]
+        return new
+    chunk = _chunk(h, depth)
+    current = node.get(chunk)
+    if current is None:
+        return node
+    if type(current) is tuple:
+        if current[0] != key:
+            return node
+        new = dict(node)
+        del new[chunk]
+        return new
+    child = _dissoc(current, key, h, depth + 1)
+    if child is current:
+        return node
+    new = dict(node)
+    if not child:
+        del new[chunk]
+    elif len(child) == 1 and type(next(iter(child.values()))) is tuple:
+        new[chunk] = next(iter(child.values()))  # pull a lone entry back up
+    else:
+        new[chunk] = child
+    return new
+
+
+def _build(entries, depth):
+    """Trie node for a list of (entry, hash) with distinct keys, built without copying."""
+    if depth >= _MAX_DEPTH:
+        return _Bucket({entry[0]: entry for entry, _ in entries})
+    groups = {}
+    for pair in entries:
+        chunk = _chunk(pair[1], depth)
+        group = groups.get(chunk)
+        if group is None:
+            groups[chunk] = [pair]
+        else:
+            group.append(pair)
+    return {chunk: group[0][0] if len(group) == 1 else _build(group, depth + 1) for chunk, group in groups.items()}
+
+
+def _entries(node, out):
+    for value in node.values():
+        if type(value) is tuple:
+            out.append(value)
+        else:
+            _entries(value, out)
+    return out
+
+
+class PMap:
+    """
+    Immutable mapping; set() and delete() return a new PMap sharing all untouched nodes.
+    Iteration follows insertion order, like the dicts it replaces.
+    """
+
+    __slots__ = ("_root", "_len", "_seq", "_order")
+
+    def __init__(self, items=None):
+        self._root, self._len, self._seq, self._order = {}, 0, 0, None
+        if items:
+            items = dict(items)
+            self._root = _build([((key, value, seq), hash(key) & _HASH_BITS)
+                                 for seq, (key, value) in enumerate(items.items())], 0)
+            self._len = self._seq = len(items)
+
+    @classmethod
+    def _make(cls, root, length, seq):
+        new = cls.__new__(cls)
+        new._root, new._len, new._seq, new._order = root, length, seq, None
+        return new
+
+    def get(self, key, default=None):
+        h = hash(key) & _HASH_BITS
+        node = self._root
+        depth = 0
+        while True:
+            if type(node) is _Bucket:
+                entry = node.get(key)
+                return default if entry is None else entry[1]
+            entry = node.get(_chunk(h, depth))
+            if entry is None:
+                return default
+            if type(entry) is tuple:
+                return entry[1] if entry[0] == key else default
+            node = entry
+            depth += 1
+
+    def __getitem__(self, key):
+        value = self.get(key, MISSING)
+        if value is MISSING:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        return self.get(key, MISSING) is not MISSING
+
+    def __len__(self):
+        return self._len
+
+    def set(self, key, value):
+        root, added = _assoc(self._root, key, hash(key) & _HASH_BITS, value, self._seq, 0)
+        return PMap._make(root, self._len + added, self._seq + 1)
+
+    def delete(self, key):
+        root = _dissoc(self._root, key, hash(key) & _HASH_BITS, 0)
+        if root is self._root:
+            return self
+        return PMap._make(root, self._len - 1, self._seq)
+
+    def _ordered(self):
+        if self._order is None:
+            entries = _entries(self._root, [])
+            entries.sort(key=lambda e: e[2])
+            self._order = entries
+        return self._order
+
+    def __iter__(self):
+        return (e[0] for e in self._ordered())
+
+    def keys(self):
+        return [e[0] for e in self._ordered()]
+
+    def values(self):
+        return [e[1] for e in self._ordered()]
+
+    def items(self):
+        return [(e[0], e[1]) for e in self._ordered()]
+
+    def __eq__(self, other):
+        if not isinstance(other, PMap):
+            return NotImplemented
+        return self._root is other._root or (len(self) == len(other) and all(
+            other.get(k, MISSING) == v for k, v in self.items()))
+
+    def __repr__(self):
+        return f"PMap({dict(self.items())!r})"
+
+
+EMPTY = PMap()
+
+
+def freeze(value):
+    """Nested dicts/lists -> PMaps/tuples."""
+    if isinstance(value, dict):
+        return PMap((k, freeze(v)) for k, v in value.items())
+    if isinstance(value, list):
+        return tuple(freeze(v) for v in value)
+    return value
+
+
+def thaw(value):
+    """PMaps/tuples -> plain dicts/lists (what the compiler and JSON produce)."""
+    if isinstance(value, PMap):
+        return {k: thaw(v) for k, v in value.items()}
+    if isinstance(value, tuple):
+        return [thaw(v) for v in value]
+    return value
+
+
+def get_in(node, path, default=None):
+    for key in path:
+        if not isinstance(node, PMap):
+            return default
+        node = node.get(key, MISSING)
+        if node is MISSING:
+            return default
+    return node
+
+
+def assoc_in(node, path, value):
+    """Copy of `node` with `value` at `path` (MISSING deletes it), creating PMaps on the way."""
+    if not path:
+        return value
+    if not isinstance(node, PMap):
+        node = EMPTY
+    key = path[0]
+    if len(path) == 1:
+        return node.delete(key) if value is MISSING else node.set(key, value)
+    return node.set(key, assoc_in(node.get(key), path[1:], value))
+
+
+
+##########################
+# DOCUMENT
+##########################
+
+def freeze_heap():
+    """
+    Move everything alive now out of the garbage collector's view (gc.freeze). A frozen map
+    is long-lived and acyclic (refcounting frees replaced nodes), but a full collection would
+    still walk all of it: hundreds of ms at 100k items, holding the GIL against the UI thread.
+    Process-wide and permanent until gc.unfreeze(), so it is opt-in: call it once at startup,
+    after the show's map is loaded, not per document.
+    """
+    gc.freeze()
+
+
+Edit = namedtuple("Edit", "path old new")
+Step = namedtuple("Step", "label edits")
+Snapshot = namedtuple("Snapshot", "root version")
+
+
+def edit_in(root, path, value):
+    """
+    Edit setting `value` at `path` in `root`. When assoc_in would create or replace
+    containers on the way down (a missing key, a scalar), the edit covers the topmost of
+    them instead, with its old value, so undoing it leaves no empty PMaps behind.
+    """
+    node = root
+    for i, key in enumerate(path[:-1]):
+        child = node.get(key, MISSING)
+        if not isinstance(child, PMap):
+            anchor = path[:i + 1]
+            return Edit(anchor, child, assoc_in(child, path[i + 1:], value))
+        node = child
+    return Edit(path, node.get(path[-1], MISSING) if path else root, value)
+
+
+class MapDocument:
+    """
+    A compiled map under edit. Values are frozen on the way in (set() accepts plain dicts);
+    read with get() / snapshot(), or thaw() for a plain dict.
+
+    Listeners are called as listener(document, paths) after every change, undo and redo.
+    """
+
+    def __init__(self, parsed=None, name="untitled", limit=UNDO_LIMIT):
+        self.name = name
+        self.root = freeze(parsed or {})
+        self.version = 0
+        self.limit = limit
+        self.undo_stack = []
+        self.redo_stack = []
+        self.listeners = []
+        self._lock = threading.Lock()
+        self._pending = None  # edits of the open transaction
+
+    # paths
+
+    def section_path(self, key):
+        """Path of section `key`: under `.map` when it is there, else at the top level (see mapdata)."""
+        if isinstance(get_in(self.root, (".map", key)), PMap):
+            return (".map", key)
+        return (key,)
+
+    def item_path(self, key):
+        return self.section_path("items") + (key,)
+
+    # reading
+
+    def get(self, path, default=None):
+        return get_in(self.root, tuple(path), default)
+
+    def snapshot(self):
+        """The current version; O(1), and safe to read from another thread."""
+        with self._lock:
+            return Snapshot(self.root, self.version)
+
+    def thaw(self):
+        return thaw(self.root)
+
+    # editing
+
+    def _commit(self, edits):
+        """Apply `edits` (Edit tuples) to the root in order and notify listeners."""
+        with self._lock:
+            root = self.root
+            for edit in edits:
+                root = assoc_in(root, edit.path, edit.new)
+            self.root = root
+            self.version += 1
+        paths = [edit.path for edit in edits]
+        for listener in list(self.listeners):
+            listener(self, paths)
+
+    def _record(self, label, edits):
+        if self._pending is not None:
+            self._pending.extend(edits)
+        else:
+            self.undo_stack.append(Step(label, edits))
+            if len(self.undo_stack) > self.limit:
+                del self.undo_stack[0]
+        self.redo_stack.clear()
+
+    def set(self, path, value, label=None):
+        path = tuple(path)
+        edit = edit_in(self.root, path, freeze(value))
+        self._commit([edit])
+        self._record(label or f"set {'/'.join(map(str, path))}", [edit])
+
+    def delete(self, path, label=None):
+        path = tuple(path)
+        old = self.get(path, MISSING)
+        if old is MISSING:
+            return
+        edit = Edit(path, old, MISSING)
+        self._commit([edit])
+        self._record(label or f"delete {'/'.join(map(str, path))}", [edit])
+
+    def update(self, path, label=None, **fields):
+        """Set several keys under `path` as one undo step."""
+        path = tuple(path)
+        edits, root = [], self.root
+        for k, v in fields.items():  # each edit against the result of the previous ones
+            edits.append(edit_in(root, path + (k,), freeze(v)))
+            root = assoc_in(root, edits[-1].path, edits[-1].new)
+        self._commit(edits)
+        self._record(label or f"edit {'/'.join(map(str, path))}", edits)
+
+    @contextmanager
+    def transaction(self, label):
+        """Group every change made inside the block into one undo step."""
+        if self._pending is not None:
+            yield self
+            return
+        self._pending = []
+        try:
+            yield self
+        finally:
+            edits, self._pending = self._pending, None
+            if edits:
+                self._record(label, edits)
+
+    def can_undo(self):
+        return bool(self.undo_stack)
+
+    def can_redo(self):
+        return bool(self.redo_stack)
+
+    def undo(self):
+        if not self.undo_stack:
+            return None
+        step = self.undo_stack.pop()
+        self._commit([Edit(e.path, e.new, e.old) for e in reversed(step.edits)])
+        self.redo_stack.append(step)
+        return step.label
+
+    def redo(self):
+        if not self.redo_stack:
+            return None
+        step = self.redo_stack.pop()
+        self._commit(step.edits)
+        self.undo_stack.append(step)
+        return step.label
+
+
+##########################
+# AUTOSAVE
+##########################
+
+_scalar = json.JSONEncoder(ensure_ascii=False).encode
+
+
+def iter_json(value, indent=2, level=0):
+    """
+    JSON text of a frozen value in chunks, as json.dump(thaw(value), indent=indent,
+    ensure_ascii=False) would write it. Going straight from the PMaps avoids building a
+    thawed copy, whose millions of containers make the collector stall the UI thread.
+    """
+    if isinstance(value, (PMap, dict)):
+        items = value.items()
+        if not items:
+            yield "{}"
+            return
+        inner = "\n" + " " * (indent * (level + 1))
+        yield "{"
+        first = True
+        for key, item in items:
+            yield (inner if first else "," + inner) + _scalar(str(key)) + ": "
+            first = False
+            yield from iter_json(item, indent, level + 1)
+        yield "\n" + " " * (indent * level) + "}"
+    elif isinstance(value, (tuple, list)):
+        if not value:
+            yield "[]"
+            return
+        inner = "\n" + " " * (indent * (level + 1))
+        yield "["
+        for i, item in enumerate(value):
+            yield inner if i == 0 else "," + inner
+            yield from iter_json(item, indent, level + 1)
+        yield "\n" + " " * (indent * level) + "]"
+    else:
+        yield _scalar(value)
+
+
+def write_json_atomic(path, value):
+    """Write a frozen or plain value as JSON through a temp file and rename."""
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.writelines(iter_json(value))
+    os.replace(tmp, path)
+    return path
+
+
+class Autosaver:
+    """
+    Saves snapshots of `document` every `interval` seconds from a background thread, when
+    the version changed. `writer(snapshot, directory, name)` defaults to one JSON file,
+    save/<project>/<project>.autosave.json.
+    """
+
+    def __init__(self, document, directory=None, interval=AUTOSAVE_INTERVAL, writer=None):
+        self.document = document
+        self.directory = directory or os.path.join(SAVE_ROOT, document.name)
+        self.interval = interval
+        self.writer = writer or self.write_json
+        self.saved_version = document.version
+        self.last_error = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def write_json(snapshot, directory, name):
+        os.makedirs(directory, exist_ok=True)
+        return write_json_atomic(os.path.join(directory, f"{name}.autosave.json"), snapshot.root)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="autosave", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, save=True):
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join()
+        if save:
+            self.save()
+
+    def request(self):
+        """Save soon instead of waiting for the interval."""
+        self._wake.set()
+
+    def save(self):
+        snapshot = self.document.snapshot()
+        if snapshot.version == self.saved_version:
+            return False
+        try:
+            self.writer(snapshot, self.directory, self.document.name)
+            self.saved_version = snapshot.version
+            self.last_error = None
+            return True
+        except OSError as e:
+            self.last_error = e
+            return False
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if not self._stop.is_set():
+                self.save()
+
+
+# run from the project root: python -m process.map.document [items] [edits]
+if __name__ == "__main__":
+    import copy
+    import sys
+    import tempfile
+    import time
+    import tracemalloc
+
+    from process.trigger.dispatcher import synthetic_map
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    edits = int(sys.argv[2]) if len(sys.argv) > 2 else 10000
+
+    parsed = synthetic_map(count)
+    t0 = time.perf_counter()
+    doc = MapDocument(parsed, "bench", limit=edits)
+    freeze_heap()
+    print(f"{count} items frozen in {time.perf_counter() - t0:.2f}s")
+
+    keys = list(parsed[".map"]["items"])
+    items = doc.section_path("items")
+    t0 = time.perf_counter()
+    for i in range(edits):
+        doc.set(items + (keys[(i * 7919) % count], "posX"), float(i))
+    dt = (time.perf_counter() - t0) / edits
+    while doc.undo():
+        pass
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for i in range(edits):
+        doc.set(items + (keys[(i * 7919) % count], "posX"), float(i))
+    grown = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    print(f"{edits} edits: {dt * 1e6:.1f} us each, {grown / edits:.0f} bytes of history per step")
+
+    t0 = time.perf_counter()
+    for _ in range(edits):
+        doc.snapshot()
+    print(f"snapshot: {(time.perf_counter() - t0) / edits * 1e9:.0f} ns")
+
+    t0 = time.perf_counter()
+    while doc.undo():
+        pass
+    print(f"undo all: {(time.perf_counter() - t0) / edits * 1e6:.1f} us per step, "
+          f"restored: {thaw(doc.root) == parsed}")
+
+    t0 = time.perf_counter()
+    copy.deepcopy(parsed)
+    print(f"(one deepcopy of the map: {(time.perf_counter() - t0) * 1000:.0f} ms)")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        saver = Autosaver(doc, tmp, interval=0.05).start()
+        t0 = time.perf_counter()
+        worst = 0.0
+        while time.perf_counter() - t0 < 1.0:
+            t = time.perf_counter()
+            doc.set(items + (keys[0], "posY"), t)
+            worst = max(worst, time.perf_counter() - t)
+        saver.stop()
+        print(f"editing during autosave: worst edit {worst * 1000:.2f} ms, saved version {saver.saved_version}")
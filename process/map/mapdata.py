@@ -0,0 +1,95 @@
+# Helpers for reading compiled maps (parse_custom_format output or the JSON in temp/ and save/).
+#
+# A `;` after a nested block closes its parent as well, so depending on how a .map is
+# terminated sections such as `triggers` end up either under `.map` or at the top level.
+# These helpers look in both places.
+
+import json
+import re
+from pathlib import Path
+
+import numpy as np
+
+from res.compiler.compiler import parse_custom_format
+
+# truss objects are named <width in inches>[half]<Square|Triangle>Truss_<length>
+TRUSS_LENGTHS = {"sm": 120.0, "med": 240.0, "lg": 360.0, "xl": 480.0}
+_TRUSS = re.compile(r"^(\d+)(half)?(Square|Triangle)Truss_(sm|med|lg|xl)$")
+
+
+def load_map(path, interner=None):
+    """
+    Load a .map source file or its compiled .json into a dict. With an `interner`
+    (res.compiler.library.Interner) the result is interned: read-only, with blocks shared
+    across everything loaded through that interner.
+    """
+    path = Path(path)
+    with open(path, "r", encoding="utf-8") as f:
+        if path.suffix == ".json":
+            return json.load(f) if interner is None else interner.loads(f.read())
+        parsed = parse_custom_format(f.read())
+        return parsed if interner is None else interner.intern(parsed)
+
+
+def map_section(parsed, key):
+    """Return section `key` of a map (from `.map` or the top level), {} if absent."""
+    body = parsed.get(".map")
+    if isinstance(body, dict) and isinstance(body.get(key), dict):
+        return body[key]
+    section = parsed.get(key)
+    return section if isinstance(section, dict) else {}
+
+
+def map_items(parsed):
+    """{item key: item dict} in file order. Keys are as compiled, e.g. "item.light"."""
+    return {k: v for k, v in map_section(parsed, "items").items() if isinstance(v, dict)}
+
+
+def map_triggers(parsed):
+    """{group index: group dict} for every `group N { ... }` in the triggers section."""
+    groups = {}
+    for key, group in map_section(parsed, "triggers").items():
+        if not isinstance(group, dict):
+            continue
+        index = group.get("groupIndex")
+        if index is None:
+            index = key.rsplit(".", 1)[-1]
+        try:
+            groups[int(index)] = group
+        except (TypeError, ValueError):
+            groups[index] = group
+    return groups
+
+
+def item_position(item):
+    return (item.get("posX", 0) or 0, item.get("posY", 0) or 0, item.get("posZ", 0) or 0)
+
+
+def item_rotation(item):
+    return (item.get("rotX", 0) or 0, item.get("rotY", 0) or 0, item.get("rotZ", 0) or 0)
+
+
+def euler_matrices(rotations):
+    """(n, 3, 3) rotation matrices for (n, 3) rotX/Y/Z in degrees, applied X, then Y, then Z."""
+    rx, ry, rz = np.radians(np.asarray(rotations, np.float64).reshape(-1, 3)).T
+    cx, sx, cy, sy, cz, sz = np.cos(rx), np.sin(rx), np.cos(ry), np.sin(ry), np.cos(rz), np.sin(rz)
+    m = np.empty((len(rx), 3, 3))
+    m[:, 0, 0] = cz * cy
+    m[:, 0, 1] = cz * sy * sx - sz * cx
+    m[:, 0, 2] = cz * sy * cx + sz * sx
+    m[:, 1, 0] = sz * cy
+    m[:, 1, 1] = sz * sy * sx + cz * cx
+    m[:, 1, 2] = sz * sy * cx - cz * sx
+    m[:, 2, 0] = -sy
+    m[:, 2, 1] = cy * sx
+    m[:, 2, 2] = cy * cx
+    return m
+
+
+def truss_spec(name):
+    """(width, length, triangle) of a truss object name, None for anything else."""
+    m = _TRUSS.match(name or "")
+    if not m:
+        return None
+    width = float(m.group(1)) + (0.5 if m.group(2) else 0.0)
+    return width, TRUSS_LENGTHS[m.group(4)], m.group(3) == "Triangle"
@@ -0,0 +1,337 @@
+# Single-file show package: save/<project>/ (the .map, its JSON, the objects/ copies), the
+# sequences and the pre-analysed audio peaks of res/render/batchspec.py in one file.
+#
+#     page 0    header: magic, version, table of contents offset and length
+#     page 1..  sections, each starting on a page boundary
+#     last      table of contents: JSON list of {name, kind, offset, length, crc, ...}
+#
+# Opening maps the file and reads the header and the table of contents, nothing else, so
+# it costs the same for a 10 MB and a 10 GB show. Sections are read through the map on
+# demand: bytes/text as memoryview slices, peaks as read-only numpy arrays over the mapped
+# pages (dtype and shape are in the table), and the pages a show never touches are never
+# read from disk. Names follow the loose layout ("test-1.map", "objects/structure/x.lco",
+# "sequences/color/color.lcseq", "peaks/<track>.wave.npy"), and extract() writes that
+# layout back out.
+#
+# Packages are written once, through a temp file and rename like the saver does.
+
+import json
+import mmap
+import os
+import shutil
+import struct
+import zlib
+
+import numpy as np
+
+from process.map.document import SAVE_ROOT
+from res.compiler.library import Interner
+
+MAGIC = b"LCSHOW\x00\x01"
+VERSION = 1
+PAGE = 4096
+HEADER = struct.Struct("<8sIQQ")  # magic, version, toc offset, toc length
+SEQUENCES_ROOT = os.path.join("res", "sequences")
+PACKAGE_SUFFIX = ".lcshow"
+COPY_BLOCK = 1 << 22
+
+
+##########################
+# WRITING
+##########################
+
+def project_sections(directory, sequences_root=SEQUENCES_ROOT, peaks_dir=None):
+    """
+    (name, source path) for everything a package of the project in `directory` holds:
+    the project's files and objects/ tree, the .lcseq under `sequences_root`, and the
+    .npy peak files in `peaks_dir` (batchspec output).
+    """
+    sections = []
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for file in sorted(files):
+            if file.endswith(PACKAGE_SUFFIX) or file.endswith(".tmp"):
+                continue
+            path = os.path.join(root, file)
+            sections.append((os.path.relpath(path, directory).replace(os.sep, "/"), path))
+    if sequences_root and os.path.isdir(sequences_root):
+        for root, dirs, files in os.walk(sequences_root):
+            dirs.sort()
+            for file in sorted(files):
+                if file.endswith(".lcseq"):
+                    rel = os.path.relpath(os.path.join(root, file), sequences_root).replace(os.sep, "/")
+                    sections.append(("sequences/" + rel, os.path.join(root, file)))
+    if peaks_dir and os.path.isdir(peaks_dir):
+        for file in sorted(os.listdir(peaks_dir)):
+            if file.endswith(".npy"):
+                sections.append(("peaks/" + file, os.path.join(peaks_dir, file)))
+    return sections
+
+
+def _pad(f):
+    pad = -f.tell() % PAGE
+    if pad:
+        f.write(b"\x00" * pad)
+
+
+def write_package(path, sections):
+    """
+    Write `sections` ((name, source path) pairs) to the package at `path`. .npy files are
+    stored as raw array data (dtype and shape in the table), anything else as bytes.
+    """
+    toc = []
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(b"\x00" * PAGE)
+        for name, source in sections:
+            entry = {"name": name, "offset": f.tell()}
+            if name.endswith(".npy"):
+                array = np.load(source, mmap_mode="r")
+                array = np.ascontiguousarray(array)
+                entry.update(kind="array", dtype=array.dtype.str, shape=list(array.shape))
+                data = memoryview(array.reshape(-1).view(np.uint8)) if array.size else memoryview(b"")
+                crc = 0
+                for start in range(0, len(data), COPY_BLOCK):
+                    block = data[start:start + COPY_BLOCK]
+                    f.write(block)
+                    crc = zlib.crc32(block, crc)
+            else:
+                entry["kind"] = "bytes"
+                crc = 0
+                with open(source, "rb") as src:
+                    while block := src.read(COPY_BLOCK):
+                        f.write(block)
+                        crc = zlib.crc32(block, crc)
+            entry["length"] = f.tell() - entry["offset"]
+            entry["crc"] = crc
+            toc.append(entry)
+            _pad(f)
+        toc_offset = f.tell()
+        table = json.dumps(toc, separators=(",", ":")).encode("utf-8")
+        f.write(table)
+        f.seek(0)
+        f.write(HEADER.pack(MAGIC, VERSION, toc_offset, len(table)))
+    os.replace(tmp, path)
+    return path
+
+
+def pack_project(name, out=None, save_root=SAVE_ROOT, sequences_root=SEQUENCES_ROOT, peaks_dir=None):
+    """Package save/<name>/ as save/<name>/<name>.lcshow (or `out`)."""
+    directory = os.path.join(save_root, name)
+    out = out or os.path.join(directory, name + PACKAGE_SUFFIX)
+    return write_package(out, project_sections(directory, sequences_root, peaks_dir))
+
+
+##########################
+# READING
+##########################
+
+class ShowPackage:
+    """A mapped show package. Sections are read lazily; close() (or `with`) unmaps it."""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # empty file
+            self._file.close()
+            raise ValueError(f"{path}: not a show package")
+        if len(self._map) < HEADER.size:
+            self.close()
+            raise ValueError(f"{path}: not a show package")
+        magic, version, toc_offset, toc_length = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"{path}: not a show package")
+        if version > VERSION:
+            self.close()
+            raise ValueError(f"{path}: package version {version} is newer than {VERSION}")
+        if toc_offset + toc_length > len(self._map):
+            self.close()
+            raise ValueError(f"{path}: truncated show package")
+        self.version = version
+        try:
+            self.toc = {e["name"]: e for e in json.loads(self._map[toc_offset:toc_offset + toc_length])}
+        except (ValueError, KeyError, TypeError):  # bad JSON or UTF-8, entries without a name
+            self.close()
+            raise ValueError(f"{path}: damaged table of contents")
+        self._view = memoryview(self._map)
+        self._json = {}
+        self._interner = Interner()  # JSON sections share their repeated blocks
+
+    def close(self):
+        if getattr(self, "_view", None) is not None:
+            self._view.release()
+            self._view = None
+        if not self._map.closed:
+            try:
+                self._map.close()
+            except BufferError:  # arrays handed out still point into the map
+                pass
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __contains__(self, name):
+        return name in self.toc
+
+    def names(self, prefix=""):
+        return [n for n in self.toc if n.startswith(prefix)]
+
+    def bytes(self, name):
+        """Zero-copy view of a section's bytes."""
+        entry = self.toc[name]
+        return self._view[entry["offset"]:entry["offset"] + entry["length"]]
+
+    def text(self, name):
+        return str(self.bytes(name), "utf-8")
+
+    def json(self, name):
+        """Parsed JSON section, cached and interned (read-only: copy a block to edit it)."""
+        if name not in self._json:
+            self._json[name] = self._interner.loads(self.text(name))
+        return self._json[name]
+
+    def array(self, name):
+        """Read-only array over the mapped pages of an array section."""
+        entry = self.toc[name]
+        if entry["kind"] != "array":
+            raise ValueError(f"section '{name}' is not an array")
+        dtype = np.dtype(entry["dtype"])
+        count = int(np.prod(entry["shape"], dtype=np.int64))
+        return np.frombuffer(self._map, dtype, count, entry["offset"]).reshape(entry["shape"])
+
+    def project(self):
+        """Name of the project: the stem of its compiled .json."""
+        for name in self.toc:
+            if "/" not in name and name.endswith(".json"):
+                return name[:-5]
+        return None
+
+    def map(self):
+        """The compiled map (the project's .json section)."""
+        project = self.project()
+        if project is None:
+            raise ValueError(f"{self.path}: package holds no compiled map")
+        return self.json(project + ".json")
+
+    def verify(self, names=None):
+        """Names of sections whose CRC no longer matches (reads them all)."""
+        bad = []
+        for name in names or self.toc:
+            if zlib.crc32(self.bytes(name)) != self.toc[name]["crc"]:
+                bad.append(name)
+        return bad
+
+    def extract(self, directory, sequences_root=None, peaks_dir=None):
+        """
+        Write the loose layout back: project files under `directory`, sequences under
+        `sequences_root` and peaks under `peaks_dir` (skipped when not given). Raises
+        ValueError, before writing anything, for a section whose name would land outside
+        its folder (absolute, with a drive or `..`).
+        """
+        targets = []
+        for name, entry in self.toc.items():
+            if name.startswith("sequences/"):
+                if sequences_root is None:
+                    continue
+                root, rel = sequences_root, name[len("sequences/"):]
+            elif name.startswith("peaks/"):
+                if peaks_dir is None:
+                    continue
+                root, rel = peaks_dir, name[len("peaks/"):]
+            else:
+                root, rel = directory, name
+            targets.append((name, entry, _inside(root, rel, self.path)))
+        for name, entry, target in targets:
+            os.makedirs(os.path.dirname(target) or ".", exist_ok=True)
+            if entry["kind"] == "array":
+                np.save(target, self.array(name))
+            else:
+                with open(target, "wb") as f:
+                    f.write(self.bytes(name))
+
+
+def _inside(root, rel, package):
+    """Path of section file `rel` under `root`; ValueError if it would escape `root`."""
+    parts = rel.replace("\\", "/").split("/")
+    # ":" covers drive letters and stream names on Windows whatever platform extracts
+    if not rel or os.path.isabs(rel) or any(p in ("", ".", "..") or ":" in p for p in parts):
+        raise ValueError(f"{package}: unsafe section name {rel!r}")
+    base = os.path.realpath(root)
+    target = os.path.realpath(os.path.join(base, *parts))
+    if os.path.commonpath([base, target]) != base:  # e.g. through a symlink already in `root`
+        raise ValueError(f"{package}: section {rel!r} resolves outside {root}")
+    return target
+
+
+def open_show(path):
+    return ShowPackage(path)
+
+
+# run from the project root: python -m process.map.package [gigabytes of peaks]
+if __name__ == "__main__":
+    import filecmp
+    import sys
+    import tempfile
+    import time
+
+    gigabytes = float(sys.argv[1]) if len(sys.argv) > 1 else 2.0
+
+    with tempfile.TemporaryDirectory(dir=".") as tmp:
+        # loose layout: the test project plus a show's worth of analysed tracks
+        project = os.path.join(tmp, "save", "test-1")
+        shutil.copytree(os.path.join(SAVE_ROOT, "test-1"), project)
+        peaks = os.path.join(tmp, "analysis")
+        os.makedirs(peaks)
+        tracks = 40
+        frames = int(gigabytes * 1e9 / tracks / (1025 * 2))
+        rng = np.random.default_rng(0)
+        block = rng.normal(-60, 10, (4096, 1025)).astype(np.float16)
+        for t in range(tracks):
+            spec = np.lib.format.open_memmap(os.path.join(peaks, f"track{t:02d}.spec.npy"), "w+", np.float16, (frames, 1025))
+            for start in range(0, frames, len(block)):
+                spec[start:start + len(block)] = block[:frames - start]
+            spec.flush()
+            del spec
+            np.save(os.path.join(peaks, f"track{t:02d}.wave.npy"), rng.uniform(-1, 1, (frames // 86, 2)).astype(np.float32))
+
+        out = os.path.join(tmp, "show" + PACKAGE_SUFFIX)
+        t0 = time.perf_counter()
+        write_package(out, project_sections(project, SEQUENCES_ROOT, peaks))
+        t1 = time.perf_counter()
+        size = os.path.getsize(out)
+        print(f"packed {size / 1e9:.2f} GB in {t1 - t0:.1f} s")
+
+        if hasattr(os, "posix_fadvise"):  # open cold: flush the package and drop it from the page cache
+            fd = os.open(out, os.O_RDONLY)
+            os.fsync(fd)
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+            os.close(fd)
+        t0 = time.perf_counter()
+        show = ShowPackage(out)
+        t1 = time.perf_counter()
+        parsed = show.map()
+        t2 = time.perf_counter()
+        column = show.array("peaks/track17.spec.npy")[123456 % frames]
+        t3 = time.perf_counter()
+        print(f"open {(t1 - t0) * 1000:.2f} ms ({len(show.toc)} sections), map {(t2 - t1) * 1000:.2f} ms "
+              f"({len(parsed)} top-level keys), one spectrogram column {(t3 - t2) * 1000:.2f} ms")
+
+        back = os.path.join(tmp, "back")
+        show.extract(os.path.join(back, "test-1"), os.path.join(back, "sequences"), os.path.join(back, "analysis"))
+        show.close()
+        same = []
+        for left, right in ((project, os.path.join(back, "test-1")), (SEQUENCES_ROOT, os.path.join(back, "sequences")),
+                            (peaks, os.path.join(back, "analysis"))):
+            for root, _, files in os.walk(left):
+                for file in files:
+                    if file.endswith(".lcseq") or left != SEQUENCES_ROOT:
+                        rel = os.path.relpath(os.path.join(root, file), left)
+                        same.append(filecmp.cmp(os.path.join(left, rel), os.path.join(right, rel), shallow=False))
+        print(f"extracted layout identical to the loose files: {all(same)} ({len(same)} files)")
@@ -0,0 +1,460 @@
+# Incremental project saver for save/<project>/: <project>.map, <project>.json and the
+# objects/ tree the map uses.
+#
+# Both files are assembled from chunks: one per top-level section, and one per child of
+# the big sections (each item, each trigger group). The saver listens to a MapDocument and
+# marks the chunks touched by each edit with the document version; a save renders only the
+# dirty chunks (in .map and JSON form) from the snapshot and reuses the cached bytes of the
+# rest. When only existing chunks changed, each file is rebuilt from the previous one: the
+# unchanged byte ranges between dirty chunks are copied file to file (copy_file_range, so
+# they never pass through Python) and only the dirty chunks are written. Adding or removing
+# a chunk shifts the layout and assembles the whole file from the caches instead. Either
+# way the new file goes through a temp file and rename, so a reader or a crash never sees
+# half a file. Saving with nothing dirty writes nothing.
+#
+# Object files are copied only when the source differs from the copy (size, mtime), by
+# reflink where the filesystem supports it, else a hardlink, else a plain copy. A hardlink
+# shares the file with res/objects, so the copy follows later edits of the original.
+
+import errno
+import json
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
+
+from process.map.document import PMap, Autosaver, iter_json, get_in, SAVE_ROOT
+
+OBJECTS_ROOT = os.path.join("res", "objects")
+CHUNKED = ("items", "triggers")  # sections saved per child
+MAP_INDENT = "    "
+JSON_INDENT = 2
+FICLONE = 0x40049409  # linux ioctl: share the source's extents (copy-on-write)
+
+_json_scalar = json.JSONEncoder(ensure_ascii=False).encode
+
+
+##########################
+# FORMATS
+##########################
+
+def map_scalar(value):
+    """A value as the .map parser reads it back (see parse_custom_format.convert_value)."""
+    if value is True:
+        return "true"
+    if value is False:
+        return "false"
+    if value is None:
+        return "null"
+    if isinstance(value, int):
+        return str(value)
+    if isinstance(value, float):
+        text = repr(value)
+        if "e" in text or "n" in text:  # exponents / inf / nan do not parse as numbers
+            return f'"{text}"'
+        return text
+    if isinstance(value, str):
+        if value.startswith("0x") and len(value) > 2 and all(c in "0123456789abcdefABCDEF" for c in value[2:]):
+            return "@x" + value[2:]
+        return '"' + value.replace('"', "'").replace("\n", "\\n") + '"'
+    return '"' + json.dumps(value, ensure_ascii=False).replace('"', "'") + '"'
+
+
+def map_lines(key, value, level, out):
+    """Append the .map lines of `key` (a block or a `key: value`) at nesting `level`."""
+    pad = MAP_INDENT * level
+    if isinstance(value, (PMap, dict)):
+        out.append(f"{pad}{key} {{\n")
+        for k, v in value.items():
+            map_lines(k, v, level + 1, out)
+        out.append(f"{pad}}}\n")
+    else:
+        out.append(f"{pad}{key}: {map_scalar(value)}\n")
+    return out
+
+
+def json_member(key, value, level):
+    return _json_scalar(str(key)) + ": " + "".join(iter_json(value, JSON_INDENT, level))
+
+
+def replace_file(path, parts):
+    """Write `parts` (bytes) to `path` through a temp file and an atomic rename."""
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.writelines(parts)
+    os.replace(tmp, path)
+
+
+def _copy_range(src, dst, offset, count):
+    """Copy `count` bytes at `offset` of fd `src` to the position of fd `dst`, in the kernel where possible."""
+    while count > 0:
+        if hasattr(os, "copy_file_range"):
+            n = os.copy_file_range(src, dst, count, offset)
+        else:
+            n = os.write(dst, os.pread(src, min(count, 1 << 20), offset))
+        if n <= 0:
+            raise OSError(errno.EIO, "short copy")
+        offset += n
+        count -= n
+
+
+class _Layout:
+    """Byte lengths of the parts of a written file, and which part holds each chunk."""
+
+    def __init__(self, parts, index):
+        self.lengths = np.fromiter((len(p) for p in parts), np.int64, len(parts))
+        self.index = index
+        self.size = int(self.lengths.sum())
+
+    def matches(self, path):
+        try:
+            return os.path.getsize(path) == self.size
+        except OSError:
+            return False
+
+    def patch(self, path, replacements):
+        """
+        Write a copy of `path` with the parts in `replacements` ({part: bytes}) swapped,
+        copying the unchanged stretches between them file to file, then rename it over.
+        """
+        offsets = np.concatenate(([0], np.cumsum(self.lengths)))
+        tmp = f"{path}.{os.getpid()}.tmp"
+        src = os.open(path, os.O_RDONLY)
+        try:
+            dst = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+            try:
+                at = 0
+                for part in sorted(replacements):
+                    _copy_range(src, dst, int(offsets[at]), int(offsets[part] - offsets[at]))
+                    data = replacements[part]
+                    view = memoryview(data)
+                    while view:
+                        view = view[os.write(dst, view):]
+                    at = part + 1
+                _copy_range(src, dst, int(offsets[at]), int(offsets[-1] - offsets[at]))
+            finally:
+                os.close(dst)
+        finally:
+            os.close(src)
+        os.replace(tmp, path)
+        for part, data in replacements.items():
+            self.lengths[part] = len(data)
+        self.size = int(self.lengths.sum())
+
+
+def link_or_copy(src, dst):
+    """Copy `src` to `dst` via reflink, hardlink or copy; returns which was used."""
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    tmp = f"{dst}.{os.getpid()}.tmp"
+    if os.path.lexists(tmp):
+        os.remove(tmp)
+    try:
+        import fcntl
+
+        with open(src, "rb") as s, open(tmp, "wb") as d:
+            fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+        shutil.copystat(src, tmp)
+        how = "reflink"
+    except (ImportError, OSError):
+        if os.path.lexists(tmp):
+            os.remove(tmp)
+        try:
+            os.link(src, tmp)
+            how = "hardlink"
+        except OSError as e:
+            if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK, errno.ENOTSUP, errno.EACCES):
+                raise
+            shutil.copy2(src, tmp)
+            how = "copy"
+    os.replace(tmp, dst)
+    return how
+
+
+##########################
+# SAVER
+##########################
+
+class ProjectSaver:
+    """
+    Saves `document` to save/<name>/. Call save() (UI thread or Autosaver thread); the
+    first save writes everything, later ones only what changed. Saves are serialised: one
+    that arrives while another is writing waits for it, and a snapshot older than the one
+    already saved is skipped.
+    """
+
+    def __init__(self, document, directory=None, objects_root=OBJECTS_ROOT):
+        self.document = document
+        self.directory = directory or os.path.join(SAVE_ROOT, document.name)
+        self.objects_root = objects_root
+        self.saved_version = None
+        self.stats = {}
+        self._dirty = {}  # chunk id -> document version when marked
+        self._everything = None  # document version when a whole-file change was marked
+        self._json = {}  # chunk id -> rendered bytes
+        self._map = {}
+        self._object_of = {}  # item chunk id -> object name
+        self._layouts = {}  # file path -> _Layout of what was written last
+        self._object_index = None
+        self._objects = {}  # relative path -> (size, mtime_ns) of the copied source
+        self._lock = threading.Lock()  # dirty bookkeeping, shared with the listener
+        self._save_lock = threading.Lock()  # one save at a time: caches, layouts, temp files
+        document.listeners.append(self._changed)
+
+    def close(self):
+        if self._changed in self.document.listeners:
+            self.document.listeners.remove(self._changed)
+
+    # dirty tracking
+
+    def _containers(self, root):
+        """Paths of the chunked sections in this version of the map."""
+        containers = []
+        for key in CHUNKED:
+            path = (".map", key)
+            if not isinstance(get_in(root, path), PMap):
+                path = (key,)
+            containers.append(path)
+        return containers
+
+    def _chunk_of(self, path, containers):
+        """
+        Chunk id an edit at `path` dirties: None when a chunked section itself (or a parent)
+        was replaced, () for the parts of a parent of a chunked section that are not in a
+        chunk (re-rendered on every save anyway).
+        """
+        for container in containers:
+            n = len(container)
+            if path[:n] == container:
+                return container + (path[n],) if len(path) > n else None
+            if container[:len(path)] == path:
+                return None
+        if any(container[0] == path[0] for container in containers):
+            return ()
+        return path[:1]
+
+    def _changed(self, document, paths):
+        containers = self._containers(document.root)
+        version = document.version
+        with self._lock:
+            for path in paths:
+                chunk = self._chunk_of(tuple(path), containers)
+                if chunk is None:
+                    self._everything = version
+                else:
+                    self._dirty[chunk] = version
+
+    # rendering
+
+    def _render(self, chunk, root):
+        """Re-render a chunk; False when it no longer exists."""
+        parent = get_in(root, chunk[:-1]) if len(chunk) > 1 else root
+        if not isinstance(parent, PMap) or chunk[-1] not in parent:
+            self._json.pop(chunk, None)
+            self._map.pop(chunk, None)
+            self._object_of.pop(chunk, None)
+            return False
+        value = parent[chunk[-1]]
+        self._json[chunk] = json_member(chunk[-1], value, len(chunk)).encode("utf-8")
+        self._map[chunk] = "".join(map_lines(chunk[-1], value, len(chunk) - 1, [])).encode("utf-8")
+        if isinstance(value, PMap) and isinstance(value.get("object"), str):
+            self._object_of[chunk] = value["object"]
+        return True
+
+    def _assemble(self, root, containers):
+        """
+        The parts of both files in order (bytes), each as (parts, {chunk: part number}).
+        Chunk parts come from the caches; everything between them is rendered here.
+        """
+        js, mp = [], []
+        js_index, mp_index = {}, {}
+
+        def block(node, path, level):
+            keys = node.keys()
+            chunked = path in containers
+            js.append(b"{")
+            for i, key in enumerate(keys):
+                child = path + (key,)
+                js.append((("\n" if i == 0 else ",\n") + " " * (JSON_INDENT * (level + 1))).encode())
+                if chunked or len(path) == 0 and not any(c[0] == key for c in containers):
+                    js_index[child] = len(js)
+                    js.append(self._json[child])
+                    mp_index[child] = len(mp)
+                    mp.append(self._map[child])
+                else:
+                    value = node[key]
+                    js.append((_json_scalar(str(key)) + ": ").encode("utf-8"))
+                    if isinstance(value, PMap):
+                        mp.append(f"{MAP_INDENT * level}{key} {{\n".encode("utf-8"))
+                        block(value, child, level + 1)
+                        mp.append(f"{MAP_INDENT * level}}}\n".encode())
+                    else:
+                        js.append(_json_scalar(value).encode("utf-8"))
+                        mp.append(f"{MAP_INDENT * level}{key}: {map_scalar(value)}\n".encode("utf-8"))
+            js.append((("\n" + " " * (JSON_INDENT * level)) if keys else "").encode() + b"}")
+
+        block(root, (), 0)
+        return (js, js_index), (mp, mp_index)
+
+    def _chunks(self, root, containers):
+        """Every chunk id of this version: top-level sections, and the children of chunked sections."""
+        chunks = []
+        for key, value in root.items():
+            if any(c[0] == key for c in containers):
+                for container in containers:
+                    if container[0] == key:
+                        section = get_in(root, container)
+                        if isinstance(section, PMap):
+                            chunks.extend(container + (k,) for k in section.keys())
+            else:
+                chunks.append((key,))
+        return chunks
+
+    def save(self, snapshot=None):
+        """Write what changed since the last save; returns False when nothing had changed."""
+        with self._save_lock:
+            snapshot = snapshot or self.document.snapshot()
+            if self.saved_version is not None and snapshot.version < self.saved_version:
+                return False  # a newer version was saved while this one waited
+            return self._save(snapshot)
+
+    def _save(self, snapshot):
+        t0 = time.perf_counter()
+        root, version = snapshot.root, snapshot.version
+        containers = self._containers(root)
+        with self._lock:
+            everything = self._everything is not None or not self._layouts
+            # marks made after the snapshot stay for the next save
+            dirty = [c for c, v in self._dirty.items() if v <= version]
+            for chunk in dirty:
+                del self._dirty[chunk]
+            if everything:
+                if self._everything is not None and self._everything <= version:
+                    self._everything = None
+                dirty = []
+        if not everything and not dirty:
+            self._sync_objects()
+            return False
+
+        # () marks a change between chunks; new or deleted chunks shift the layout
+        structural = everything or () in dirty
+        if everything:
+            self._json.clear()
+            self._map.clear()
+            self._object_of.clear()
+            dirty = self._chunks(root, containers)
+        for chunk in dirty:
+            if chunk:
+                known = chunk in self._json
+                if not self._render(chunk, root) or not known:
+                    structural = True
+        t1 = time.perf_counter()
+
+        os.makedirs(self.directory, exist_ok=True)
+        files = [os.path.join(self.directory, f"{self.document.name}.{ext}") for ext in ("json", "map")]
+        caches = (self._json, self._map)
+        patched = not structural and all(
+            self._layouts[path].matches(path) for path in files)
+        if patched:
+            for path, cache in zip(files, caches):
+                layout = self._layouts[path]
+                layout.patch(path, {layout.index[c]: cache[c] for c in dirty if c})
+        else:
+            for path, (parts, index) in zip(files, self._assemble(root, containers)):
+                replace_file(path, parts)
+                self._layouts[path] = _Layout(parts, index)
+        t2 = time.perf_counter()
+        copied = self._sync_objects()
+        self.saved_version = version
+        self.stats = {"rendered": sum(1 for c in dirty if c), "patched": patched, "render": t1 - t0,
+                      "write": t2 - t1, "objects": copied, "total": time.perf_counter() - t0}
+        return True
+
+    def write(self, snapshot, directory=None, name=None):
+        """Autosaver writer."""
+        return self.save(snapshot)
+
+    def autosaver(self, interval=None):
+        saver = Autosaver(self.document, self.directory, writer=self.write)
+        if interval is not None:
+            saver.interval = interval
+        return saver
+
+    # objects
+
+    def _index_objects(self):
+        index = {}
+        for folder, _, files in os.walk(self.objects_root):
+            for file in files:
+                if file.endswith(".lco"):
+                    index.setdefault(file[:-4], os.path.relpath(os.path.join(folder, file), self.objects_root))
+        self._object_index = index
+
+    def _sync_objects(self):
+        names = set(self._object_of.values())
+        if self._object_index is None or any(n not in self._object_index for n in names):
+            self._index_objects()
+        copied = []
+        for name in names:
+            rel = self._object_index.get(name)
+            if rel is None:
+                continue
+            src = os.path.join(self.objects_root, rel)
+            dst = os.path.join(self.directory, "objects", rel)
+            st = os.stat(src)
+            key = (st.st_size, st.st_mtime_ns)
+            if self._objects.get(rel) == key:
+                continue
+            try:
+                d = os.stat(dst)
+                if (d.st_size, d.st_mtime_ns) == key:
+                    self._objects[rel] = key
+                    continue
+            except FileNotFoundError:
+                pass
+            copied.append((rel, link_or_copy(src, dst)))
+            self._objects[rel] = key
+        return copied
+
+
+# run from the project root: python -m process.map.saver [items] [edits per save]
+if __name__ == "__main__":
+    import sys
+    import tempfile
+
+    from process.map.document import MapDocument, thaw
+    from process.trigger.dispatcher import synthetic_map
+    from res.compiler.compiler import parse_custom_format
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    edits = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+
+    doc = MapDocument(synthetic_map(count), "bench")
+    keys = list(doc.get(doc.section_path("items")).keys())
+    with tempfile.TemporaryDirectory() as tmp:
+        saver = ProjectSaver(doc, os.path.join(tmp, "bench"))
+        t0 = time.perf_counter()
+        saver.save()
+        print(f"{count} items, first save {(time.perf_counter() - t0) * 1000:.0f} ms, "
+              f"objects {saver.stats['objects']}, json {os.path.getsize(os.path.join(tmp, 'bench', 'bench.json')) >> 20} MiB")
+
+        times = []
+        for round_ in range(20):
+            for i in range(edits):
+                doc.set(doc.item_path(keys[(round_ * 7919 + i * 104729) % count]) + ("posX",), float(round_))
+            t0 = time.perf_counter()
+            saver.save()
+            times.append(time.perf_counter() - t0)
+        times.sort()
+        print(f"save after {edits} edits: median {times[10] * 1000:.1f} ms, max {times[-1] * 1000:.1f} ms "
+              f"(render {saver.stats['render'] * 1000:.1f} ms, write {saver.stats['write'] * 1000:.1f} ms)")
+        t0 = time.perf_counter()
+        saver.save()
+        print(f"save with nothing changed: {(time.perf_counter() - t0) * 1000:.2f} ms")
+
+        with open(os.path.join(tmp, "bench", "bench.json"), encoding="utf-8") as f:
+            ok_json = json.load(f) == thaw(doc.root)
+        with open(os.path.join(tmp, "bench", "bench.map"), encoding="utf-8") as f:
+            ok_map = parse_custom_format(f.read()) == thaw(doc.root)
+        print(f"json matches: {ok_json}, map round-trips: {ok_map}")
@@ -0,0 +1,404 @@
+# Spatial index over map items for picking, marquee selection and position-based effects.
+#
+# Items are stored as world-space axis-aligned boxes (object bounds rotated and placed
+# with posX/Y/Z, rotX/Y/Z) in a uniform grid over X/Y: maps are wide and shallow, so cells
+# are columns and Z is only checked by the exact per-item tests. A query touches the cells
+# its region overlaps (a ray walks its cells in order and stops at the first hit closer
+# than the next cell), so its cost depends on the items near the region rather than on the
+# size of the map. Moving an item only re-files it in the cells it left and entered.
+#
+# Boxes live in NumPy arrays indexed by slot, so the exact tests for all candidates of a
+# query are one vectorised comparison.
+
+import math
+
+import numpy as np
+
+from process.map.mapdata import map_items, item_position, item_rotation, euler_matrices, truss_spec
+
+DEFAULT_CELL = 120.0  # inches; a 10' truss section spans one or two cells
+INITIAL_CAPACITY = 1024
+BRUTE_FORCE_SHARE = 4  # box queries covering more than 1/4 of the occupied cells scan everything
+
+# local-space bounds of the non-truss objects, shared with the proxy meshes of res/render/stage
+FIXTURE_BOUNDS = ((-5.0, -5.0, -14.0), (5.0, 5.0, 0.0))
+MOVING_HEAD_BOUNDS = ((-7.0, -7.0, -18.0), (7.0, 7.0, 0.0))
+OBJECT_BOUNDS = ((-6.0, -6.0, 0.0), (6.0, 6.0, 12.0))
+
+
+def object_bounds(name):
+    """Local-space (lo, hi) box of an object (trusses run along +Y from the origin)."""
+    truss = truss_spec(name)
+    if truss:
+        width, length, _ = truss
+        return (-width / 2, 0.0, -width / 2), (width / 2, length, width / 2)
+    if "Light" in (name or ""):
+        return MOVING_HEAD_BOUNDS if "MovingHead" in name else FIXTURE_BOUNDS
+    return OBJECT_BOUNDS
+
+
+def world_bounds(lo, hi, positions, rotations):
+    """World (lo, hi) arrays of (n,) local boxes rotated by rotX/Y/Z and moved to positions."""
+    lo, hi = np.asarray(lo, np.float64).reshape(-1, 3), np.asarray(hi, np.float64).reshape(-1, 3)
+    rotation = euler_matrices(rotations)
+    center = np.einsum("nij,nj->ni", rotation, (lo + hi) / 2) + np.asarray(positions, np.float64).reshape(-1, 3)
+    extent = np.einsum("nij,nj->ni", np.abs(rotation), (hi - lo) / 2)
+    return center - extent, center + extent
+
+
+class SpatialIndex:
+    """
+    Uniform X/Y grid of item boxes keyed by item key.
+
+        index = SpatialIndex.from_map(parsed)
+        index.query_box((0, 0, -1e9), (500, 500, 1e9))
+        index.nearest((120, 40, 0), k=4)
+        index.pick(origin, direction)
+    """
+
+    def __init__(self, cell=DEFAULT_CELL):
+        self.cell = float(cell)
+        self.cells = {}  # (ix, iy) -> set of slots
+        self.extent = None  # [ix0, iy0, ix1, iy1] covering every cell ever used; grows only
+        self.zrange = [np.inf, -np.inf]  # likewise for Z
+        self.slots = {}  # key -> slot
+        self.keys = []
+        self.free = []
+        self.count = 0
+        self._allocate(INITIAL_CAPACITY)
+
+    def _allocate(self, capacity):
+        used = len(self.keys)
+        lo = np.full((capacity, 3), np.inf)
+        hi = np.full((capacity, 3), -np.inf)
+        span = np.zeros((capacity, 4), np.int64)
+        if used:
+            lo[:used], hi[:used], span[:used] = self.lo[:used], self.hi[:used], self.span[:used]
+        self.lo, self.hi, self.span = lo, hi, span
+
+    @classmethod
+    def from_map(cls, parsed, cell=DEFAULT_CELL, bounds=object_bounds):
+        index = cls(cell)
+        items = map_items(parsed)
+        keys = list(items)
+        local = [bounds(item.get("object")) for item in items.values()]
+        lo, hi = world_bounds([b[0] for b in local], [b[1] for b in local],
+                              [item_position(item) for item in items.values()],
+                              [item_rotation(item) for item in items.values()])
+        index.extend(keys, lo, hi)
+        return index
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, key):
+        return key in self.slots
+
+    ##########################
+    # EDITING
+    ##########################
+
+    def _cell_span(self, lo, hi):
+        c = self.cell
+        return (math.floor(lo[0] / c), math.floor(lo[1] / c), math.floor(hi[0] / c), math.floor(hi[1] / c))
+
+    def _file(self, slot, span):
+        cells = self.cells
+        extent = self.extent
+        if extent is None:
+            self.extent = list(span)
+        elif span[0] < extent[0] or span[1] < extent[1] or span[2] > extent[2] or span[3] > extent[3]:
+            self.extent = [min(extent[0], span[0]), min(extent[1], span[1]), max(extent[2], span[2]), max(extent[3], span[3])]
+        for ix in range(span[0], span[2] + 1):
+            for iy in range(span[1], span[3] + 1):
+                bucket = cells.get((ix, iy))
+                if bucket is None:
+                    cells[(ix, iy)] = {slot}
+                else:
+                    bucket.add(slot)
+
+    def _unfile(self, slot, span):
+        cells = self.cells
+        for ix in range(span[0], span[2] + 1):
+            for iy in range(span[1], span[3] + 1):
+                bucket = cells[(ix, iy)]
+                bucket.discard(slot)
+                if not bucket:
+                    del cells[(ix, iy)]
+
+    def insert(self, key, lo, hi):
+        """Add `key` with world box (lo, hi), or move it there if it is already indexed."""
+        if key in self.slots:
+            return self.update(key, lo, hi)
+        if self.free:
+            slot = self.free.pop()
+            self.keys[slot] = key
+        else:
+            slot = len(self.keys)
+            if slot == len(self.lo):
+                self._allocate(2 * len(self.lo))
+            self.keys.append(key)
+        self.slots[key] = slot
+        self.lo[slot], self.hi[slot] = lo, hi
+        span = self._cell_span(self.lo[slot], self.hi[slot])
+        self.span[slot] = span
+        self._file(slot, span)
+        self._grow_z(slot)
+        self.count += 1
+        return slot
+
+    def extend(self, keys, lo, hi):
+        for key, l, h in zip(keys, lo, hi):
+            self.insert(key, l, h)
+
+    def update(self, key, lo, hi):
+        slot = self.slots[key]
+        self.lo[slot], self.hi[slot] = lo, hi
+        span = self._cell_span(self.lo[slot], self.hi[slot])
+        old = tuple(self.span[slot].tolist())
+        if span != old:
+            self._unfile(slot, old)
+            self._file(slot, span)
+            self.span[slot] = span
+        self._grow_z(slot)
+        return slot
+
+    def _grow_z(self, slot):
+        z = self.zrange
+        z[0], z[1] = min(z[0], self.lo[slot, 2]), max(z[1], self.hi[slot, 2])
+
+    def update_item(self, key, item, bounds=object_bounds):
+        """Re-index a map item after its object, position or rotation changed."""
+        lo, hi = bounds(item.get("object"))
+        wlo, whi = world_bounds(lo, hi, item_position(item), item_rotation(item))
+        return self.insert(key, wlo[0], whi[0])
+
+    def remove(self, key):
+        slot = self.slots.pop(key)
+        self._unfile(slot, tuple(self.span[slot].tolist()))
+        self.lo[slot], self.hi[slot] = np.inf, -np.inf
+        self.keys[slot] = None
+        self.free.append(slot)
+        self.count -= 1
+
+    def bounds(self, key):
+        slot = self.slots[key]
+        return self.lo[slot].copy(), self.hi[slot].copy()
+
+    ##########################
+    # QUERIES
+    ##########################
+
+    def _candidates(self, ix0, iy0, ix1, iy1):
+        cells = self.cells
+        if (ix1 - ix0 + 1) * (iy1 - iy0 + 1) * BRUTE_FORCE_SHARE > len(cells):
+            # every live slot; freed ones are parked at lo = inf, hi = -inf
+            n = len(self.keys)
+            return np.flatnonzero(self.hi[:n, 0] >= self.lo[:n, 0])
+        found = set()
+        for ix in range(ix0, ix1 + 1):
+            for iy in range(iy0, iy1 + 1):
+                bucket = cells.get((ix, iy))
+                if bucket:
+                    found.update(bucket)
+        return np.fromiter(found, np.intp, len(found))
+
+    def query_box(self, lo, hi, inside=False):
+        """Keys whose box overlaps (lo, hi); with `inside`, only those entirely within it."""
+        lo, hi = np.asarray(lo, np.float64), np.asarray(hi, np.float64)
+        slots = self._candidates(*self._cell_span(lo, hi))
+        if inside:
+            hit = np.all((self.lo[slots] >= lo) & (self.hi[slots] <= hi), axis=1)
+        else:
+            hit = np.all((self.lo[slots] <= hi) & (self.hi[slots] >= lo), axis=1)
+        return [self.keys[s] for s in slots[hit].tolist()]
+
+    def query_radius(self, center, radius):
+        """Keys whose box is within `radius` of `center`."""
+        center = np.asarray(center, np.float64)
+        slots = self._candidates(*self._cell_span(center - radius, center + radius))
+        hit = self._distance(slots, center) <= radius
+        return [self.keys[s] for s in slots[hit].tolist()]
+
+    def _distance(self, slots, point):
+        gap = np.maximum(np.maximum(self.lo[slots] - point, point - self.hi[slots]), 0.0)
+        return np.sqrt((gap * gap).sum(axis=1))
+
+    def nearest(self, point, k=1):
+        """[(distance, key)] of the `k` items whose boxes are closest to `point`, nearest first."""
+        if not self.count:
+            return []
+        point = np.asarray(point, np.float64)
+        cx, cy = math.floor(point[0] / self.cell), math.floor(point[1] / self.cell)
+        x0, y0, x1, y1 = self.extent
+        reach = max(abs(x0 - cx), abs(x1 - cx), abs(y0 - cy), abs(y1 - cy))
+        seen = set()
+        best = np.empty(0)
+        best_slots = np.empty(0, np.intp)
+        for ring in range(reach + 1):
+            # rings 0 .. ring - 1 are done; anything further is at least ring - 1 cells away in X/Y
+            if len(best) >= k and best[-1] <= (ring - 1) * self.cell:
+                break
+            new = []
+            for ix in range(cx - ring, cx + ring + 1):
+                for iy in ((cy - ring, cy + ring) if abs(ix - cx) != ring else range(cy - ring, cy + ring + 1)):
+                    bucket = self.cells.get((ix, iy))
+                    if bucket:
+                        new.extend(s for s in bucket if s not in seen)
+            if not new:
+                continue
+            new = np.unique(np.array(new, np.intp))
+            seen.update(new.tolist())
+            best = np.concatenate([best, self._distance(new, point)])
+            best_slots = np.concatenate([best_slots, new])
+            order = np.argsort(best, kind="stable")[:k]
+            best, best_slots = best[order], best_slots[order]
+        return [(float(d), self.keys[s]) for d, s in zip(best, best_slots.tolist())]
+
+    def _ray_hits(self, slots, origin, inverse):
+        """Entry distance along the ray of each slot's box (inf when missed)."""
+        with np.errstate(invalid="ignore"):
+            t0 = (self.lo[slots] - origin) * inverse
+            t1 = (self.hi[slots] - origin) * inverse
+        # a zero direction component gives nan when the origin is on a face: treat as inside
+        near = np.nan_to_num(np.minimum(t0, t1), nan=-np.inf).max(axis=1)
+        far = np.nan_to_num(np.maximum(t0, t1), nan=np.inf).min(axis=1)
+        near = np.maximum(near, 0.0)
+        return np.where(near <= far, near, np.inf)
+
+    def pick(self, origin, direction, max_distance=np.inf):
+        """(distance, key) of the first box hit by the ray, or None. `direction` need not be unit length."""
+        if not self.count:
+            return None
+        origin = np.asarray(origin, np.float64)
+        direction = np.asarray(direction, np.float64)
+        direction = direction / np.linalg.norm(direction)
+        with np.errstate(divide="ignore"):
+            inverse = 1.0 / direction
+
+        # walk the grid columns the ray crosses (Amanatides & Woo), within the occupied area
+        xmin, ymin, xmax, ymax = self.extent
+        c = self.cell
+        t_enter, t_exit = 0.0, max_distance
+        for axis, lo, hi in ((0, xmin * c, (xmax + 1) * c), (1, ymin * c, (ymax + 1) * c), (2, *self.zrange)):
+            if direction[axis] == 0.0:
+                if not lo <= origin[axis] <= hi:
+                    return None
+                continue
+            a, b = sorted(((lo - origin[axis]) * inverse[axis], (hi - origin[axis]) * inverse[axis]))
+            t_enter, t_exit = max(t_enter, a), min(t_exit, b)
+        if t_enter > t_exit:
+            return None
+
+        start = origin + direction * t_enter
+        ix = min(max(math.floor(start[0] / c), xmin), xmax)
+        iy = min(max(math.floor(start[1] / c), ymin), ymax)
+        step, t_max, t_delta = [], [], []
+        for axis, i in ((0, ix), (1, iy)):
+            d = direction[axis]
+            if d > 0:
+                step.append(1)
+                t_max.append(((i + 1) * c - origin[axis]) * inverse[axis])
+            elif d < 0:
+                step.append(-1)
+                t_max.append((i * c - origin[axis]) * inverse[axis])
+            else:
+                step.append(0)
+                t_max.append(np.inf)
+            t_delta.append(abs(c * inverse[axis]) if d else np.inf)
+
+        tested = set()
+        best_t, best_slot = np.inf, None
+        while True:
+            bucket = self.cells.get((ix, iy))
+            if bucket:
+                new = [s for s in bucket if s not in tested]
+                if new:
+                    tested.update(new)
+                    slots = np.array(new, np.intp)
+                    t = self._ray_hits(slots, origin, inverse)
+                    i = int(np.argmin(t))
+                    if t[i] < best_t:
+                        best_t, best_slot = float(t[i]), int(slots[i])
+            cell_exit = min(t_max)
+            if best_t <= cell_exit or cell_exit > t_exit:
+                break
+            if t_max[0] < t_max[1]:
+                ix += step[0]
+                t_max[0] += t_delta[0]
+            else:
+                iy += step[1]
+                t_max[1] += t_delta[1]
+        if best_slot is None or best_t > max_distance:
+            return None
+        return best_t, self.keys[best_slot]
+
+
+def random_items(count, extent=20000.0, seed=0):
+    """(keys, lo, hi) of `count` lights and trusses scattered over an extent x extent floor."""
+    rng = np.random.default_rng(seed)
+    positions = np.column_stack([rng.random(count) * extent, rng.random(count) * extent, rng.random(count) * 480])
+    rotations = np.zeros((count, 3))
+    truss = rng.random(count) < 0.2
+    rotations[truss, 2] = rng.choice([0.0, 90.0], truss.sum())
+    lo = np.where(truss[:, None], object_bounds("24SquareTruss_med")[0], FIXTURE_BOUNDS[0])
+    hi = np.where(truss[:, None], object_bounds("24SquareTruss_med")[1], FIXTURE_BOUNDS[1])
+    wlo, whi = world_bounds(lo, hi, positions, rotations)
+    return [f"item.i{i}" for i in range(count)], wlo, whi
+
+
+# run from the project root: python -m process.map.spatial [items] [queries]
+if __name__ == "__main__":
+    import sys
+    import time
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    queries = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    extent = 20000.0
+
+    keys, lo, hi = random_items(count, extent)
+    t0 = time.perf_counter()
+    index = SpatialIndex()
+    index.extend(keys, lo, hi)
+    print(f"{count} items, {len(index.cells)} cells: built in {time.perf_counter() - t0:.2f}s")
+
+    rng = np.random.default_rng(1)
+
+    def bench(label, fn, brute, same):
+        args = [rng.random(3) * (extent, extent, 480.0) for _ in range(queries)]
+        t0 = time.perf_counter()
+        results = [fn(a) for a in args]
+        t1 = time.perf_counter()
+        expected = [brute(a) for a in args[:20]]
+        t2 = time.perf_counter()
+        assert all(same(r, e) for r, e in zip(results, expected)), label
+        print(f"{label:<28}{(t1 - t0) / queries * 1e6:>9.1f} us   (linear scan {(t2 - t1) / 20 * 1e6:>9.1f} us)")
+
+    marquee = np.array([600.0, 600.0, 1e9])
+    down = np.array([0.3, 0.2, -1.0])
+    above = np.array([0.0, 0.0, 2000.0])
+
+    def brute_box(a):
+        hit = np.all((lo <= a + marquee) & (hi >= a - marquee), axis=1)
+        return sorted(keys[i] for i in np.flatnonzero(hit))
+
+    def brute_knn(a):
+        gap = np.maximum(np.maximum(lo - a, a - hi), 0.0)
+        return np.sort(np.sqrt((gap * gap).sum(axis=1)))[:8]
+
+    def brute_pick(a):
+        t = index._ray_hits(np.arange(len(index.keys)), a + above, 1.0 / (down / np.linalg.norm(down)))
+        return t.min()
+
+    bench("box query (100' marquee)", lambda a: index.query_box(a - marquee, a + marquee), brute_box,
+          lambda r, e: sorted(r) == e)
+    bench("8 nearest", lambda a: index.nearest(a, 8), brute_knn,
+          lambda r, e: np.allclose([d for d, _ in r], e))
+    bench("ray pick", lambda a: index.pick(a + above, down), brute_pick,
+          lambda r, e: (r is None and e == np.inf) or (r is not None and np.isclose(r[0], e)))
+
+    moves = rng.random((queries, 3)) * 240
+    t0 = time.perf_counter()
+    for i in range(queries):
+        index.update(keys[i], lo[i] + moves[i], hi[i] + moves[i])
+    print(f"{'move item':<28}{(time.perf_counter() - t0) / queries * 1e6:>9.1f} us")
@@ -0,0 +1,355 @@
+# Art-Net / sACN (E1.31) output for LightCommander.
+#
+# Channel data lives in one (universes, 512) uint8 buffer. Every patched universe owns a
+# prebuilt packet inside a single bytearray; each frame only the dmx payload and the
+# sequence byte are patched in place, and only universes that changed (or are due a
+# keepalive) are sent. One socket is opened per interface and all of its universes are
+# sent back to back from it.
+
+import socket
+import time
+import uuid
+
+import numpy as np
+
+try:
+    from tracing import span, counter
+except ImportError:  # used on its own, outside the app
+    from contextlib import nullcontext as span
+
+    def counter(name, value):
+        pass
+
+##########################
+# CONSTANTS
+##########################
+
+DMX_SLOTS = 512
+
+ARTNET_PORT = 6454
+ARTNET_ID = b"Art-Net\x00"
+ARTNET_OP_DMX = 0x5000
+ARTNET_PROTOCOL = 14
+ARTNET_HEADER = 18
+ARTNET_SEQ = 12
+
+SACN_PORT = 5568
+SACN_ID = b"ASC-E1.17\x00\x00\x00"
+SACN_HEADER = 126
+SACN_SEQ = 111
+SACN_PRIORITY = 100
+SACN_VECTOR_ROOT = 0x00000004  # VECTOR_ROOT_E131_DATA
+SACN_VECTOR_FRAMING = 0x00000002  # VECTOR_E131_DATA_PACKET
+
+DEFAULT_KEEPALIVE = 1.0  # seconds between resends of an unchanged universe
+
+
+def make_universe_buffer(count):
+    """Allocate the channel buffer for `count` universes."""
+    return np.zeros((count, DMX_SLOTS), dtype=np.uint8)
+
+
+def rack_interfaces(rack):
+    """
+    List the network ports declared by a compiled rack file (.lcrck -> dict).
+    Accepts both `group network {}` style groups and `network_N { type: ethernet }` ports.
+    Returns a list of (name, speed) with speed in kbit/s (None if not declared).
+    """
+    ports = []
+    connection = rack.get("connection") or {}
+    for name, port in connection.items():
+        if not isinstance(port, dict):
+            continue
+        if name.startswith("group.network") or name.startswith("network") or port.get("type") == "ethernet":
+            props = port.get("properties") or {}
+            ports.append((name, props.get("speed")))
+    return ports
+
+
+##########################
+# PACKETS
+##########################
+
+def artnet_header(universe):
+    """ArtDmx header for a 15-bit port address, 512 slots."""
+    hdr = bytearray(ARTNET_HEADER)
+    hdr[0:8] = ARTNET_ID
+    hdr[8:10] = ARTNET_OP_DMX.to_bytes(2, "little")
+    hdr[10:12] = ARTNET_PROTOCOL.to_bytes(2, "big")
+    hdr[12] = 0  # sequence
+    hdr[13] = 0  # physical
+    hdr[14] = universe & 0xff  # SubUni
+    hdr[15] = (universe >> 8) & 0x7f  # Net
+    hdr[16:18] = DMX_SLOTS.to_bytes(2, "big")
+    return hdr
+
+
+def sacn_header(universe, cid, source_name="LightCommander", priority=SACN_PRIORITY):
+    """E1.31 data packet header (root, framing and DMP layers) for 512 slots."""
+    total = SACN_HEADER + DMX_SLOTS
+    hdr = bytearray(SACN_HEADER)
+    hdr[0:2] = (0x0010).to_bytes(2, "big")  # preamble size
+    hdr[2:4] = (0x0000).to_bytes(2, "big")  # postamble size
+    hdr[4:16] = SACN_ID
+    hdr[16:18] = (0x7000 | (total - 16)).to_bytes(2, "big")
+    hdr[18:22] = SACN_VECTOR_ROOT.to_bytes(4, "big")
+    hdr[22:38] = cid
+    # framing layer
+    hdr[38:40] = (0x7000 | (total - 38)).to_bytes(2, "big")
+    hdr[40:44] = SACN_VECTOR_FRAMING.to_bytes(4, "big")
+    name = source_name.encode("utf-8")[:63]
+    hdr[44:44 + len(name)] = name
+    hdr[108] = priority
+    hdr[109:111] = (0).to_bytes(2, "big")  # sync address
+    hdr[SACN_SEQ] = 0
+    hdr[112] = 0  # options
+    hdr[113:115] = universe.to_bytes(2, "big")
+    # DMP layer
+    hdr[115:117] = (0x7000 | (total - 115)).to_bytes(2, "big")
+    hdr[117] = 0x02  # VECTOR_DMP_SET_PROPERTY
+    hdr[118] = 0xa1  # address & data type
+    hdr[119:121] = (0x0000).to_bytes(2, "big")  # first property address
+    hdr[121:123] = (0x0001).to_bytes(2, "big")  # address increment
+    hdr[123:125] = (DMX_SLOTS + 1).to_bytes(2, "big")  # property count incl. start code
+    hdr[125] = 0x00  # DMX start code
+    return hdr
+
+
+def sacn_multicast(universe):
+    return f"239.255.{(universe >> 8) & 0xff}.{universe & 0xff}"
+
+
+##########################
+# SINK
+##########################
+
+class OutputSink:
+    """
+    Sends rows of a (universes, 512) channel buffer as Art-Net or sACN.
+
+    protocol    "artnet" or "sacn"
+    interface   local address the socket is bound to ("0.0.0.0" for any)
+    keepalive   seconds after which an unchanged universe is sent again
+    port        destination port override (defaults to the protocol port)
+    """
+
+    def __init__(self, protocol="artnet", interface="0.0.0.0", keepalive=DEFAULT_KEEPALIVE, port=None,
+                 source_name="LightCommander", priority=SACN_PRIORITY):
+        if protocol not in ("artnet", "sacn"):
+            raise ValueError(f"unknown output protocol '{protocol}'")
+        self.protocol = protocol
+        self.interface = interface
+        self.keepalive = keepalive
+        self.port = port if port is not None else (ARTNET_PORT if protocol == "artnet" else SACN_PORT)
+        self.source_name = source_name
+        self.priority = priority
+        self.cid = uuid.uuid4().bytes
+        self.header_size = ARTNET_HEADER if protocol == "artnet" else SACN_HEADER
+        self.seq_offset = ARTNET_SEQ if protocol == "artnet" else SACN_SEQ
+        self.packet_size = self.header_size + DMX_SLOTS
+
+        self.rows = np.zeros(0, dtype=np.intp)  # buffer row per patched universe
+        self.universes = []
+        self.destinations = []
+        self.packets = bytearray()
+        self.view = np.zeros((0, self.packet_size), dtype=np.uint8)
+        self.last_sent = np.zeros(0, dtype=np.float64)
+        self.sequence = 0
+        self.frames = 0
+        self.sent = 0
+        self.skipped = 0
+        self.errors = 0  # packets the socket refused
+        self.sock = None
+
+    def open(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 4 * 1024 * 1024)
+        if self.protocol == "artnet":
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+        else:
+            sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, 8)
+            if self.interface != "0.0.0.0":
+                sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_IF, socket.inet_aton(self.interface))
+        sock.bind((self.interface, 0))
+        self.sock = sock
+        return self
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def patch(self, universe, row=None, destination=None):
+        """
+        Route buffer row `row` (defaults to `universe`) out as `universe`.
+        Art-Net defaults to broadcast, sACN to the universe's multicast group.
+        """
+        if row is None:
+            row = universe
+        if destination is None:
+            destination = "255.255.255.255" if self.protocol == "artnet" else sacn_multicast(universe)
+
+        if self.protocol == "artnet":
+            hdr = artnet_header(universe)
+        else:
+            hdr = sacn_header(universe, self.cid, self.source_name, self.priority)
+
+        self.universes.append(universe)
+        self.destinations.append((destination, self.port))
+        self.rows = np.append(self.rows, row).astype(np.intp)
+        self.last_sent = np.append(self.last_sent, -np.inf)
+        # build a new bytearray: the old one is still exported through self.view
+        self.packets = self.packets + hdr + bytes(DMX_SLOTS)
+        self.view = np.frombuffer(self.packets, dtype=np.uint8).reshape(-1, self.packet_size)
+
+    def send(self, buffer, now=None):
+        """
+        Send every patched universe whose data differs from the last frame or whose
+        keepalive expired. Returns the number of packets sent. A universe whose packet the
+        socket refuses stays due for the next frame; the rest of the frame is still sent,
+        then the first error is raised.
+        """
+        if now is None:
+            now = time.monotonic()
+        if not self.universes:
+            return 0
+        with span("dmx.frame"):
+            sent = self._send(buffer, now)
+        counter("dmx.sent", sent)
+        return sent
+
+    def _send(self, buffer, now):
+        data = self.view[:, self.header_size:]
+        frame = buffer[self.rows]
+        due = np.any(data != frame, axis=1) | (now - self.last_sent >= self.keepalive)
+        idx = np.flatnonzero(due)
+        self.frames += 1
+        self.skipped += len(self.universes) - idx.size
+        if idx.size == 0:
+            return 0
+
+        self.sequence = self.sequence % 255 + 1  # 0 disables sequencing, so wrap to 1
+        data[idx] = frame[idx]
+        self.view[idx, self.seq_offset] = self.sequence
+        self.last_sent[idx] = now
+
+        sendto = self.sock.sendto
+        packets = memoryview(self.packets)
+        size = self.packet_size
+        destinations = self.destinations
+        error = None
+        failed = 0
+        for i in idx.tolist():
+            try:
+                sendto(packets[i * size:(i + 1) * size], destinations[i])
+            except OSError as e:  # e.g. ENETUNREACH on one interface
+                self.last_sent[i] = -np.inf  # not delivered: due again next frame
+                failed += 1
+                error = error or e
+        self.errors += failed
+        self.sent += idx.size - failed
+        if error is not None:
+            raise error
+        return idx.size
+
+
+class OutputRouter:
+    """Holds one OutputSink per (protocol, interface) so each interface sends from a single socket."""
+
+    def __init__(self, keepalive=DEFAULT_KEEPALIVE):
+        self.keepalive = keepalive
+        self.sinks = {}
+
+    def sink(self, protocol="artnet", interface="0.0.0.0", **kwargs):
+        key = (protocol, interface)
+        if key not in self.sinks:
+            kwargs.setdefault("keepalive", self.keepalive)
+            self.sinks[key] = OutputSink(protocol, interface, **kwargs).open()
+        return self.sinks[key]
+
+    def send(self, buffer, now=None):
+        if now is None:
+            now = time.monotonic()
+        return sum(sink.send(buffer, now) for sink in self.sinks.values())
+
+    def close(self):
+        for sink in self.sinks.values():
+            sink.close()
+        self.sinks = {}
+
+
+##########################
+# BENCHMARK
+##########################
+
+def _listener():
+    """Local UDP stand-in for a node: counts datagrams on a loopback port until closed."""
+    import threading
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 8 * 1024 * 1024)
+    sock.bind(("127.0.0.1", 0))
+    sock.settimeout(0.2)
+    stats = {"packets": 0, "bytes": 0, "running": True}
+
+    def run():
+        while stats["running"]:
+            try:
+                data = sock.recv(2048)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            stats["packets"] += 1
+            stats["bytes"] += len(data)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return sock, stats, thread
+
+
+def benchmark(universes=256, rate=44, seconds=3.0, protocol="sacn"):
+    listener, stats, thread = _listener()
+    port = listener.getsockname()[1]
+    buffer = make_universe_buffer(universes)
+    frames = int(rate * seconds)
+
+    with OutputSink(protocol, "127.0.0.1", port=port) as sink:
+        for u in range(universes):
+            sink.patch(u + 1, row=u, destination="127.0.0.1")
+
+        cpu = 0.0
+        start = time.perf_counter()
+        for f in range(frames):
+            buffer[:, f % DMX_SLOTS] = f & 0xff  # touch every universe
+            t0 = time.process_time()
+            sink.send(buffer)
+            cpu += time.process_time() - t0
+            wait = start + (f + 1) / rate - time.perf_counter()
+            if wait > 0:
+                time.sleep(wait)
+        wall = time.perf_counter() - start
+
+    time.sleep(0.3)
+    stats["running"] = False
+    thread.join()
+    listener.close()
+
+    packets = frames * universes
+    print(f"{protocol}: {universes} universes @ {rate} Hz for {frames} frames")
+    print(f"  sent {sink.sent}/{packets} packets, listener received {stats['packets']}")
+    print(f"  send cpu per frame: {cpu / frames * 1000:.3f} ms  (budget {1000 / rate:.2f} ms)")
+    print(f"  core load: {cpu / wall * 100:.1f}%")
+
+
+if __name__ == "__main__":
+    import sys
+
+    benchmark(universes=int(sys.argv[1]) if len(sys.argv) > 1 else 256,
+              protocol=sys.argv[2] if len(sys.argv) > 2 else "sacn")
@@ -0,0 +1,455 @@
+# Pyro cue scheduling.
+#
+# A show's pyro cues say when an effect should be *seen*. compile_show() turns them into
+# arrays sorted by *ignition* time: each effect's lift/delay (time from the e-match firing
+# to the visible effect: shell flight for airbursts, a few frames for comets and mines,
+# the valve and ignition delay of a flame projector) is subtracted once, ahead of time.
+# Ignition times are converted to audio samples, so the show clock is the playback
+# position of the track, not the wall clock.
+#
+# Interlocks are per group (a zone or a firing module): windows in which the group must
+# not fire (performer in the zone, a lift moving), a minimum gap between fires
+# (flame projector refill) and an arm switch. The blocked windows of a group are merged
+# and kept as sorted arrays, so "may this group fire at t" is a bisection; compile_show()
+# checks the whole show at once with searchsorted and reports every violation.
+#
+# At runtime PyroScheduler.poll(sample) is called from the audio callback once per block.
+# Due cues go into a timer wheel of heaps (one slot per block, cues too far ahead wait in an
+# overflow heap until the wheel reaches them), so a poll only touches the slots the clock
+# has passed. Each firing reports its offset inside the block, for hardware that takes
+# timestamped fire commands, and how late the dispatch was, histogrammed at 1 ms.
+
+import bisect
+import heapq
+import os
+import time
+from collections import namedtuple
+from pathlib import Path
+
+import numpy as np
+
+import tracing
+
+from res.compiler.library import ObjectLibrary
+
+EFFECT_ROOT = os.path.join("res", "objects", "obj-effect", "pyro")
+RATE = 48000
+BLOCK = 256
+WHEEL_SLOTS = 512  # slots of one block each: ~2.7 s of look-ahead at 48 kHz
+MIN_GAP = 0.0  # default seconds between two fires of one group
+
+# seconds from ignition to the visible effect, and how long it lasts, by effect family
+# (folder under obj-effect/pyro); an .fx file may override both with `lift:`/`duration:`
+FAMILY_TIMING = {
+    "airburst": (2.2, 1.5),
+    "comet": (0.12, 1.2),
+    "flame-projector": (0.08, 1.0),
+    "flare": (0.3, 30.0),
+    "flash-curtain": (0.03, 0.3),
+    "flash-tube": (0.02, 0.2),
+    "gerb": (0.15, 5.0),
+    "ice-fountain": (0.25, 10.0),
+    "line-rocket": (0.3, 1.5),
+    "mine": (0.06, 1.0),
+    "mine-comet": (0.08, 1.5),
+    "mortar-hit": (2.0, 1.5),
+    "multi-i": (0.3, 8.0),
+    "multi-t": (0.3, 8.0),
+    "saxon": (0.2, 6.0),
+    "smoke-cart": (1.0, 20.0),
+    "smoke-cookie": (1.5, 30.0),
+    "strobe-pot": (0.1, 10.0),
+}
+DEFAULT_TIMING = (0.1, 1.0)
+
+Effect = namedtuple("Effect", "name family lift duration")
+Cue = namedtuple("Cue", "time effect address group")  # time: seconds the effect is visible
+
+
+##########################
+# EFFECTS
+##########################
+
+def load_effects(root=EFFECT_ROOT):
+    """{name: Effect} for every .fx under `root` (`inherits:` resolved)."""
+    effects = {}
+    root = Path(root)
+    library = ObjectLibrary([root], (".fx",))
+    for name, parsed in library.items():
+        path = library.paths[name]
+        family = path.relative_to(root).parts[0]
+        lift, duration = FAMILY_TIMING.get(family, DEFAULT_TIMING)
+        block = parsed.get(".fx", parsed)
+        if isinstance(block, dict):
+            lift = float(block.get("lift", lift))
+            duration = float(block.get("duration", duration))
+        effects[path.stem] = Effect(path.stem, family, lift, duration)
+    return effects
+
+
+##########################
+# INTERLOCKS
+##########################
+
+class Interlocks:
+    """
+    Per-group firing rules: blocked windows (seconds, show time), a minimum gap between
+    fires and an arm switch. Groups without rules may always fire.
+    """
+
+    def __init__(self):
+        self._windows = {}  # group -> [(start, end)]
+        self._merged = {}  # group -> (starts, ends) arrays, rebuilt on change
+        self.min_gap = {}
+        self.disarmed = set()
+
+    def block(self, group, start, end):
+        self._windows.setdefault(group, []).append((float(start), float(end)))
+        self._merged.pop(group, None)
+
+    def set_min_gap(self, group, seconds):
+        self.min_gap[group] = float(seconds)
+
+    def arm(self, group, armed=True):
+        if armed:
+            self.disarmed.discard(group)
+        else:
+            self.disarmed.add(group)
+
+    def windows(self, group):
+        """Merged, sorted (starts, ends) of the group's blocked windows."""
+        merged = self._merged.get(group)
+        if merged is None:
+            spans = []
+            for start, end in sorted(self._windows.get(group, ())):
+                if spans and start <= spans[-1][1]:
+                    spans[-1][1] = max(spans[-1][1], end)
+                else:
+                    spans.append([start, end])
+            merged = (np.array([s for s, _ in spans], np.float64), np.array([e for _, e in spans], np.float64))
+            self._merged[group] = merged
+        return merged
+
+    def allowed(self, group, t):
+        """May `group` fire at show time `t`? O(log windows)."""
+        if group in self.disarmed:
+            return False
+        starts, ends = self.windows(group)
+        i = bisect.bisect_right(starts, t) - 1
+        return i < 0 or t >= ends[i]
+
+    def blocked(self, group, times):
+        """Boolean mask over `times` (sorted or not): inside a blocked window of `group`."""
+        starts, ends = self.windows(group)
+        if not len(starts):
+            return np.zeros(len(times), bool)
+        i = np.searchsorted(starts, times, side="right") - 1
+        return (i >= 0) & (times < ends[np.maximum(i, 0)])
+
+
+##########################
+# COMPILED SHOW
+##########################
+
+class PyroShow:
+    """
+    Cues sorted by ignition. Arrays (one entry per cue): `fire` (samples), `visible`
+    (seconds), `effect`, `address`, `group` (indexes into effect_names/group_names),
+    `cue` (index into the original list).
+    """
+
+    def __init__(self, fire, visible, effect, address, group, cue, effect_names, group_names, rate):
+        self.fire, self.visible, self.effect = fire, visible, effect
+        self.address, self.group, self.cue = address, group, cue
+        self.effect_names, self.group_names, self.rate = effect_names, group_names, rate
+        self.violations = []
+
+    def __len__(self):
+        return len(self.fire)
+
+    def fire_time(self, i):
+        return self.fire[i] / self.rate
+
+
+def compile_show(cues, effects, interlocks=None, rate=RATE, strict=False):
+    """
+    Compile `cues` (Cue or (time, effect, address, group) tuples) against `effects`
+    ({name: Effect}). Violations (unknown effect, ignition before 0, a blocked window or a
+    gap shorter than the group's min_gap) are collected on show.violations as
+    (cue index, reason); with strict=True the first one raises ValueError.
+    """
+    with tracing.span("pyro.compile"):
+        count = len(cues)
+        effect_names, effect_ids = [], {}
+        group_names, group_ids = [], {}
+        visible = np.empty(count, np.float64)
+        lift = np.empty(count, np.float64)
+        effect = np.empty(count, np.int32)
+        group = np.empty(count, np.int32)
+        address = np.empty(count, object)
+        violations = []
+        for i, (t, name, addr, grp) in enumerate(cues):
+            fx = effects.get(name)
+            if fx is None:
+                violations.append((i, f"unknown effect {name!r}"))
+                fx = Effect(name, None, *DEFAULT_TIMING)
+            if name not in effect_ids:
+                effect_ids[name] = len(effect_names)
+                effect_names.append(name)
+            if grp not in group_ids:
+                group_ids[grp] = len(group_names)
+                group_names.append(grp)
+            visible[i], lift[i] = t, fx.lift
+            effect[i], group[i], address[i] = effect_ids[name], group_ids[grp], addr
+
+        ignition = visible - lift
+        order = np.argsort(ignition, kind="stable")
+        show = PyroShow(np.rint(ignition[order] * rate).astype(np.int64), visible[order], effect[order],
+                        address[order], group[order], order.astype(np.int64), effect_names, group_names, rate)
+
+        for i in np.flatnonzero(ignition < 0).tolist():
+            violations.append((i, f"ignition {ignition[i]:.3f} s before the show starts"))
+        if interlocks is not None:
+            fire_s = ignition[order]
+            for g, name in enumerate(group_names):
+                rows = np.flatnonzero(show.group == g)
+                if not len(rows):
+                    continue
+                if name in interlocks.disarmed:
+                    violations += [(int(order[r]), f"group {name!r} is disarmed") for r in rows.tolist()]
+                    continue
+                for r in rows[interlocks.blocked(name, fire_s[rows])].tolist():
+                    violations.append((int(order[r]), f"group {name!r} is blocked at {fire_s[r]:.3f} s"))
+                gap = interlocks.min_gap.get(name, MIN_GAP)
+                if gap > 0 and len(rows) > 1:
+                    close = np.flatnonzero(np.diff(fire_s[rows]) < gap) + 1
+                    for r in rows[close].tolist():
+                        violations.append((int(order[r]), f"group {name!r} fires again within {gap:.2f} s"))
+        violations.sort()
+        if strict and violations:
+            i, reason = violations[0]
+            raise ValueError(f"cue {i}: {reason}")
+        show.violations = violations
+        return show
+
+
+##########################
+# RUNTIME
+##########################
+
+class FireHistogram:
+    """Dispatch lateness in 1 ms buckets; early dispatch counts as 0, the last bucket collects the rest."""
+
+    def __init__(self, buckets=50):
+        self.counts = np.zeros(buckets, np.int64)
+        self.max_ms = 0.0
+        self.total = 0
+
+    def record(self, late_ms):
+        self.counts[min(max(int(late_ms), 0), len(self.counts) - 1)] += 1
+        self.max_ms = max(self.max_ms, late_ms)
+        self.total += 1
+
+    def summary(self):
+        if not self.total:
+            return "no fires"
+        cumulative = np.cumsum(self.counts) / self.total
+        within = ", ".join(f"<{ms + 1} ms {100 * cumulative[ms]:.1f}%" for ms in (0, 1, 4, 9) if ms < len(self.counts))
+        return f"n={self.total} {within}, max {self.max_ms:.2f} ms"
+
+
+class TimerWheel:
+    """
+    Slots of `slot` samples, each a heap of (sample, seq, payload). Entries beyond the
+    wheel's span wait in an overflow heap and are moved in as the wheel turns.
+    """
+
+    def __init__(self, slot=BLOCK, slots=WHEEL_SLOTS, start=0):
+        self.slot, self.slots = slot, slots
+        self.wheel = [[] for _ in range(slots)]
+        self.overflow = []
+        self.position = start // slot  # absolute index of the slot the clock is in
+        self._seq = 0
+        self.size = 0
+
+    def push(self, sample, payload):
+        self._seq += 1
+        entry = (sample, self._seq, payload)
+        index = max(sample // self.slot, self.position)
+        if index - self.position < self.slots:
+            heapq.heappush(self.wheel[index % self.slots], entry)
+        else:
+            heapq.heappush(self.overflow, entry)
+        self.size += 1
+
+    def pop_due(self, sample):
+        """Entries at or before `sample`, in time order; advances the wheel."""
+        due = []
+        target = sample // self.slot
+        while self.position <= target:
+            heap = self.wheel[self.position % self.slots]
+            while heap and heap[0][0] <= sample:
+                due.append(heapq.heappop(heap))
+            if self.position == target:
+                break
+            self.position += 1
+            # the slot that just came into reach: pull its entries out of the overflow
+            horizon = (self.position + self.slots - 1) * self.slot
+            while self.overflow and self.overflow[0][0] < horizon + self.slot:
+                entry = heapq.heappop(self.overflow)
+                heapq.heappush(self.wheel[max(entry[0] // self.slot, self.position) % self.slots], entry)
+        self.size -= len(due)
+        if len(due) > 1:
+            due.sort()
+        return due
+
+    def clear(self):
+        for heap in self.wheel:
+            heap.clear()
+        self.overflow.clear()
+        self.size = 0
+
+
+class PyroScheduler:
+    """
+    Fires a PyroShow from the audio clock. poll(sample) once per audio block (sample =
+    first sample of the block being rendered); `on_fire(show, i, offset)` gets the cue row
+    and the sample offset inside the block at which it is due. Cues that an interlock
+    refuses at dispatch time (disarmed, blocked window, or within the group's min_gap of
+    its last fire, manual fires included) are skipped and recorded in `refused`.
+    """
+
+    def __init__(self, show, on_fire, interlocks=None, block=BLOCK, clock=time.perf_counter):
+        self.show, self.on_fire, self.interlocks, self.block = show, on_fire, interlocks, block
+        self.clock = clock
+        self.wheel = TimerWheel(block)
+        self.histogram = FireHistogram()
+        self.fired = []
+        self.refused = []
+        self.held = False
+        self._next = 0  # next show row not yet in the wheel
+        self._last_fire = {}  # group -> show time (seconds) of its last dispatched fire
+        self._origin = None  # (sample, clock) pair the lateness is measured against
+
+    def start(self, sample=0, at=None):
+        """Begin at show sample `sample` (cues before it are skipped)."""
+        self.held = False
+        self.wheel = TimerWheel(self.block, start=sample)
+        self._next = int(np.searchsorted(self.show.fire, sample))
+        self._last_fire = {}
+        self._origin = (sample, self.clock() if at is None else at)
+        self._feed(sample)
+
+    def hold(self):
+        """Stop firing: everything still pending is dropped."""
+        self.held = True
+        self.wheel.clear()
+        self._next = len(self.show)
+
+    def fire_now(self, i, sample):
+        """Manual or re-timed fire of show row `i` at `sample`."""
+        self.wheel.push(sample, i)
+
+    def _feed(self, sample):
+        # rows due within the wheel's span are moved in; the rest stay in the sorted arrays
+        fire = self.show.fire
+        horizon = sample + self.wheel.slots * self.block
+        end = int(np.searchsorted(fire, horizon, side="left")) if self._next < len(fire) else self._next
+        for i in range(self._next, end):
+            self.wheel.push(int(fire[i]), i)
+        self._next = max(self._next, end)
+
+    def poll(self, sample):
+        """Dispatch every cue due before the end of the block starting at `sample`; returns how many fired."""
+        if self.held:
+            return 0
+        self._feed(sample)
+        end = sample + self.block - 1
+        due = self.wheel.pop_due(end)
+        if not due:
+            return 0
+        show, interlocks = self.show, self.interlocks
+        origin_sample, origin_clock = self._origin
+        now = self.clock()
+        last_fire = self._last_fire
+        fired = 0
+        for due_sample, _, i in due:
+            group = show.group_names[show.group[i]]
+            t = due_sample / show.rate
+            if interlocks is not None:
+                last = last_fire.get(group)
+                if not interlocks.allowed(group, t) or (
+                        last is not None and t - last < interlocks.min_gap.get(group, MIN_GAP)):
+                    self.refused.append(i)
+                    continue
+            last_fire[group] = t
+            offset = max(due_sample - sample, 0)
+            self.on_fire(show, i, offset)
+            # lateness: wall time of dispatch vs when the clock should have reached the cue
+            scheduled = origin_clock + (due_sample - origin_sample) / show.rate
+            self.histogram.record((now - scheduled) * 1000.0)
+            self.fired.append(i)
+            fired += 1
+        tracing.counter("pyro.fired", len(self.fired))
+        return fired
+
+
+def synthetic_show(cues=2000, seconds=300.0, effects=None, groups=24, seed=5):
+    """Random cues over `seconds` using the shipped effect names, for benchmarks."""
+    effects = effects or load_effects()
+    names = sorted(effects) or ["comet-sparkle"]
+    rng = np.random.default_rng(seed)
+    times = np.sort(rng.uniform(3.0, seconds, cues))
+    return [Cue(float(t), names[rng.integers(len(names))], f"M{rng.integers(64):02d}:{rng.integers(1, 33)}",
+                f"zone{rng.integers(groups)}") for t in times]
+
+
+# run from the project root: python -m process.pyro.scheduler [cues] [seconds of real-time run]
+if __name__ == "__main__":
+    import sys
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    run_seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 5.0
+
+    effects = load_effects()
+    print(f"{len(effects)} effects in {EFFECT_ROOT}")
+
+    big = synthetic_show(100000, 3600.0, effects)
+    interlocks = Interlocks()
+    rng = np.random.default_rng(1)
+    for g in range(24):
+        for start in np.sort(rng.uniform(0, 3600, 50)):
+            interlocks.block(f"zone{g}", start, start + rng.uniform(1, 20))
+        interlocks.set_min_gap(f"zone{g}", 0.05)
+    t0 = time.perf_counter()
+    show = compile_show(big, effects, interlocks)
+    print(f"compiled {len(show)} cues in {(time.perf_counter() - t0) * 1000:.0f} ms, "
+          f"{len(show.violations)} interlock violations")
+    probes = rng.uniform(0, 3600, 100000)
+    t0 = time.perf_counter()
+    for t in probes.tolist():
+        interlocks.allowed("zone3", t)
+    print(f"interlock check: {(time.perf_counter() - t0) / len(probes) * 1e6:.2f} us")
+
+    # real time: the "audio callback" polls once per block, as a sound card would call it
+    cues = synthetic_show(count, run_seconds, effects)
+    show = compile_show(cues, effects)
+    # start at the first ignition instead of waiting out the lift of the first shell
+    first = int(show.fire[0]) // BLOCK * BLOCK if len(show) else 0
+    show.fire -= first
+    log = []
+    scheduler = PyroScheduler(show, lambda s, i, offset: log.append((i, offset)))
+    block_s = BLOCK / RATE
+    t_start = time.perf_counter()
+    scheduler.start(0, t_start)
+    sample = 0
+    end = show.fire[-1] + BLOCK if len(show) else 0
+    while sample <= end:
+        wait = t_start + sample / RATE - time.perf_counter()
+        if wait > 0:
+            time.sleep(wait)
+        scheduler.poll(sample)
+        sample += BLOCK
+    exact = all(show.fire[i] - (show.fire[i] // BLOCK) * BLOCK == offset for i, offset in log)
+    print(f"real-time run: {len(scheduler.fired)}/{len(show)} fired, block offsets exact: {exact}")
+    print(f"dispatch lateness vs audio clock: {scheduler.histogram.summary()}")
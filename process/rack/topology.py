@@ -0,0 +1,429 @@
+# Rack and network topology.
+#
+# Devices come from compiled rack files (.lcrck, see res/rack/): the folder gives the role
+# (network -> switch or patch panel, controller, server, amp) and the `connection` block
+# gives the ports. Cables are links between two device ports; a link carries the speed of
+# the slower end. Patch panels are passive and are not part of the graph: a run through a
+# panel is a single link.
+#
+# Flows are sACN / Art-Net universes and audio streams from a source device to a receiver.
+# Each source keeps a shortest-path tree (BFS over the cables, like a spanning tree on
+# the switches); a flow is routed up that tree and adds its rate to every link on the way.
+# Multicast streams (sACN, AES67 audio) count once per link however many receivers sit
+# behind it, unicast Art-Net counts per receiver.
+#
+# Changing a cable only reroutes the sources it can affect: connecting touches the
+# sources whose tree reaches either end (their component), disconnecting touches the
+# sources whose tree used that link. Every other source keeps its routes and its load, and
+# an affected source only re-carries the flows to devices whose route in the new tree
+# differs from the old one.
+
+import re
+from collections import namedtuple, deque
+from pathlib import Path
+
+import numpy as np
+
+import tracing
+
+from process.output.dmxout import rack_interfaces
+from process.map.mapdata import load_map
+from res.compiler.library import Interner
+
+##########################
+# CONSTANTS
+##########################
+
+RACK_ROOT = Path("res") / "rack"
+DEFAULT_LINK_BPS = 1_000_000_000
+DEFAULT_DMX_PORTS = 8
+UTILISATION = 0.9  # share of a link's capacity flows may use before it counts as overloaded
+DMX_RATE = 44  # frames per second of a refreshing universe
+
+# bytes on the wire per frame: protocol header + 512 slots + UDP/IP + Ethernet framing,
+# preamble and inter-frame gap
+WIRE_OVERHEAD = 8 + 20 + 18 + 20
+SACN_BPS = (126 + 512 + WIRE_OVERHEAD) * 8 * DMX_RATE
+ARTNET_BPS = (18 + 512 + WIRE_OVERHEAD) * 8 * DMX_RATE
+MULTICAST = {"sacn": True, "artnet": False, "audio": True}
+
+SWITCH_UPLINKS = {"qsfp": (4, 40_000_000_000), "sfp": (4, 10_000_000_000)}
+_SWITCH_MODEL = re.compile(r"_(\d+)_(\d+)G", re.IGNORECASE)
+_NETWORK_KINDS = ("ethernet", "sfp", "qsfp")
+
+Port = namedtuple("Port", "name kind bps")
+Device = namedtuple("Device", "name role model ports")
+Flow = namedtuple("Flow", "source dest bps stream kind")
+
+
+def audio_stream_bps(channels, rate=48000, depth=24, packet_ms=1.0):
+    """AES67-style stream: samples plus RTP/UDP/IP/Ethernet overhead per packet."""
+    packets = 1000.0 / packet_ms
+    return channels * rate * depth + packets * (12 + WIRE_OVERHEAD) * 8
+
+
+##########################
+# RACK FILES
+##########################
+
+def rack_ports(rack, role="", model=""):
+    """
+    Ports of a compiled rack file. Network ports declared in `connection` (or, when a `;`
+    closed the block early, at the top level) keep their speed; switches without declared
+    ports get them from the model name ("1u_48_1G_managed_qsfp" -> 48 x 1G + 4 x 40G), and
+    controllers get DEFAULT_DMX_PORTS outputs for a `group dmx_out` (or `ports:` if given).
+    """
+    ports = []
+    connection = rack.get("connection") if isinstance(rack.get("connection"), dict) else {}
+    declared = dict(connection)
+    for name, value in rack.items():
+        if isinstance(value, dict) and "type" in value and name not in declared:
+            declared[name] = value
+    for name, speed in rack_interfaces({"connection": declared}):
+        if name.startswith("group."):
+            continue
+        ports.append(Port(name, "ethernet", speed * 1000 if speed else DEFAULT_LINK_BPS))
+
+    if role == "controller":
+        group = connection.get("group.dmx_out")
+        count = DEFAULT_DMX_PORTS
+        if isinstance(group, dict):
+            count = int((group.get("properties") or {}).get("ports", group.get("ports", count)))
+        ports += [Port(f"dmx_out_{i}", "dmx", None) for i in range(count)]
+    if role == "switch" and not ports:
+        match = _SWITCH_MODEL.search(model)
+        if match:
+            count, gbit = int(match.group(1)), int(match.group(2))
+            ports += [Port(f"port_{i}", "ethernet", gbit * 1_000_000_000) for i in range(count)]
+        for kind, (count, bps) in SWITCH_UPLINKS.items():
+            if model.lower().endswith(kind):
+                ports += [Port(f"{kind}_{i}", kind, bps) for i in range(count)]
+                break
+    if role in ("controller", "server", "amp", "switch") and not any(p.kind in _NETWORK_KINDS for p in ports):
+        ports.append(Port("network_0", "ethernet", DEFAULT_LINK_BPS))
+    return ports
+
+
+def rack_role(path):
+    """Role of a rack file from its folder (and name, for passive patch panels)."""
+    path = Path(path)
+    folder = path.parent.name
+    if folder == "network":
+        return "patch" if "patch" in path.stem else "switch"
+    return folder
+
+
+def rack_catalog(root=RACK_ROOT):
+    """{model: (role, ports)} for every rack file under `root`."""
+    catalog = {}
+    interner = Interner()  # rack files share most of their skeleton
+    for path in sorted(Path(root).rglob("*.lcrck")):
+        role = rack_role(path)
+        catalog[path.stem] = (role, rack_ports(load_map(path, interner), role, path.stem))
+    return catalog
+
+
+##########################
+# TOPOLOGY
+##########################
+
+class Topology:
+    """
+    Devices, cables and flows, with per-link load. Links are numbered in the order they are
+    connected; `capacity` and `load` are arrays indexed by link (bits per second), and
+    disconnected links keep their slot with capacity 0.
+    """
+
+    def __init__(self, catalog=None):
+        self.catalog = catalog if catalog is not None else {}
+        self.devices = []
+        self.index = {}
+        self.adjacent = []  # device -> {link: peer device}
+        self.free = []  # device -> [free network ports]
+        self.links = []  # link -> (a, a port, b, b port) or None once disconnected
+        self.capacity = np.zeros(0, np.float64)
+        self.load = np.zeros(0, np.float64)
+        self.flows = []
+        self.by_source = {}  # source -> [flow index]
+        self.patch = {}  # universe -> (controller, dmx port)
+        self._dmx_free = {}  # controller -> [free dmx ports]
+        self._trees = {}  # source -> {device: (parent, link)}
+        self._carried = {}  # source -> {(link, stream): flows}
+
+    def __len__(self):
+        return len(self.devices)
+
+    ##########################
+    # EDITING
+    ##########################
+
+    def add_device(self, name, model, role=None, ports=None):
+        """Add a device of a catalog `model` (or with explicit role/ports)."""
+        if name in self.index:
+            raise ValueError(f"device '{name}' already exists")
+        if ports is None:
+            if model not in self.catalog:
+                raise KeyError(f"unknown rack model '{model}'")
+            role, ports = self.catalog[model]
+        device = Device(name, role, model, tuple(ports))
+        self.index[name] = len(self.devices)
+        self.devices.append(device)
+        self.adjacent.append({})
+        self.free.append([p for p in ports if p.kind in _NETWORK_KINDS])
+        dmx = [p.name for p in ports if p.kind == "dmx"]
+        if dmx:
+            self._dmx_free[self.index[name]] = dmx
+        return self.index[name]
+
+    def _pick_ports(self, a, b, a_port, b_port):
+        # fastest link the two ends allow, on the slowest ports that still give it
+        def take(device, name, speed):
+            free = self.free[device]
+            if name is not None:
+                for i, port in enumerate(free):
+                    if port.name == name:
+                        return free.pop(i)
+                raise ValueError(f"port '{name}' of '{self.devices[device].name}' is not free")
+            fits = [p for p in free if p.bps >= speed] or free
+            if not fits:
+                raise ValueError(f"'{self.devices[device].name}' has no free network port")
+            port = min(fits, key=lambda p: p.bps)
+            free.remove(port)
+            return port
+
+        best = lambda device, name: max((p.bps for p in self.free[device] if name in (None, p.name)), default=0)
+        speed = min(best(a, a_port), best(b, b_port))
+        pa = take(a, a_port, speed)
+        try:
+            pb = take(b, b_port, speed)
+        except ValueError:
+            self.free[a].append(pa)
+            raise
+        return pa, pb
+
+    def connect(self, a, b, a_port=None, b_port=None):
+        """Cable device `a` to `b` (names); free ports are picked unless given. Returns the link."""
+        a, b = self.index[a], self.index[b]
+        pa, pb = self._pick_ports(a, b, a_port, b_port)
+        link = len(self.links)
+        self.links.append((a, pa, b, pb))
+        self.capacity = np.append(self.capacity, min(pa.bps, pb.bps))
+        self.load = np.append(self.load, 0.0)
+        self.adjacent[a][link] = b
+        self.adjacent[b][link] = a
+        affected = [s for s, tree in self._trees.items() if a in tree or b in tree]
+        self._reroute(affected)
+        return link
+
+    def disconnect(self, link):
+        """Remove a cable; only sources that routed over it are recomputed."""
+        a, pa, b, pb = self.links[link]
+        self.links[link] = None
+        del self.adjacent[a][link]
+        del self.adjacent[b][link]
+        self.free[a].append(pa)
+        self.free[b].append(pb)
+        self.capacity[link] = 0.0
+        affected = [s for s, tree in self._trees.items()
+                    if tree.get(a, (None, None))[1] == link or tree.get(b, (None, None))[1] == link]
+        self._reroute(affected)
+
+    def link_between(self, a, b):
+        a, b = self.index[a], self.index[b]
+        for link, peer in self.adjacent[a].items():
+            if peer == b:
+                return link
+        return None
+
+    ##########################
+    # ROUTING
+    ##########################
+
+    def _tree(self, source):
+        tree = {source: (None, None)}
+        queue = deque([source])
+        adjacent = self.adjacent
+        while queue:
+            node = queue.popleft()
+            for link, peer in adjacent[node].items():
+                if peer not in tree:
+                    tree[peer] = (node, link)
+                    queue.append(peer)
+        return tree
+
+    def path(self, source, dest, tree=None):
+        """Links from `source` to `dest` (device ids), None if unreachable."""
+        tree = tree or self._trees.get(source) or self._tree(source)
+        if dest not in tree:
+            return None
+        links = []
+        node = dest
+        while node != source:
+            node, link = tree[node]
+            links.append(link)
+        return links
+
+    def _carry(self, source, flow, sign=1, tree=None):
+        carried = self._carried.setdefault(source, {})
+        load = self.load
+        for link in self.path(source, flow.dest, tree) or ():
+            key = (link, flow.stream)
+            refs = carried.get(key, 0) + sign
+            if refs:
+                carried[key] = refs
+            else:
+                del carried[key]
+            if (sign > 0 and refs == 1) or (sign < 0 and refs == 0):
+                load[link] += sign * flow.bps
+
+    def _reroute(self, sources):
+        if not sources:
+            return
+        with tracing.span("rack.reroute"):
+            for source in sources:
+                old, new = self._trees[source], self._tree(source)
+                # devices whose route changed: new parent link, or below one that changed
+                moved = {node for node in old if node not in new}
+                for node, step in new.items():
+                    if old.get(node) != step or step[0] in moved:
+                        moved.add(node)
+                flows = [self.flows[i] for i in self.by_source.get(source, ()) if self.flows[i].dest in moved]
+                for flow in flows:
+                    self._carry(source, flow, -1, old)
+                self._trees[source] = new
+                for flow in flows:
+                    self._carry(source, flow, 1, new)
+            np.maximum(self.load, 0.0, out=self.load)  # float residue of the subtraction
+
+    def add_flow(self, source, dest, bps, kind="sacn", stream=None):
+        """Route a flow (device names). `stream` groups multicast receivers of one universe."""
+        source, dest = self.index[source], self.index[dest]
+        if stream is None or not MULTICAST.get(kind, False):
+            stream = (kind, len(self.flows))
+        flow = Flow(source, dest, float(bps), stream, kind)
+        self.flows.append(flow)
+        self.by_source.setdefault(source, []).append(len(self.flows) - 1)
+        if source not in self._trees:
+            self._trees[source] = self._tree(source)
+        self._carry(source, flow)
+        return len(self.flows) - 1
+
+    def headroom(self, links, limit=UTILISATION):
+        if not links:
+            return float("inf")
+        links = np.asarray(links)
+        return float(np.min(self.capacity[links] * limit - self.load[links]))
+
+    ##########################
+    # PATCHING
+    ##########################
+
+    def assign_universes(self, universes, source, protocol="sacn", controllers=None, limit=UTILISATION):
+        """
+        Patch `universes` from `source` onto free controller DMX outputs, nearest controllers
+        first, only where every link on the way has room for them. Returns the universes
+        that found no port.
+        """
+        bps = SACN_BPS if protocol == "sacn" else ARTNET_BPS
+        src = self.index[source]
+        tree = self._trees.get(src) or self._tree(src)
+        self._trees[src] = tree
+        names = controllers if controllers is not None else [d.name for d in self.devices if d.role == "controller"]
+        # BFS order from the source keeps neighbouring universes on neighbouring controllers
+        order = {node: i for i, node in enumerate(tree)}
+        candidates = sorted((self.index[n] for n in names if self.index[n] in tree and self._dmx_free.get(self.index[n])),
+                            key=order.__getitem__)
+        pending = deque(universes)
+        with tracing.span("rack.assign"):
+            for controller in candidates:
+                if not pending:
+                    break
+                links = self.path(src, controller)
+                free = self._dmx_free[controller]
+                room = int(self.headroom(links, limit) // bps) if links else len(free)
+                for _ in range(min(len(free), room, len(pending))):
+                    universe = pending.popleft()
+                    port = free.pop(0)
+                    self.patch[universe] = (self.devices[controller].name, port)
+                    self.add_flow(source, self.devices[controller].name, bps, protocol, (protocol, universe))
+        return list(pending)
+
+    ##########################
+    # CHECKS
+    ##########################
+
+    def overloaded(self, limit=UTILISATION):
+        """[(link, load, capacity)] for every link above `limit` of its capacity."""
+        live = self.capacity > 0
+        over = np.flatnonzero(live & (self.load > self.capacity * limit))
+        return [(int(i), float(self.load[i]), float(self.capacity[i])) for i in over]
+
+    def unreachable(self):
+        """Flows whose receiver has no path to the source."""
+        return [f for f in self.flows if f.dest not in self._trees.get(f.source, ())]
+
+    def describe_link(self, link):
+        a, pa, b, pb = self.links[link]
+        return f"{self.devices[a].name}:{pa.name} <-> {self.devices[b].name}:{pb.name}"
+
+
+def stadium(catalog, edges=100, per_edge=20, servers=4, amps=40):
+    """Synthetic stadium rig: core, 4 distribution switches, edge switches of controllers."""
+    topo = Topology(catalog)
+    topo.add_device("core", "1u_48_1G_managed_qsfp")
+    for d in range(4):
+        topo.add_device(f"dist{d}", "1u_48_1G_managed_sfp")
+        topo.connect("core", f"dist{d}")
+    for s in range(servers):
+        topo.add_device(f"server{s}", "2u_avrx_960k_2u2")
+        topo.connect(f"server{s}", "core")
+    for e in range(edges):
+        topo.add_device(f"edge{e}", "1u_24_1G_sw_managed")
+        topo.connect(f"edge{e}", f"dist{e % 4}")
+        for c in range(per_edge):
+            topo.add_device(f"ctl{e}.{c}", "LC256A2-R2-light-multi")
+            topo.connect(f"ctl{e}.{c}", f"edge{e}")
+    for a in range(amps):
+        topo.add_device(f"amp{a}", "rcf_xps_16k")
+        topo.connect(f"amp{a}", f"edge{a % edges}")
+    return topo
+
+
+# run from the project root: python -m process.rack.topology
+if __name__ == "__main__":
+    import time
+
+    catalog = rack_catalog()
+    for model, (role, ports) in catalog.items():
+        network = [p for p in ports if p.kind in _NETWORK_KINDS]
+        print(f"{model:34s} {role:10s} {len(network):3d} network, {sum(p.kind == 'dmx' for p in ports):3d} dmx")
+
+    t0 = time.perf_counter()
+    topo = stadium(catalog)
+    t1 = time.perf_counter()
+    for a in range(40):
+        topo.add_flow("server0", f"amp{a}", audio_stream_bps(16), "audio", ("audio", a % 8))
+    left = []
+    for s in range(4):
+        # each console server drives a quarter of the stadium's 12000 universes
+        left += topo.assign_universes(range(1 + s * 3000, 1 + (s + 1) * 3000), f"server{s}")
+    t2 = time.perf_counter()
+    over = topo.overloaded()
+    print(f"\n{len(topo)} devices, {len(topo.links)} cables built in {(t1 - t0) * 1000:.0f} ms")
+    print(f"patched {len(topo.patch)} universes + 40 audio streams in {(t2 - t1) * 1000:.0f} ms, "
+          f"{len(left)} without a port, {len(over)} overloaded links")
+    busiest = int(np.argmax(topo.load / np.maximum(topo.capacity, 1)))
+    print(f"busiest link {topo.describe_link(busiest)}: "
+          f"{topo.load[busiest] / 1e6:.0f} of {topo.capacity[busiest] / 1e6:.0f} Mbit/s")
+
+    # move an edge switch to another distribution switch: only the sources routed over it reroute
+    link = topo.link_between("edge7", "dist3")
+    before = topo.load.copy()
+    t0 = time.perf_counter()
+    topo.disconnect(link)
+    lost = len(topo.unreachable())
+    topo.connect("edge7", "dist0")
+    t1 = time.perf_counter()
+    moved = np.count_nonzero(np.abs(topo.load[:len(before)] - before) > 1)
+    print(f"recabled edge7 in {(t1 - t0) * 1000:.1f} ms ({lost} flows unreachable while unplugged, "
+          f"{moved} links changed load, {len(topo.unreachable())} unreachable after)")
@@ -0,0 +1,519 @@
+# Asyncio show runtime.
+#
+# Runs in its own thread beside the Qt event loop and hosts:
+#   - input sources (dmx_in, trig_in, midi, serial, network) as async streams of
+#     (event, value, t_ns) tuples
+#   - the TriggerDispatcher, fed by every source
+#   - the output frame task (sequence engine tick + Art-Net/sACN send)
+#
+# A trigger wakes the output task at once instead of waiting for the next frame, and the
+# time from input arrival to the send that carries it is recorded as trigger-to-output
+# latency. Anything the UI needs to know goes through a bounded queue that the Qt side
+# drains from a QTimer (poll_ui); the UI talks back with post().
+
+import asyncio
+import os
+import queue
+import threading
+import time
+
+from process.output.dmxout import (ARTNET_HEADER, ARTNET_ID, ARTNET_OP_DMX, DMX_SLOTS, SACN_HEADER,
+                                   SACN_ID, SACN_VECTOR_FRAMING, SACN_VECTOR_ROOT, make_universe_buffer)
+from process.trigger.dispatcher import LatencyHistogram
+
+DEFAULT_FPS = 44
+SOURCE_QUEUE = 4096
+
+
+##########################
+# SOURCES
+##########################
+
+def parse_event_line(line):
+    """`Controller.ControlVis.T.PRESS 0.5` -> (event, value); value defaults to 1.0."""
+    parts = line.strip().split()
+    if not parts:
+        return None
+    value = 1.0
+    if len(parts) > 1:
+        try:
+            value = float(parts[1])
+        except ValueError:
+            pass
+    return parts[0], value
+
+
+class _DatagramQueue(asyncio.DatagramProtocol):
+    def __init__(self, q):
+        self.q = q
+        self.dropped = 0
+
+    def datagram_received(self, data, addr):
+        try:
+            self.q.put_nowait((data, time.perf_counter_ns()))
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+
+class Source:
+    """Base input source: an async iterator of (event, value, t_ns)."""
+
+    kind = "source"
+
+    def __init__(self, name=None):
+        self.name = name or self.kind
+        self.received = 0
+
+    async def open(self):
+        pass
+
+    def close(self):
+        pass
+
+    def __aiter__(self):
+        return self._events()
+
+    async def _events(self):
+        return
+        yield
+
+
+class DatagramSource(Source):
+    """UDP source; subclasses turn each datagram into zero or more events."""
+
+    def __init__(self, host="0.0.0.0", port=0, name=None):
+        super().__init__(name)
+        self.host = host
+        self.port = port
+        self.transport = None
+        self.protocol = None
+        self.q = None
+
+    async def open(self):
+        loop = asyncio.get_running_loop()
+        self.q = asyncio.Queue(SOURCE_QUEUE)
+        self.transport, self.protocol = await loop.create_datagram_endpoint(
+            lambda: _DatagramQueue(self.q), local_addr=(self.host, self.port))
+        self.port = self.transport.get_extra_info("sockname")[1]
+
+    def close(self):
+        if self.transport is not None:
+            self.transport.close()
+
+    def parse(self, data):
+        return ()
+
+    async def _events(self):
+        while True:
+            data, t_ns = await self.q.get()
+            self.received += 1
+            for event, value in self.parse(data):
+                yield event, value, t_ns
+
+
+class NetworkSource(DatagramSource):
+    """`network`: text events over UDP, one `path [value]` per line."""
+
+    kind = "network"
+
+    def parse(self, data):
+        for line in data.decode("utf-8", "replace").splitlines():
+            parsed = parse_event_line(line)
+            if parsed:
+                yield parsed
+
+
+class DmxInSource(DatagramSource):
+    """`dmx_in`: Art-Net / sACN input. Emits `DMX.<universe>.<channel>` for changed channels.
+
+    Only level data is read: ArtDmx packets, and E1.31 data packets with start code 0 (not
+    polls, replies or per-address priority).
+    """
+
+    kind = "dmx_in"
+
+    def __init__(self, host="0.0.0.0", port=0, name=None):
+        super().__init__(host, port, name)
+        self.frames = {}
+
+    def parse(self, data):
+        if (data[:8] == ARTNET_ID and len(data) >= ARTNET_HEADER
+                and int.from_bytes(data[8:10], "little") == ARTNET_OP_DMX):
+            universe = data[14] | (data[15] << 8)
+            length = int.from_bytes(data[16:18], "big")
+            payload = data[ARTNET_HEADER:ARTNET_HEADER + length]
+        elif (data[4:16] == SACN_ID and len(data) >= SACN_HEADER
+                and int.from_bytes(data[18:22], "big") == SACN_VECTOR_ROOT
+                and int.from_bytes(data[40:44], "big") == SACN_VECTOR_FRAMING
+                and data[SACN_HEADER - 1] == 0):  # start code
+            universe = int.from_bytes(data[113:115], "big")
+            payload = data[SACN_HEADER:]
+        else:
+            return
+        last = self.frames.get(universe, bytes(DMX_SLOTS))
+        self.frames[universe] = payload
+        if payload == last[:len(payload)]:
+            return
+        for ch, value in enumerate(payload):
+            if ch >= len(last) or value != last[ch]:
+                yield f"DMX.{universe}.{ch + 1}", value / 255.0
+
+
+class StreamSource(Source):
+    """Byte stream read from a file descriptor (pipe, tty) through the event loop."""
+
+    def __init__(self, fd, name=None):
+        super().__init__(name)
+        self.fd = fd
+        self.owns_fd = False  # opened by from_path, closed with the source
+        self.reader = None
+        self.transport = None
+
+    @classmethod
+    def from_path(cls, path, **kwargs):
+        fd = os.open(path, os.O_RDONLY | os.O_NONBLOCK)
+        try:
+            source = cls(fd, **kwargs)
+        except BaseException:
+            os.close(fd)
+            raise
+        source.owns_fd = True
+        return source
+
+    async def open(self):
+        loop = asyncio.get_running_loop()
+        self.reader = asyncio.StreamReader()
+        pipe = os.fdopen(self.fd, "rb", buffering=0, closefd=False)
+        self.transport, _ = await loop.connect_read_pipe(
+            lambda: asyncio.StreamReaderProtocol(self.reader), pipe)
+
+    def close(self):
+        if self.transport is not None:
+            self.transport.close()
+            self.transport = None
+        if self.owns_fd and self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+
+class LineSource(StreamSource):
+    """`trig_in` / `serial`: `path [value]` lines from a pipe or serial device."""
+
+    kind = "trig_in"
+
+    def __init__(self, fd, name=None, kind=None):
+        super().__init__(fd, name or kind)
+        if kind is not None:
+            self.kind = kind
+
+    async def _events(self):
+        while True:
+            line = await self.reader.readline()
+            if not line:
+                return
+            t_ns = time.perf_counter_ns()
+            self.received += 1
+            parsed = parse_event_line(line.decode("utf-8", "replace"))
+            if parsed:
+                yield parsed[0], parsed[1], t_ns
+
+
+class MidiSource(StreamSource):
+    """
+    `midi`: raw MIDI bytes. Note on/off -> `MIDI.<ch>.NOTE.<n>` (velocity / 127, 0 on
+    release), control change -> `MIDI.<ch>.CC.<n>` (value / 127). Channels are 1-based.
+    """
+
+    kind = "midi"
+
+    async def _events(self):
+        status = 0
+        while True:
+            byte = await self.reader.read(1)
+            if not byte:
+                return
+            b = byte[0]
+            if b >= 0xf8:  # realtime, ignore
+                continue
+            if b & 0x80:
+                status = b
+                if status >= 0xf0:  # sysex/common, skip its data
+                    status = 0
+                    continue
+                data = await self.reader.readexactly(2 if status & 0xf0 in (0x80, 0x90, 0xa0, 0xb0, 0xe0) else 1)
+            else:
+                if not status:
+                    continue
+                # running status: this byte is the first data byte
+                rest = await self.reader.readexactly(1 if status & 0xf0 in (0x80, 0x90, 0xa0, 0xb0, 0xe0) else 0)
+                data = bytes([b]) + rest
+            t_ns = time.perf_counter_ns()
+            self.received += 1
+            kind, ch = status & 0xf0, (status & 0x0f) + 1
+            if kind == 0x90:
+                yield f"MIDI.{ch}.NOTE.{data[0]}", data[1] / 127.0, t_ns
+            elif kind == 0x80:
+                yield f"MIDI.{ch}.NOTE.{data[0]}", 0.0, t_ns
+            elif kind == 0xb0:
+                yield f"MIDI.{ch}.CC.{data[0]}", data[1] / 127.0, t_ns
+
+
+SOURCE_TYPES = {
+    "dmx_in": DmxInSource,
+    "trig_in": LineSource,
+    "midi": MidiSource,
+    "serial": LineSource,
+    "network": NetworkSource,
+}
+
+
+def rack_sources(rack):
+    """Input kinds declared by a compiled rack controller (`group dmx_in {}` etc.)."""
+    connection = rack.get("connection") or {}
+    kinds = []
+    for key in connection:
+        kind = key.split(".", 1)[1] if key.startswith("group.") else key.rsplit("_", 1)[0]
+        if kind in SOURCE_TYPES and kind not in kinds:
+            kinds.append(kind)
+    return kinds
+
+
+##########################
+# RUNTIME
+##########################
+
+class ShowRuntime:
+    """
+    Owns an asyncio loop in a background thread.
+
+    dispatcher  TriggerDispatcher fed by every source
+    router      OutputRouter / OutputSink with send(buffer, now); optional
+    engine      SequenceEngine ticked every frame; optional
+    buffer      channel buffer shared by engine and router
+    """
+
+    def __init__(self, dispatcher, router=None, engine=None, buffer=None, fps=DEFAULT_FPS, ui_queue=1024):
+        self.dispatcher = dispatcher
+        self.router = router
+        self.engine = engine
+        self.buffer = buffer if buffer is not None else (engine.buffer if engine is not None else make_universe_buffer(1))
+        self.frame = 1.0 / fps
+        self.sources = []
+        self.ui = queue.Queue(ui_queue)
+        self.ui_dropped = 0
+        self.latency = LatencyHistogram()
+        self.frames = 0
+
+        self.loop = None
+        self.thread = None
+        self._wake = None
+        self._pending = None  # earliest input t_ns not yet sent
+        self._tasks = []
+        self._started = threading.Event()
+        self._error = None  # raised by start() when the sources could not be opened
+        self.output_errors = 0
+        self._last_output_error = None
+
+    def add_source(self, source):
+        self.sources.append(source)
+        if self.loop is not None:
+            asyncio.run_coroutine_threadsafe(self._attach(source), self.loop).result()
+        return source
+
+    # --- thread / loop ---
+
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name="show-runtime", daemon=True)
+        self.thread.start()
+        self._started.wait()
+        if self._error is not None:
+            error, self._error = self._error, None
+            self.thread.join()
+            self.loop = None
+            raise error
+        return self
+
+    def stop(self):
+        if self.loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self._shutdown(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop = None
+
+    def _run(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self._wake = asyncio.Event()
+        try:
+            self.loop.run_until_complete(self._boot())
+        except BaseException as e:  # e.g. EADDRINUSE from a source: hand it to start()
+            self._error = e
+            self.loop.run_until_complete(self._shutdown())
+            self.loop.close()
+            return
+        finally:
+            self._started.set()
+        self.loop.run_forever()
+        self.loop.close()
+
+    async def _boot(self):
+        for source in self.sources:
+            await self._attach(source)
+        self._tasks.append(asyncio.ensure_future(self._output()))
+
+    async def _attach(self, source):
+        await source.open()
+        self._tasks.append(asyncio.ensure_future(self._consume(source)))
+
+    async def _shutdown(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        for source in self.sources:
+            source.close()
+
+    # --- event path ---
+
+    async def _consume(self, source):
+        async for event, value, t_ns in source:
+            self._handle(event, value, t_ns, source.kind)
+
+    def _handle(self, event, value, t_ns, kind):
+        if self.dispatcher.fire(event, value):
+            if self._pending is None:
+                self._pending = t_ns
+            self._wake.set()
+        self.to_ui(("event", kind, event, value))
+
+    async def _output(self):
+        loop = self.loop
+        next_frame = loop.time()
+        while True:
+            timeout = next_frame - loop.time()
+            if timeout > 0:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+            self._wake.clear()
+            now = time.monotonic()
+            if self.engine is not None:
+                self.engine.tick(now)
+            if self.router is not None:
+                try:
+                    self.router.send(self.buffer, now)
+                    self._last_output_error = None
+                except Exception as e:  # a failing interface must not stop the frame loop
+                    self.output_errors += 1
+                    if str(e) != self._last_output_error:  # report once per distinct error
+                        self._last_output_error = str(e)
+                        print(f"Output error: {e}")
+                        self.to_ui(("error", "output", str(e)))
+            self.frames += 1
+            if self._pending is not None:
+                self.latency.record(time.perf_counter_ns() - self._pending)
+                self._pending = None
+            if loop.time() >= next_frame:
+                next_frame += self.frame
+                if next_frame < loop.time():  # fell behind: don't burst to catch up
+                    next_frame = loop.time() + self.frame
+
+    # --- Qt bridge ---
+
+    def to_ui(self, message):
+        """Queue `message` for the UI; when full the oldest message is dropped."""
+        try:
+            self.ui.put_nowait(message)
+        except queue.Full:
+            try:
+                self.ui.get_nowait()
+            except queue.Empty:
+                pass
+            self.ui_dropped += 1
+            self.ui.put_nowait(message)
+
+    def poll_ui(self, max_items=256):
+        """Drain up to `max_items` messages; call from a QTimer on the Qt thread."""
+        items = []
+        for _ in range(max_items):
+            try:
+                items.append(self.ui.get_nowait())
+            except queue.Empty:
+                break
+        return items
+
+    def post(self, event, value=1.0):
+        """Inject an event from another thread (e.g. a Qt button)."""
+        t_ns = time.perf_counter_ns()
+        self.loop.call_soon_threadsafe(self._handle, event, value, t_ns, "ui")
+
+
+##########################
+# BENCHMARK
+##########################
+
+# run from the project root: python -m process.runtime.showloop [seconds]
+if __name__ == "__main__":
+    import socket
+    import sys
+
+    from process.output.dmxout import OutputSink
+    from process.trigger.dispatcher import TriggerDispatcher, synthetic_map
+
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 3.0
+
+    # local stand-ins: a UDP node that swallows output, a UDP and a pipe trigger source
+    node = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    node.bind(("127.0.0.1", 0))
+    node.setblocking(False)
+
+    dispatcher = TriggerDispatcher(synthetic_map(20000))
+    buffer = make_universe_buffer(64)
+    sink = OutputSink("artnet", "127.0.0.1", port=node.getsockname()[1]).open()
+    for u in range(64):
+        sink.patch(u, destination="127.0.0.1")
+    runtime = ShowRuntime(dispatcher, router=sink, buffer=buffer)
+    net = runtime.add_source(NetworkSource("127.0.0.1", 0))
+    read_fd, write_fd = os.pipe()
+    runtime.add_source(LineSource(read_fd, kind="trig_in"))
+    runtime.start()
+
+    # UI load: a thread that keeps the interpreter busy like a heavy paint would
+    busy = {"run": True}
+
+    def ui_load():
+        while busy["run"]:
+            sum(i * i for i in range(20000))
+            for _ in runtime.poll_ui():
+                pass
+
+    threading.Thread(target=ui_load, daemon=True).start()
+
+    events = dispatcher.events()
+    tx = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    end = time.perf_counter() + seconds
+    n = 0
+    while time.perf_counter() < end:
+        line = f"{events[n % len(events)]} 1.0\n".encode()
+        if n & 1:
+            tx.sendto(line, ("127.0.0.1", net.port))
+        else:
+            os.write(write_fd, line)
+        n += 1
+        time.sleep(0.002)
+        try:
+            while node.recv(2048):
+                pass
+        except BlockingIOError:
+            pass
+
+    time.sleep(0.1)
+    busy["run"] = False
+    runtime.stop()
+    sink.close()
+    print(f"sent {n} triggers, dispatched {dispatcher.fired}, {runtime.frames} output frames, "
+          f"ui dropped {runtime.ui_dropped}")
+    print(f"trigger->output {runtime.latency.summary()}")
+    print(f"one dmx frame = {1000 / DEFAULT_FPS:.2f} ms")
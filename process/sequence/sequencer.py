@@ -0,0 +1,359 @@
+# Sequence playback for .lcseq effects.
+#
+# Every sequence is compiled once, at load time, into a table of curves sampled at
+# CURVE_SAMPLES points over its normalised duration (one row per output lane). Running
+# instances are flattened into "lanes" (curve row, start, duration, target channel), so a
+# tick is one vectorised lookup + lerp over every active lane followed by an LTP write and
+# an HTP max into the channel buffer.
+#
+# A sequence declares its curve with a `curve` block:
+#
+#   curve {
+#       duration: 2.0
+#       loop: false
+#       mode: "htp"            ## or "ltp"
+#       interp: "linear"       ## "linear", "smooth" or "step"
+#       lane 0 {
+#           p0 {
+#               t: 0.0
+#               v: 1.0
+#           }
+#           p1 {
+#               t: 1.0
+#               v: 0.0
+#           }
+#       }
+#   }
+#
+# Sequences without a curve block fall back to the built-in shape for their file name
+# (fadetoblack, huesweep, linemotion45, ...) so the shipped library plays as-is.
+
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+
+import tracing
+
+from res.compiler.compiler import parse_custom_format
+from process.output.dmxout import make_universe_buffer
+
+CURVE_SAMPLES = 256
+HTP = 0
+LTP = 1
+
+
+##########################
+# CURVES
+##########################
+
+class Curve:
+    """A compiled sequence: `table` is (lanes, CURVE_SAMPLES) float32 in 0..1."""
+
+    def __init__(self, name, table, duration=1.0, loop=False, mode=HTP):
+        self.name = name
+        self.table = np.ascontiguousarray(table, dtype=np.float32)
+        self.duration = float(duration)
+        self.loop = loop
+        self.mode = mode
+
+    @property
+    def lanes(self):
+        return self.table.shape[0]
+
+    def __repr__(self):
+        return f"Curve({self.name}, lanes={self.lanes}, duration={self.duration}, loop={self.loop})"
+
+
+def _phase():
+    return np.linspace(0.0, 1.0, CURVE_SAMPLES, dtype=np.float32)
+
+
+def _smoothstep(t):
+    return t * t * (3.0 - 2.0 * t)
+
+
+def _triangle(t):
+    return 1.0 - np.abs(2.0 * t - 1.0)
+
+
+def _hue(t):
+    """Hue rotation 0..1 -> (r, g, b) rows, full saturation and value."""
+    h = (t * 6.0)[None, :]
+    k = np.array([5.0, 3.0, 1.0], dtype=np.float32)[:, None]
+    k = (k + h) % 6.0
+    return 1.0 - np.clip(np.minimum(k, 4.0 - k), 0.0, 1.0)
+
+
+BUILTIN = {
+    # name: (lanes builder, duration, loop, mode)
+    "fadetoblack": (lambda t: [1.0 - t], 2.0, False, HTP),
+    "fadefromblack": (lambda t: [t], 2.0, False, HTP),
+    "fadeover": (lambda t: [1.0 - t, t], 2.0, False, HTP),
+    "smooth": (lambda t: [_smoothstep(t)], 1.0, False, LTP),
+    "direct": (lambda t: [np.ones_like(t)], 0.0, False, LTP),
+    "flash": (lambda t: [(t < 0.5).astype(np.float32)], 0.2, True, HTP),
+    "linemotion": (lambda t: [_triangle(t)], 4.0, True, LTP),
+    "linemotion45": (lambda t: [_triangle(t), _triangle(t)], 4.0, True, LTP),
+    "color": (lambda t: [np.ones_like(t)] * 3, 0.0, False, LTP),
+    "colorpulse": (lambda t: [0.5 - 0.5 * np.cos(2.0 * np.pi * t)] * 3, 1.0, True, HTP),
+    "colorsweep": (lambda t: [1.0 - t, _triangle(t), t], 4.0, True, LTP),
+    "huesweep": (lambda t: list(_hue(t)), 8.0, True, LTP),
+    "lighton": (lambda t: [np.ones_like(t)], 0.0, False, LTP),
+    "lightoff": (lambda t: [np.zeros_like(t)], 0.0, False, LTP),
+}
+
+
+def _sample_lane(points, interp):
+    ts = np.array([float(p.get("t", 0.0)) for p in points], dtype=np.float32)
+    vs = np.array([float(p.get("v", 0.0)) for p in points], dtype=np.float32)
+    order = np.argsort(ts, kind="stable")
+    ts, vs = ts[order], vs[order]
+    t = _phase()
+
+    if interp == "step":
+        idx = np.clip(np.searchsorted(ts, t, side="right") - 1, 0, len(ts) - 1)
+        return vs[idx]
+    if interp == "smooth" and len(ts) > 1:
+        seg = np.clip(np.searchsorted(ts, t, side="right") - 1, 0, len(ts) - 2)
+        span = np.maximum(ts[seg + 1] - ts[seg], 1e-9)
+        u = _smoothstep(np.clip((t - ts[seg]) / span, 0.0, 1.0))
+        return vs[seg] + (vs[seg + 1] - vs[seg]) * u
+    return np.interp(t, ts, vs).astype(np.float32)
+
+
+def compile_sequence(parsed, name):
+    """Compile a parsed .lcseq dict into a Curve."""
+    block = parsed.get("curve")
+    if isinstance(block, dict):
+        interp = block.get("interp", "linear")
+        lanes = [lane for key, lane in block.items() if isinstance(lane, dict)]
+        rows = []
+        for lane in lanes:
+            points = [p for p in lane.values() if isinstance(p, dict)]
+            if points:
+                rows.append(_sample_lane(points, interp))
+        if rows:
+            mode = LTP if str(block.get("mode", "htp")).lower() == "ltp" else HTP
+            return Curve(name, np.stack(rows), block.get("duration", 1.0), bool(block.get("loop", False)), mode)
+
+    if name in BUILTIN:
+        build, duration, loop, mode = BUILTIN[name]
+        t = _phase()
+        rows = [np.broadcast_to(np.asarray(r, dtype=np.float32), t.shape) for r in build(t)]
+        return Curve(name, np.stack(rows), duration, loop, mode)
+
+    raise ValueError(f"sequence '{name}' has no curve block and no built-in shape")
+
+
+def load_sequences(root="res/sequences"):
+    """Compile every .lcseq under `root`; returns {name: Curve}."""
+    curves = {}
+    for path in sorted(Path(root).rglob("*.lcseq")):
+        with open(path, "r", encoding="utf-8") as f:
+            parsed = parse_custom_format(f.read())
+        try:
+            curves[path.stem] = compile_sequence(parsed, path.stem)
+        except ValueError as e:
+            print(f"skipping {path}: {e}")
+    return curves
+
+
+##########################
+# ENGINE
+##########################
+
+class SequenceEngine:
+    """
+    Runs many sequence instances into a (universes, 512) channel buffer.
+
+    start() returns an instance id; tick(now) advances every instance in one pass.
+    Channels driven by HTP lanes take the highest value of all HTP lanes on them; LTP
+    lanes are resolved latest-start-wins, and a channel with both takes the higher of
+    the LTP value and the HTP maximum.
+    """
+
+    def __init__(self, buffer, curves):
+        self.buffer = buffer
+        self.flat = buffer.reshape(-1)
+        self.curves = dict(curves)
+
+        # curves may be shared between engines, so their rows live here, not on the Curve
+        self._rows = {}  # name -> first row in the stacked table
+        tables = []
+        row = 0
+        for name, curve in self.curves.items():
+            self._rows[name] = row
+            row += curve.lanes
+            tables.append(curve.table)
+        # one extra column so the lerp can always read i0 + 1
+        stacked = np.concatenate(tables) if tables else np.zeros((0, CURVE_SAMPLES), dtype=np.float32)
+        self.table = np.concatenate([stacked, stacked[:, -1:]], axis=1)
+
+        self.instances = {}
+        self.next_id = 0
+        self.dirty = True
+        self._lanes = None
+
+    def start(self, name, addresses, now=None, level=1.0, speed=1.0, loop=None, mode=None):
+        """
+        Start sequence `name` on `addresses`: one flat buffer index (universe * 512 + channel)
+        per curve lane. Returns the instance id.
+        """
+        curve = self.curves[name]
+        addresses = np.asarray(addresses, dtype=np.intp).reshape(-1)
+        if addresses.size != curve.lanes:
+            raise ValueError(f"sequence '{name}' drives {curve.lanes} channels, got {addresses.size}")
+        if now is None:
+            now = time.monotonic()
+
+        iid = self.next_id
+        self.next_id += 1
+        self.instances[iid] = {
+            "curve": curve,
+            "row": self._rows[name],
+            "addresses": addresses,
+            "start": now,
+            "duration": curve.duration / speed if speed > 0 else curve.duration,
+            "level": level,
+            "loop": curve.loop if loop is None else loop,
+            "mode": curve.mode if mode is None else mode,
+        }
+        self.dirty = True
+        return iid
+
+    def stop(self, iid):
+        if self.instances.pop(iid, None) is not None:
+            self.dirty = True
+
+    def stop_all(self):
+        self.instances = {}
+        self.dirty = True
+
+    def active(self):
+        return len(self.instances)
+
+    def _build(self):
+        """Flatten all instances into per-lane arrays (only when instances change)."""
+        ids, rows, addrs, starts, durs, levels, loops, modes = [], [], [], [], [], [], [], []
+        # LTP precedence is by start time, so lanes are laid out oldest first
+        for iid, inst in sorted(self.instances.items(), key=lambda kv: kv[1]["start"]):
+            curve = inst["curve"]
+            n = curve.lanes
+            ids.extend([iid] * n)
+            rows.extend(range(inst["row"], inst["row"] + n))
+            addrs.extend(inst["addresses"].tolist())
+            starts.extend([inst["start"]] * n)
+            durs.extend([inst["duration"]] * n)
+            levels.extend([inst["level"]] * n)
+            loops.extend([inst["loop"]] * n)
+            modes.extend([inst["mode"]] * n)
+
+        lanes = {
+            "id": np.array(ids, dtype=np.int64),
+            "row": np.array(rows, dtype=np.intp),
+            "addr": np.array(addrs, dtype=np.intp),
+            "start": np.array(starts, dtype=np.float64),
+            "duration": np.array(durs, dtype=np.float64),
+            "level": np.array(levels, dtype=np.float32),
+            "loop": np.array(loops, dtype=bool),
+        }
+        modes = np.array(modes, dtype=np.int8)
+        lanes["htp"] = np.flatnonzero(modes == HTP)
+        ltp = np.flatnonzero(modes == LTP)
+        # keep only the newest lane per LTP channel
+        _, last = np.unique(lanes["addr"][ltp][::-1], return_index=True)
+        lanes["ltp"] = ltp[::-1][last]
+        # HTP lanes max into their own layer, one slot per distinct channel, which starts
+        # at zero every tick; channels that also have an LTP lane merge it with that value
+        channels, slot = np.unique(lanes["addr"][lanes["htp"]], return_inverse=True)
+        lanes["htp_addr"] = channels
+        lanes["htp_slot"] = slot
+        lanes["htp_shared"] = np.isin(channels, lanes["addr"][lanes["ltp"]])
+        self._lanes = lanes
+        self.dirty = False
+
+    def tick(self, now=None):
+        """Advance every active instance and blend into the buffer. Returns finished ids."""
+        if now is None:
+            now = time.monotonic()
+        with tracing.span("sequence.tick"):
+            return self._tick(now)
+
+    def _tick(self, now):
+        if self.dirty:
+            self._build()
+        lanes = self._lanes
+        if lanes["row"].size == 0:
+            return []
+
+        elapsed = now - lanes["start"]
+        duration = lanes["duration"]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            phase = np.where(duration > 0, elapsed / duration, 1.0)
+        done = ~lanes["loop"] & (phase >= 1.0)
+        phase = np.where(lanes["loop"], phase % 1.0, np.clip(phase, 0.0, 1.0))
+
+        pos = phase * (CURVE_SAMPLES - 1)
+        i0 = pos.astype(np.intp)
+        frac = (pos - i0).astype(np.float32)
+        table = self.table
+        rows = lanes["row"]
+        v0 = table[rows, i0]
+        values = v0 + (table[rows, i0 + 1] - v0) * frac
+        values = np.clip(values * lanes["level"] * 255.0 + 0.5, 0.0, 255.0).astype(np.uint8)
+
+        flat = self.flat
+        ltp = lanes["ltp"]
+        if ltp.size:
+            flat[lanes["addr"][ltp]] = values[ltp]
+        htp = lanes["htp"]
+        if htp.size:
+            layer = np.zeros(lanes["htp_addr"].size, dtype=np.uint8)
+            np.maximum.at(layer, lanes["htp_slot"], values[htp])
+            channels = lanes["htp_addr"]
+            below = np.where(lanes["htp_shared"], flat[channels], 0).astype(np.uint8)
+            flat[channels] = np.maximum(below, layer)
+
+        finished = []
+        if done.any():
+            finished = np.unique(lanes["id"][done]).tolist()
+            for iid in finished:
+                self.instances.pop(iid, None)
+            self.dirty = True
+        return finished
+
+
+##########################
+# BENCHMARK
+##########################
+
+# run from the project root: python -m process.sequence.sequencer [instances]
+if __name__ == "__main__":
+    import sys
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    curves = load_sequences(os.path.join(os.path.dirname(__file__), "..", "..", "res", "sequences"))
+    buffer = make_universe_buffer(64)
+    engine = SequenceEngine(buffer, curves)
+
+    rng = np.random.default_rng(0)
+    names = [n for n in curves if curves[n].duration > 0]
+    now = 0.0
+    for i in range(count):
+        name = names[i % len(names)]
+        lanes = curves[name].lanes
+        addr = rng.integers(0, buffer.size - lanes) + np.arange(lanes)
+        engine.start(name, addr, now=now + rng.random(), loop=True)
+
+    times = []
+    for f in range(2000):
+        now += 1 / 44
+        t0 = time.perf_counter()
+        engine.tick(now)
+        times.append(time.perf_counter() - t0)
+    times = np.array(times[10:]) * 1000
+    lanes = engine._lanes["row"].size
+    print(f"{count} instances / {lanes} lanes across {len(curves)} sequences")
+    print(f"tick mean {times.mean():.3f} ms  p99 {np.percentile(times, 99):.3f} ms  max {times.max():.3f} ms  (budget 2 ms)")
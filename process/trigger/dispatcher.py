@@ -0,0 +1,208 @@
+# Trigger dispatch for map trigger groups.
+#
+# At map load the dispatcher resolves
+#
+#   event path ("Controller.ControlVis.T.PRESS") -> trigger groups -> item indexes
+#
+# into one dict entry per event holding a list of (action, item array) batches. Firing an
+# event is then a dict lookup plus one call per bound action, independent of map size.
+# Items opt in with `props { triggerGroup: N }`.
+
+import time
+
+import numpy as np
+
+import tracing
+
+from process.map.mapdata import map_items, map_triggers
+
+
+##########################
+# LATENCY
+##########################
+
+class LatencyHistogram:
+    """Log2-bucketed nanosecond histogram (bucket i holds [2^(i-1), 2^i) ns)."""
+
+    BUCKETS = 64
+
+    def __init__(self):
+        self.counts = [0] * self.BUCKETS
+        self.total = 0
+        self.sum_ns = 0
+        self.max_ns = 0
+
+    def record(self, ns):
+        self.counts[min(ns.bit_length(), self.BUCKETS - 1)] += 1
+        self.total += 1
+        self.sum_ns += ns
+        if ns > self.max_ns:
+            self.max_ns = ns
+
+    def reset(self):
+        self.__init__()
+
+    def percentile(self, p):
+        """Upper bound (ns) of the bucket containing the p-th percentile."""
+        if self.total == 0:
+            return 0
+        target = self.total * p / 100.0
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return min(1 << i, self.max_ns)
+        return self.max_ns
+
+    def mean(self):
+        return self.sum_ns / self.total if self.total else 0.0
+
+    def summary(self):
+        return (f"n={self.total} mean={self.mean() / 1000:.2f}us p50<={self.percentile(50) / 1000:.2f}us "
+                f"p99<={self.percentile(99) / 1000:.2f}us max={self.max_ns / 1000:.2f}us")
+
+
+##########################
+# DISPATCHER
+##########################
+
+def set_level(state, items, event, value):
+    """Default action: write the event value into the items' state."""
+    state[items] = value
+
+
+class TriggerDispatcher:
+    """
+    Built once from a compiled map. `state` is one float32 per item (in map order) that the
+    default action writes; bind() attaches other actions per trigger group.
+    """
+
+    def __init__(self, parsed_map):
+        self.items = map_items(parsed_map)
+        self.item_keys = list(self.items)
+        self.item_index = {key: i for i, key in enumerate(self.item_keys)}
+        self.groups = map_triggers(parsed_map)
+        self.state = np.zeros(len(self.item_keys), dtype=np.float32)
+        self.histogram = LatencyHistogram()
+        self.fired = 0
+        self.missed = 0
+
+        members = {}
+        for i, item in enumerate(self.items.values()):
+            props = item.get("props")
+            if isinstance(props, dict) and props.get("triggerGroup") is not None:
+                members.setdefault(props["triggerGroup"], []).append(i)
+        self.members = {g: np.array(idx, dtype=np.intp) for g, idx in members.items()}
+
+        self.actions = {g: [set_level] for g in self.groups}
+        self._build()
+
+    def _build(self):
+        """event path -> [(action, items)], one batch per distinct action over all its groups."""
+        by_event = {}
+        for g, group in self.groups.items():
+            event = group.get("trigger")
+            items = self.members.get(g)
+            if not event or items is None or items.size == 0:
+                continue
+            for action in self.actions[g]:
+                by_event.setdefault(event, {}).setdefault(action, []).append(items)
+
+        self.index = {}
+        for event, actions in by_event.items():
+            self.index[event] = [(action, np.unique(np.concatenate(parts)) if len(parts) > 1 else parts[0])
+                                 for action, parts in actions.items()]
+
+    def bind(self, group, action, replace=False):
+        """
+        Attach `action(state, items, event, value)` to trigger group `group`.
+        With replace=True the default set_level action is dropped.
+        """
+        if group not in self.groups:
+            raise KeyError(f"no trigger group {group}")
+        if replace:
+            self.actions[group] = [action]
+        else:
+            self.actions[group].append(action)
+        self._build()
+
+    def events(self):
+        return list(self.index)
+
+    def items_for(self, event):
+        batches = self.index.get(event)
+        if not batches:
+            return np.zeros(0, dtype=np.intp)
+        return np.unique(np.concatenate([items for _, items in batches]))
+
+    def fire(self, event, value=1.0):
+        """Run every action bound to `event`. Returns False if nothing listens to it."""
+        t0 = time.perf_counter_ns()
+        batches = self.index.get(event)
+        if batches is None:
+            self.missed += 1
+            return False
+        state = self.state
+        for action, items in batches:
+            action(state, items, event, value)
+        self.fired += 1
+        t1 = time.perf_counter_ns()
+        self.histogram.record(t1 - t0)
+        tracing.complete("trigger.dispatch", t0, t1)
+        return True
+
+
+##########################
+# BENCHMARK
+##########################
+
+def synthetic_map(items=20000, groups=256, controllers=16):
+    """A compiled-map dict with `items` items spread over `groups` trigger groups."""
+    rng = np.random.default_rng(0)
+    member = rng.integers(0, groups, items)
+    parsed = {".map": {"items": {}, "triggers": {}}}
+    body = parsed[".map"]
+    for i in range(items):
+        body["items"][f"item.i{i}"] = {
+            "name": f"i{i}", "object": "basicTurretLEDLightRGBW",
+            "posX": float(rng.random() * 1000), "posY": float(rng.random() * 1000), "posZ": 0,
+            "rotX": 0, "rotY": 0, "rotZ": 0,
+            "props": {"type": "controllableLight", "triggerGroup": int(member[i])},
+        }
+    for g in range(groups):
+        tie = f"Controller.C{g % controllers}.B{g}"
+        body["triggers"][f"group.{g}"] = {
+            "groupName": f"g{g}", "groupIndex": g, "trigger": tie + ".PRESS", "tie": tie, "ref": f"0x{g:02x}",
+        }
+    return parsed
+
+
+# run from the project root: python -m process.trigger.dispatcher [items] [events/s]
+if __name__ == "__main__":
+    import sys
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    rate = int(sys.argv[2]) if len(sys.argv) > 2 else 10000
+
+    parsed = synthetic_map(count)
+    t0 = time.perf_counter()
+    dispatcher = TriggerDispatcher(parsed)
+    print(f"index built for {count} items / {len(dispatcher.groups)} groups in "
+          f"{(time.perf_counter() - t0) * 1000:.1f} ms")
+
+    events = dispatcher.events()
+    rng = np.random.default_rng(1)
+    order = [events[i] for i in rng.integers(0, len(events), rate * 2)]
+    start = time.perf_counter()
+    cpu0 = time.process_time()
+    for n, event in enumerate(order):
+        dispatcher.fire(event, 1.0 if n & 1 else 0.0)
+        # pace to `rate` events per second
+        wait = start + (n + 1) / rate - time.perf_counter()
+        if wait > 0.001:
+            time.sleep(wait)
+    wall = time.perf_counter() - start
+    cpu = time.process_time() - cpu0
+    print(f"fired {dispatcher.fired} events in {wall:.2f} s ({dispatcher.fired / wall:.0f}/s), "
+          f"core load {cpu / wall * 100:.1f}%")
+    print(dispatcher.histogram.summary())
@@ -0,0 +1,368 @@
+# Block-based mixing engine behind res/gui/flmix.ui: N mono input streams summed into
+# stereo buses (master, monitor) with fader gain, pan, mute/solo and per-bus sends.
+#
+# Everything a block needs is allocated up front. Controls (set_fader, set_pan, ...) only
+# write targets into (channels,) arrays from the UI thread; process() turns them into a
+# (buses, channels, 2) gain matrix once per block. When the gains have settled a bus is a
+# single (2, channels) @ (channels, block) product. While a fader moves, each gain glides
+# toward its target with a one-pole smoother (SMOOTHING seconds), ramped linearly across
+# the block, so no step lands on one sample (zipper noise). Per-channel and per-bus
+# peak/RMS are taken from the same buffers in the same pass.
+#
+# Sources are anything with read(out) filling a (block,) float32 array; the engine pulls
+# one block from each, so a pyaudio output callback only has to call render(). With a
+# res.audio.meter.MeteringService attached (meters=), every block's inputs and bus sides
+# are also metered there for the UI (rows: channels, then bus 0 left/right, bus 1 ...).
+
+import math
+import os
+import time
+
+import numpy as np
+
+import tracing
+
+RATE = 48000
+BLOCK = 256
+CHANNELS = 32
+BUSES = ("master", "monitor")
+SMOOTHING = 0.010  # seconds for a gain change to reach ~63% of its target
+SETTLED = 1e-6  # gain difference below which a ramp is finished
+MIN_DB = -90.0  # fader bottom; treated as off
+
+FLMIX_UI = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "gui", "flmix.ui")
+
+# flmix.ui strip widgets, by object name, for bind_strip()
+STRIP_CONTROLS = {
+    "wid_ch": {"fader": "verticalSlider_2", "pan": "dial_3", "mute": "checkBox_6", "solo": "checkBox_4",
+               "send": "dial_5", "meter": "progressBar_3"},
+    "wid_mas": {"fader": "verticalSlider", "pan": "dial_2", "mute": "checkBox_3", "meter": "progressBar_2"},
+    "wid_mon": {"level": "dial", "meter": "progressBar"},
+}
+
+
+def db_to_gain(db):
+    return 0.0 if db <= MIN_DB else 10.0 ** (db / 20.0)
+
+
+def gain_to_db(gain):
+    return 20.0 * math.log10(gain) if gain > 10.0 ** (MIN_DB / 20.0) else MIN_DB
+
+
+##########################
+# SOURCES
+##########################
+
+class ArraySource:
+    """Plays a mono float32 array, looping or padding with silence at the end."""
+
+    def __init__(self, samples, loop=True):
+        self.samples = np.ascontiguousarray(samples, np.float32)
+        self.loop = loop
+        self.position = 0
+
+    def read(self, out):
+        n, samples = len(out), self.samples
+        filled = 0
+        while filled < n:
+            if self.position >= len(samples):
+                if not self.loop or not len(samples):
+                    out[filled:] = 0.0
+                    return
+                self.position = 0
+            take = min(n - filled, len(samples) - self.position)
+            out[filled:filled + take] = samples[self.position:self.position + take]
+            self.position += take
+            filled += take
+
+
+class SilentSource:
+    def read(self, out):
+        out[:] = 0.0
+
+
+##########################
+# ENGINE
+##########################
+
+class MixerEngine:
+    """
+    Mixes `channels` mono inputs into stereo `buses` in blocks of `block` samples.
+    Channel sends start at 1.0 into the first bus (master) and 0.0 into the others.
+    """
+
+    def __init__(self, channels=CHANNELS, buses=BUSES, rate=RATE, block=BLOCK, smoothing=SMOOTHING, meters=None):
+        self.channels, self.buses, self.rate, self.block = channels, tuple(buses), rate, block
+        self.meters = meters
+        nb = len(self.buses)
+        self.sources = [SilentSource()] * channels
+
+        # controls, written by the UI thread
+        self.fader = np.ones(channels, np.float32)
+        self.pan = np.zeros(channels, np.float32)  # -1 left .. 1 right
+        self.mute = np.zeros(channels, bool)
+        self.solo = np.zeros(channels, bool)
+        self.sends = np.zeros((nb, channels), np.float32)
+        self.sends[0] = 1.0
+        self.bus_gain = np.ones(nb, np.float32)
+        self.bus_mute = np.zeros(nb, bool)
+
+        # per-block state
+        self.coefficient = 1.0 - math.exp(-block / (smoothing * rate)) if smoothing > 0 else 1.0
+        self.gains = np.zeros((nb, channels, 2), np.float32)  # current (after smoothing)
+        self._target = np.zeros_like(self.gains)
+        self._step = np.zeros_like(self.gains)
+        self._ramp = (np.arange(1, block + 1, dtype=np.float32) / block)
+        self._ramped = np.zeros((nb, channels, 2, block), np.float32)
+        self.inputs = np.zeros((channels, block), np.float32)
+        self.output = np.zeros((nb, 2, block), np.float32)
+        self._square = np.zeros((channels, block), np.float32)
+        self._interleaved = np.zeros((block, 2), np.float32)
+        self._settled = False
+        self._version = 0  # bumped by every control change (UI thread)
+        self._applied = -1  # version the targets were last computed from (audio thread)
+        self.frames = 0
+
+        # meters of the last block; read by the UI without locking
+        self.channel_peak = np.zeros(channels, np.float32)
+        self.channel_rms = np.zeros(channels, np.float32)
+        self.bus_peak = np.zeros((nb, 2), np.float32)
+        self.bus_rms = np.zeros((nb, 2), np.float32)
+        self._update_targets()
+        self.gains[...] = self._target
+        self._applied = self._version
+        self._settled = True
+
+    # controls
+
+    def set_source(self, channel, source):
+        self.sources[channel] = source
+
+    def set_fader(self, channel, db):
+        self.fader[channel] = db_to_gain(db)
+        self._version += 1
+
+    def set_pan(self, channel, pan):
+        self.pan[channel] = min(max(pan, -1.0), 1.0)
+        self._version += 1
+
+    def set_mute(self, channel, muted):
+        self.mute[channel] = muted
+        self._version += 1
+
+    def set_solo(self, channel, soloed):
+        self.solo[channel] = soloed
+        self._version += 1
+
+    def set_send(self, bus, channel, gain):
+        self.sends[self.buses.index(bus) if isinstance(bus, str) else bus, channel] = gain
+        self._version += 1
+
+    def set_bus(self, bus, db=None, muted=None):
+        bus = self.buses.index(bus) if isinstance(bus, str) else bus
+        if db is not None:
+            self.bus_gain[bus] = db_to_gain(db)
+        if muted is not None:
+            self.bus_mute[bus] = muted
+        self._version += 1
+
+    def _update_targets(self):
+        # solo: when any channel is soloed, only soloed channels sound
+        audible = ~self.mute & (self.solo if self.solo.any() else True)
+        level = self.fader * audible
+        angle = (self.pan + 1.0) * (math.pi / 4)  # constant power pan
+        target = self._target
+        target[:, :, 0] = level * np.cos(angle)
+        target[:, :, 1] = level * np.sin(angle)
+        target *= (self.sends * (self.bus_gain * ~self.bus_mute)[:, None])[:, :, None]
+
+    # processing
+
+    def process(self, inputs=None):
+        """Mix one block of `inputs` ((channels, block) float32, default self.inputs); returns (buses, 2, block)."""
+        x = self.inputs if inputs is None else inputs
+        gains, out = self.gains, self.output
+        if self._applied != self._version:
+            self._applied = self._version
+            self._update_targets()
+            self._settled = False
+        if not self._settled:
+            np.subtract(self._target, gains, out=self._step)
+            if np.abs(self._step).max() < SETTLED:
+                gains[...] = self._target
+                self._settled = True
+            else:
+                self._step *= self.coefficient
+        if self._settled:
+            for b in range(len(self.buses)):
+                np.matmul(gains[b].T, x, out=out[b])
+        else:
+            # per-sample gains gliding from the current to the next block's value
+            ramped = self._ramped
+            np.multiply(self._step[..., None], self._ramp, out=ramped)
+            ramped += gains[..., None]
+            gains += self._step
+            ramped *= x[None, :, None, :]
+            ramped.sum(axis=1, out=out)
+
+        # meters
+        np.multiply(x, x, out=self._square)
+        self._square.mean(axis=1, out=self.channel_rms)
+        np.sqrt(self.channel_rms, out=self.channel_rms)
+        np.maximum(x.max(axis=1), -x.min(axis=1), out=self.channel_peak)
+        np.maximum(out.max(axis=2), -out.min(axis=2), out=self.bus_peak)
+        np.sqrt((out * out).mean(axis=2), out=self.bus_rms)
+        if self.meters is not None:
+            self.meters.measure(x, out.reshape(-1, self.block))
+        self.frames += self.block
+        return out
+
+    def render(self):
+        """Pull one block from every source and mix it."""
+        with tracing.span("mixer.block"):
+            for channel, source in enumerate(self.sources):
+                source.read(self.inputs[channel])
+            return self.process()
+
+    def interleaved(self, bus=0):
+        """The last block of `bus` as interleaved stereo float32 (a view, reused per block)."""
+        self._interleaved[...] = self.output[bus].T
+        return self._interleaved
+
+    def pyaudio_callback(self, in_data, frame_count, time_info, status):
+        """Stream callback for a stereo paFloat32 output opened with frames_per_buffer=block."""
+        import pyaudio
+
+        self.render()
+        return self.interleaved().tobytes(), pyaudio.paContinue
+
+
+##########################
+# UI
+##########################
+
+def load_panel(engine=None, qss_path="stylesheet.qss", ui_path=FLMIX_UI, parent=None):
+    """
+    Build the flmix.ui window. The app-level sheet is stripped to the main window's classes,
+    so the panel gets its own (checkboxes, sliders, dials) the first time it is shown.
+    With an `engine`, the strips are bound to channel 0, master and monitor, and their
+    meters run from one MeterPanel (panel.meters) over the engine's metering service.
+    """
+    from PyQt5 import uic
+    from PyQt5.QtWidgets import QWidget
+    from res.compiler.qss import apply_on_first_show
+
+    panel = uic.loadUi(ui_path)
+    if parent is not None:
+        panel.setParent(parent, panel.windowFlags())
+    apply_on_first_show(panel, qss_path, [ui_path])
+    if engine is not None:
+        from res.audio.meter import MeteringService, MeterPanel
+
+        if engine.meters is None:  # process() meters every block from the next one on
+            engine.meters = MeteringService(engine.channels + 2 * len(engine.buses), engine.rate, engine.block)
+        panel.meters = MeterPanel(engine.meters.bank, parent=panel)
+        bind_strip(panel.findChild(QWidget, "wid_ch"), engine, channel=0, meters=panel.meters)
+        bind_strip(panel.findChild(QWidget, "wid_mas"), engine, bus=0, meters=panel.meters)
+        if len(engine.buses) > 1:
+            bind_strip(panel.findChild(QWidget, "wid_mon"), engine, bus=1, meters=panel.meters)
+        panel.meters.start()
+    return panel
+
+
+def bind_strip(strip, engine, channel=None, bus=None, meters=None):
+    """
+    Connect an flmix.ui strip widget (wid_ch, wid_mas or wid_mon, found by object name) to
+    `engine`: its fader (QSlider, 0..99 -> MIN_DB..+6 dB), pan dial, mute/solo boxes and
+    send dial drive `channel`, or `bus` for the master/monitor strips. The strip's progress
+    bar is added to `meters`, the window's shared res.audio.meter.MeterPanel over
+    engine.meters.bank: the channel's row, or the louder side of the bus.
+    """
+    from PyQt5.QtWidgets import QWidget
+
+    names = STRIP_CONTROLS.get(strip.objectName(), STRIP_CONTROLS["wid_ch"])  # copies of wid_ch are channels
+    find = lambda role: strip.findChild(QWidget, names[role]) if role in names else None
+
+    def slider_db(value, low=0, high=99):
+        return MIN_DB if value <= low else -60.0 + 66.0 * (value - low) / (high - low)
+
+    fader, pan, mute, solo, send, level = (find(r) for r in ("fader", "pan", "mute", "solo", "send", "level"))
+    if channel is not None:
+        if fader is not None:
+            fader.valueChanged.connect(lambda v: engine.set_fader(channel, slider_db(v, fader.minimum(), fader.maximum())))
+        if pan is not None:
+            pan.valueChanged.connect(lambda v: engine.set_pan(
+                channel, 2.0 * (v - pan.minimum()) / max(pan.maximum() - pan.minimum(), 1) - 1.0))
+        if mute is not None:
+            mute.toggled.connect(lambda on: engine.set_mute(channel, on))
+        if solo is not None:
+            solo.toggled.connect(lambda on: engine.set_solo(channel, on))
+        if send is not None and len(engine.buses) > 1:
+            send.valueChanged.connect(lambda v: engine.set_send(1, channel, v / max(send.maximum(), 1)))
+    else:
+        bus = bus or 0
+        if fader is not None:
+            fader.valueChanged.connect(lambda v: engine.set_bus(bus, db=slider_db(v, fader.minimum(), fader.maximum())))
+        if level is not None:
+            level.valueChanged.connect(lambda v: engine.set_bus(bus, db=slider_db(v, level.minimum(), level.maximum())))
+        if mute is not None:
+            mute.toggled.connect(lambda on: engine.set_bus(bus, muted=on))
+
+    meter = find("meter")
+    if meter is not None and meters is not None:
+        if channel is not None:
+            meters.add(meter, channel)
+        else:
+            side = engine.channels + 2 * bus
+            meters.add(meter, (side, side + 1))
+
+
+# run from the project root: python -m res.audio.mixer [channels] [seconds]
+if __name__ == "__main__":
+    import sys
+
+    channels = int(sys.argv[1]) if len(sys.argv) > 1 else CHANNELS
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 20.0
+
+    rng = np.random.default_rng(3)
+    engine = MixerEngine(channels)
+    t = np.arange(RATE * 2) / RATE
+    for c in range(channels):
+        tone = 0.2 * np.sin(2 * np.pi * (110 * (1 + c % 12)) * t) + 0.02 * rng.standard_normal(len(t))
+        engine.set_source(c, ArraySource(tone.astype(np.float32)))
+        engine.set_pan(c, -1.0 + 2.0 * c / max(channels - 1, 1))
+    engine.set_send("monitor", 0, 0.5)
+
+    blocks = int(seconds * RATE / BLOCK)
+    master = np.zeros((blocks * BLOCK, 2), np.float32)
+    moving = 0
+    t0 = time.perf_counter()
+    for i in range(blocks):
+        if i % 40 == 0:  # someone rides a few faders several times a second
+            for c in rng.integers(channels, size=4):
+                engine.set_fader(c, float(rng.uniform(-30, 0)))
+            engine.set_mute(int(rng.integers(channels)), bool(rng.integers(2)))
+        moving += not engine._settled
+        engine.render()
+        master[i * BLOCK:(i + 1) * BLOCK] = engine.interleaved()
+    elapsed = time.perf_counter() - t0
+
+    per_block = elapsed / blocks
+    budget = BLOCK / RATE
+    print(f"{channels} channels, {len(BUSES)} buses, {blocks} blocks of {BLOCK} @ {RATE} Hz "
+          f"({moving} while a gain was moving)")
+    print(f"{per_block * 1e6:.1f} us/block = {100 * per_block / budget:.1f}% of one core in real time "
+          f"({seconds / elapsed:.0f}x real time)")
+
+    # a gain step lands on one sample only without smoothing: compare the worst jumps
+    engine = MixerEngine(1, smoothing=SMOOTHING)
+    engine.set_source(0, ArraySource(np.ones(RATE, np.float32)))
+    steps = []
+    for i in range(50):
+        if i == 10:
+            engine.set_fader(0, -40.0)
+        engine.render()
+        steps.append(engine.output[0, 0].copy())
+    jump = np.abs(np.diff(np.concatenate(steps))).max()
+    unsmoothed = math.cos(math.pi / 4) * (1.0 - db_to_gain(-40.0))
+    print(f"fader 0 -> -40 dB on DC: largest sample-to-sample step {jump:.4f} (unsmoothed {unsmoothed:.4f})")
@@ -25,7 +25,56 @@ import re
 import time
 from pathlib import Path
 
-from torch.masked import as_masked_tensor
+try:
+    from tracing import span
+except ImportError:  # compiler run on its own, outside the app
+    from contextlib import nullcontext as span
+
+
+_COMMENT = re.compile(r'##.*|//.*')
+# quoted strings, punctuation, or word chunks; chunks stop at line ends like the file's lines
+_TOKEN = re.compile(r'"[^"\n]*"|[{}:;]|[^{}:;\n]+')
+_SPACES = re.compile(r'\s+')
+_INT = re.compile(r"-?\d+")
+_FLOAT = re.compile(r"-?\d+\.\d+")
+_CONSTANTS = {"true": True, "false": False, "null": None}
+
+
+def tokenize(text: str):
+    """Tokens of a source file: comments dropped, multi-word chunks joined with dots."""
+    tokens = []
+    for p in _TOKEN.findall(_COMMENT.sub('', text)):
+        p = p.strip()
+        if not p:
+            continue
+        # Multi-word identifiers like "group dmx_out"
+        if p[0] not in '{}:;"':
+            p = _SPACES.sub('.', p)
+        tokens.append(p)
+    return tokens
+
+
+def convert_value(val: str):
+    """Convert strings to proper JSON types."""
+    if val.startswith('"') and val.endswith('"'):
+        return val.strip('"')  # quoted string
+
+    low = val.lower()
+    if low in _CONSTANTS:
+        return _CONSTANTS[low]
+
+    # Hex values -> "0x..." string
+    if val.startswith("@x"):
+        return "0x" + val[2:]
+
+    # Try numeric conversion
+    if _INT.fullmatch(val):
+        return int(val)
+    if _FLOAT.fullmatch(val):
+        return float(val)
+
+    # Otherwise plain string
+    return val
 
 
 def parse_custom_format(text: str):
@@ -39,137 +88,171 @@ def parse_custom_format(text: str):
       - quoted strings that preserve spaces
       - automatic type conversion (int, float, bool, null)
       - @x prefix becomes "0x.." string
-    """
-
-    # --- Preprocessing ---
-    # Remove comments
-    text = re.sub(r'##.*', '', text)
-    text = re.sub(r'//.*', '', text)
-    text = text.strip()
-
-    # --- Tokenization ---
-    # Split by punctuation, but preserve quoted strings and multi-word keys per line.
-    lines = text.splitlines()
-    tokens = []
 
-    for line in lines:
-        line = line.strip()
-        if not line:
-            continue
-
-        # Match quoted strings, braces, colons, semicolons, or word chunks
-        parts = re.findall(r'"[^"]*"|[{}:;]|[^{}:;]+', line)
-        for p in parts:
-            p = p.strip()
-            if not p:
-                continue
-            # Multi-word identifiers like "group dmx_out"
-            if not re.match(r'^[{}:;"]', p):
-                p = re.sub(r'\s+', '.', p)
-            tokens.append(p)
-
-    idx = 0
+    Blocks are tracked on an explicit stack, so nesting depth is unlimited; the top level
+    is the bottom of the stack and follows the same grammar (a `}` or `;` there closes
+    nothing and is skipped).
+    """
+    tokens = tokenize(text)
     n = len(tokens)
+    result = {}
+    stack = [result]
+    obj = result
+    idx = 0
 
-    def convert_value(val: str):
-        """Convert strings to proper JSON types."""
-        if val.startswith('"') and val.endswith('"'):
-            return val.strip('"')  # quoted string
+    while idx < n:
+        token = tokens[idx]
+        idx += 1
 
-        low = val.lower()
-        if low == "true":
-            return True
-        if low == "false":
-            return False
-        if low == "null":
-            return None
+        if token == '}' or token == ';':
+            if len(stack) > 1:
+                stack.pop()
+                obj = stack[-1]
+            continue
+        if token == '{':
+            continue
 
-        # Hex values -> "0x..." string
-        if val.startswith("@x"):
-            return "0x" + val[2:]
+        follow = tokens[idx] if idx < n else None
+        # key:value, optional ;
+        if follow == ':':
+            if idx + 1 < n:
+                obj[token] = convert_value(tokens[idx + 1])
+                idx += 2
+                if idx < n and tokens[idx] == ';':
+                    idx += 1
+            else:
+                idx += 1
+        # key { ... }
+        elif follow == '{':
+            idx += 1
+            child = {}
+            obj[token] = child
+            stack.append(child)
+            obj = child
+        # a bare word is dropped
 
-        # Try numeric conversion
-        if re.fullmatch(r"-?\d+", val):
-            return int(val)
-        if re.fullmatch(r"-?\d+\.\d+", val):
-            return float(val)
+    return result
 
-        # Otherwise plain string
-        return val
 
-    def parse_block():
-        nonlocal idx
-        obj = {}
+INHERITS = "inherits"
 
-        while idx < n:
-            token = tokens[idx]
 
-            if token == '}':
-                idx += 1
-                return obj
+def merge_blocks(base, override):
+    """`override` on top of `base`: nested blocks merge key by key, anything else replaces."""
+    merged = dict(base)
+    for key, value in override.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = merge_blocks(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
 
-            elif token == ';':
-                idx += 1
-                return obj
 
-            elif token == '{':
-                idx += 1
+def resolve_inherits(parsed, lookup, name=""):
+    """
+    Resolve a top-level `inherits: "base"` against `lookup(file name) -> parsed dict` (None
+    if unknown). A base without a suffix takes the suffix of `name`; bases may inherit in
+    turn. Raises ValueError for unknown bases and cycles.
+    """
+    chain = [name]
+    layers = [parsed]
+    while INHERITS in layers[-1]:
+        base = str(layers[-1][INHERITS])
+        if not os.path.splitext(base)[1]:
+            base += os.path.splitext(name)[1]
+        if base in chain:
+            raise ValueError(f"{name}: inheritance cycle {' -> '.join(chain + [base])}")
+        found = lookup(base)
+        if found is None:
+            raise ValueError(f"{chain[-1]}: unknown base object '{base}'")
+        chain.append(base)
+        layers.append(found)
+    if len(layers) == 1:
+        return parsed
+    resolved = {}
+    for layer in reversed(layers):
+        resolved = merge_blocks(resolved, {k: v for k, v in layer.items() if k != INHERITS})
+    return resolved
+
+
+def source_lookup(basepath):
+    """lookup() for resolve_inherits over every source file under `basepath`, by file name."""
+    paths = {}
+    for root, _, files in os.walk(basepath):
+        for file in files:
+            paths.setdefault(file, os.path.join(root, file))
+    cache = {}
+
+    def lookup(name):
+        if name not in cache:
+            path = paths.get(name)
+            if path is None:
+                return None
+            with open(path, "r", encoding="utf-8") as f:
+                cache[name] = parse_custom_format(f.read())
+        return cache[name]
+
+    return lookup
+
+
+_json_scalar = json.JSONEncoder(ensure_ascii=False).encode
+_END = object()
+
+
+def _json_key(key):
+    if isinstance(key, str):
+        return _json_scalar(key)
+    if key is True or key is False or key is None:
+        return '"' + _json_scalar(key) + '"'
+    return '"' + _json_scalar(key).strip('"') + '"'
+
+
+def json_chunks(value, indent=4):
+    """
+    Text of json.dumps(value, indent=indent, ensure_ascii=False) in chunks. Containers are
+    walked with an explicit stack, so like parse_custom_format it has no depth limit; it is
+    slower than the stdlib encoder, which convert_file tries first.
+    """
+    pad = " " * indent
+    stack = []  # [iterator, is dict, first item] per open container
+    while True:
+        if isinstance(value, dict) and value:
+            yield "{"
+            stack.append([iter(value.items()), True, True])
+        elif isinstance(value, (list, tuple)) and value:
+            yield "["
+            stack.append([iter(value), False, True])
+        else:
+            yield _json_scalar(value)
+        while stack:
+            frame = stack[-1]
+            item = next(frame[0], _END)
+            if item is _END:
+                stack.pop()
+                yield "\n" + pad * len(stack) + ("}" if frame[1] else "]")
                 continue
-
+            lead = "\n" if frame[2] else ",\n"
+            frame[2] = False
+            if frame[1]:
+                key, value = item
+                yield lead + pad * len(stack) + _json_key(key) + ": "
             else:
-                key = token
-                idx += 1
-
-                # key:value
-                if idx < n and tokens[idx] == ':':
-                    idx += 1
-                    if idx < n:
-                        val_token = tokens[idx]
-                        val = convert_value(val_token)
-                        obj[key] = val
-                        idx += 1
-                    # optional ;
-                    if idx < n and tokens[idx] == ';':
-                        idx += 1
-
-                # key { ... }
-                elif idx < n and tokens[idx] == '{':
-                    idx += 1
-                    val = parse_block()
-                    obj[key] = val
-
-                else:
-                    pass
-
-        return obj
-
-    # Top-level parser
-    result = {}
-    while idx < n:
-        key = tokens[idx]
-        idx += 1
-        if idx < n and tokens[idx] == '{':
-            idx += 1
-            val = parse_block()
-            result[key] = val
-        elif idx < n and tokens[idx] == ':':
-            idx += 1
-            val = convert_value(tokens[idx])
-            result[key] = val
-            idx += 1
-            if idx < n and tokens[idx] == ';':
-                idx += 1
-
-    return result
+                value = item
+                yield lead + pad * len(stack)
+            break
+        else:
+            return
 
 
-def convert_file(input_path: str, output_root: str = "./temp"):
-    time.sleep(0.1)
+def convert_file(input_path: str, output_root: str = "./temp", lookup=None):
     input_path = Path(input_path)
     with open(input_path, "r", encoding="utf-8") as f:
         content = f.read()
 
-    parsed = parse_custom_format(content)
+    with span("compile"):
+        parsed = parse_custom_format(content)
+        if lookup is not None:
+            parsed = resolve_inherits(parsed, lookup, input_path.name)
 
     try:
         relative_path = input_path.relative_to(input_path.parents[1])
@@ -181,9 +264,14 @@ def convert_file(input_path: str, output_root: str = "./temp"):
 
 
 
+    try:
+        text = json.dumps(parsed, indent=4, ensure_ascii=False)
+    except RecursionError:  # nested deeper than the stdlib encoder goes
+        text = "".join(json_chunks(parsed))
+
     os.makedirs(output_path.parent, exist_ok=True)
     with open(output_path, "w", encoding="utf-8") as f:
-        json.dump(parsed, f, indent=4, ensure_ascii=False)
+        f.write(text)
 
 def cfid_recursive(directory_path):
     """
@@ -206,6 +294,7 @@ def cfid_recursive(directory_path):
     return file_count
 
 def run_bulk(basepath, folders, temproot="./temp/"):
+    lookup = source_lookup(basepath)
     for folder in folders:
         amt = 0
         sf0 = basepath + folder
@@ -213,35 +302,35 @@ def run_bulk(basepath, folders, temproot="./temp/"):
         for root, dirs, files in os.walk(sf0):
             print(f"\rcompiled {amt} in {folder}\t\t\t\t({round((amt/size)*100)}%)", end="")
             for file in files:
-                convert_file(root + "/" + file, temproot + "/" + root.replace(basepath, "") + "/")
+                convert_file(root + "/" + file, temproot + "/" + root.replace(basepath, "") + "/", lookup)
                 amt += 1
                 print(f"\rcompiled {amt} in {folder}\t\t\t\t({round((amt/size)*100)}%)", end="")
             for folder0 in dirs:
                 sf1 = basepath + folder0 + "/" + folder
                 for root, dirs, files in os.walk(sf1):
                     for file in files:
-                        convert_file(root + "/" + file, temproot + "/" + root.replace(basepath, "") + "/")
+                        convert_file(root + "/" + file, temproot + "/" + root.replace(basepath, "") + "/", lookup)
                         amt += 1
                         print(f"\rcompiled {amt} in {folder}\t\t\t\t({round((amt/size)*100)}%)", end="")
                     for folder1 in dirs:
                         sf2 = sf1 + "/" + folder1
                         for root, dirs, files in os.walk(sf2):
                             for file in files:
-                                convert_file(root + "/" + file, temproot + "/" + root.replace(basepath, "") + "/")
+                                convert_file(root + "/" + file, temproot + "/" + root.replace(basepath, "") + "/", lookup)
                                 amt += 1
                                 print(f"\rcompiled {amt} in {folder}\t\t\t\t({round((amt/size)*100)}%)", end="")
                             for folder2 in dirs:
                                 sf3 = sf2 + "/" + folder2
                                 for root, dirs, files in os.walk(sf3):
                                     for file in files:
-                                        convert_file(root + "/" + file, temproot + "/" + root.replace(basepath, "") + "/")
+                                        convert_file(root + "/" + file, temproot + "/" + root.replace(basepath, "") + "/", lookup)
                                         amt += 1
                                         print(f"\rcompiled {amt} in {folder}\t\t\t\t({round((amt/size)*100)}%)", end="")
                                     for folder3 in dirs:
                                         sf4 = sf3 + "/" + folder3
                                         for root, dirs, files in os.walk(sf4):
                                             for file in files:
-                                                convert_file(root + "/" + file, temproot + "/" + root.replace(basepath, "") + "/")
+                                                convert_file(root + "/" + file, temproot + "/" + root.replace(basepath, "") + "/", lookup)
                                                 amt += 1
                                                 print(f"\rcompiled {amt} in {folder}\t\t\t\t({round((amt/size)*100)}%)", end="")
                                             for folder4 in dirs:
@@ -263,4 +352,29 @@ def run_bulk(basepath, folders, temproot="./temp/"):
 #         exit(1)
 #     convert_file(sys.argv[1])
 
-run_bulk("C:/Network-ext/LightCommander/res/", ["map", "rack", "sequences", "objects"])
\ No newline at end of file
+def _synthetic_deep(depth):
+    """One chain of `depth` nested blocks, each with a value."""
+    return "".join(f"level{i} {{\n    index: {i}\n" for i in range(depth)) + "}\n" * depth
+
+
+def _synthetic_wide(blocks):
+    """`blocks` sibling item blocks of a few values each, like a large map."""
+    item = 'item.{0} {{\n    name: "fixture {0}"\n    posX: {0}.5\n    posY: -{0}\n    visible: true\n}};\n'
+    return ".map {\nitems {\n" + "".join(item.format(i) for i in range(blocks)) + "};\n};\n"
+
+
+# run from the project root: python -m res.compiler.compiler --bench
+if __name__ == "__main__":
+    import sys
+
+    if sys.argv[1:2] == ["--bench"]:
+        for label, text in (("deep x100000", _synthetic_deep(100000)), ("wide x100000", _synthetic_wide(100000))):
+            t0 = time.perf_counter()
+            tokens = tokenize(text)
+            t1 = time.perf_counter()
+            parse_custom_format(text)
+            t2 = time.perf_counter()
+            print(f"{label}: {len(text) / 1e6:.1f} MB, {len(tokens)} tokens, tokenize {(t1 - t0) * 1000:.0f} ms, "
+                  f"parse incl. tokenize {(t2 - t1) * 1000:.0f} ms")
+    else:
+        run_bulk("C:/Network-ext/LightCommander/res/", ["map", "rack", "sequences", "objects"])
\ No newline at end of file
@@ -0,0 +1,227 @@
+# Compiles the `.channels` block of light objects (.lco) into flat channel-offset tables
+# and patches fixture instances into absolute DMX addresses.
+#
+# ```
+# .channels {
+#     pan {
+#         offset: 0      ## from the fixture's start address
+#         width: 2       ## bytes, 2 = 16 bit (coarse at offset, fine at offset + 1)
+#         default: 32768 ## raw dmx value (0..255 or 0..65535)
+#     }
+# }
+# ```
+#
+# A FixturePatch keeps, per attribute, one array of coarse addresses and one of fine
+# addresses (flat indexes into the (universes, 512) buffer) for every patched fixture that
+# has it, so writing an attribute for thousands of fixtures is a single scatter.
+
+import os
+from pathlib import Path
+
+import numpy as np
+
+from res.compiler.library import ObjectLibrary
+
+DMX_SLOTS = 512
+NO_FINE = -1
+
+
+class FixtureProfile:
+    """
+    Channel layout of one object. `table` maps attribute -> (offset, width, fine, default),
+    `fine` is NO_FINE for 8-bit attributes.
+    """
+
+    def __init__(self, name, table):
+        self.name = name
+        self.table = table
+        self.attributes = list(table)
+        self.offsets = np.array([table[a][0] for a in self.attributes], dtype=np.intp)
+        self.footprint = max((max(off, fine) + 1 for off, _, fine, _ in table.values()), default=0)
+
+    def __repr__(self):
+        return f"FixtureProfile({self.name}, {self.footprint}ch, {self.attributes})"
+
+
+def compile_profile(parsed, name):
+    """Build a FixtureProfile from a parsed .lco dict (empty profile if it has no .channels)."""
+    channels = parsed.get(".channels") or {}
+    table = {}
+    for attr, spec in channels.items():
+        if not isinstance(spec, dict):
+            continue
+        offset = int(spec.get("offset", 0))
+        width = int(spec.get("width", 1))
+        if width not in (1, 2):
+            raise ValueError(f"{name}.{attr}: width must be 1 or 2, got {width}")
+        fine = int(spec.get("fine", offset + 1)) if width == 2 else NO_FINE
+        default = int(spec.get("default", 0))
+        table[attr] = (offset, width, fine, default)
+    return FixtureProfile(name, table)
+
+
+def load_profiles(root="res/objects"):
+    """Compile every .lco under `root` that declares channels; returns {name: FixtureProfile}."""
+    profiles = {}
+    for name, parsed in ObjectLibrary([root], (".lco",)).items():
+        profile = compile_profile(parsed, Path(name).stem)
+        if profile.table:
+            profiles[Path(name).stem] = profile
+    return profiles
+
+
+class FixturePatch:
+    """
+    Patched fixture instances over a (universes, 512) buffer.
+
+    add() places a fixture at a 1-based start address; the per-attribute address arrays are
+    rebuilt lazily on the next write after the patch changes.
+    """
+
+    def __init__(self, profiles):
+        self.profiles = profiles
+        self.fixtures = []  # (name, profile, universe, address)
+        self.index = {}
+        self.dirty = True
+        self._attrs = {}
+
+    def add(self, name, profile, universe, address):
+        """Patch fixture `name` using `profile` at `universe` (buffer row), dmx `address` (1..512)."""
+        if isinstance(profile, str):
+            profile = self.profiles[profile]
+        if address < 1 or address - 1 + profile.footprint > DMX_SLOTS:
+            raise ValueError(f"{name}: {profile.name} does not fit at {universe}/{address}")
+        self.index[name] = len(self.fixtures)
+        self.fixtures.append((name, profile, universe, address))
+        self.dirty = True
+        return self.index[name]
+
+    def addresses(self, name):
+        """Absolute flat address of every channel of fixture `name`, in profile attribute order."""
+        _, profile, universe, address = self.fixtures[self.index[name]]
+        return universe * DMX_SLOTS + address - 1 + profile.offsets
+
+    def _build(self):
+        attrs = {}
+        for i, (_, profile, universe, address) in enumerate(self.fixtures):
+            base = universe * DMX_SLOTS + address - 1
+            for attr, (offset, width, fine, default) in profile.table.items():
+                entry = attrs.setdefault(attr, ([], [], [], [], []))
+                entry[0].append(i)
+                entry[1].append(base + offset)
+                entry[2].append(base + fine if fine != NO_FINE else NO_FINE)
+                entry[3].append(width)
+                entry[4].append(default)
+
+        self._attrs = {}
+        for attr, (fixtures, coarse, fine, width, default) in attrs.items():
+            fine = np.array(fine, dtype=np.intp)
+            has_fine = fine != NO_FINE
+            self._attrs[attr] = {
+                "fixtures": np.array(fixtures, dtype=np.intp),
+                "coarse": np.array(coarse, dtype=np.intp),
+                "fine": fine[has_fine],
+                "has_fine": has_fine,
+                "wide": bool(has_fine.any()),
+                "default": np.array(default, dtype=np.int64),
+            }
+        self.dirty = False
+
+    def attribute(self, attr):
+        """Address arrays for `attr` (built on demand)."""
+        if self.dirty:
+            self._build()
+        return self._attrs[attr]
+
+    def has(self, attr):
+        if self.dirty:
+            self._build()
+        return attr in self._attrs
+
+    def read(self, buffer, attr, raw=False):
+        """
+        Current value of `attr` for every fixture that has it (in patch order, indexes in
+        attribute(attr)["fixtures"]); the inverse of write().
+        """
+        entry = self.attribute(attr)
+        flat = buffer.reshape(-1)
+        coarse = flat[entry["coarse"]]
+        if not entry["wide"]:
+            return coarse.astype(np.int64) if raw else coarse * (1.0 / 255.0)
+
+        v16 = coarse.astype(np.int64) * 257  # 8-bit fixtures read as the full 16-bit range
+        v16[entry["has_fine"]] = (coarse[entry["has_fine"]].astype(np.int64) << 8) | flat[entry["fine"]]
+        if raw:
+            return np.where(entry["has_fine"], v16, coarse)
+        return v16 * (1.0 / 65535.0)
+
+    def write(self, buffer, attr, values, raw=False):
+        """
+        Write `attr` for every fixture that has it. `values` is a scalar or one value per such
+        fixture (in patch order), normalised 0..1 unless `raw` (then 0..255 / 0..65535).
+        """
+        entry = self.attribute(attr)
+        flat = buffer.reshape(-1)
+        values = np.broadcast_to(np.asarray(values), entry["coarse"].shape)
+
+        if not entry["wide"]:
+            if raw:
+                flat[entry["coarse"]] = np.clip(values, 0, 255).astype(np.uint8)
+            else:
+                flat[entry["coarse"]] = np.clip(values * 255.0 + 0.5, 0, 255).astype(np.uint8)
+            return
+
+        # 16 bit: 8-bit fixtures get the coarse byte of the 16-bit value
+        if raw:
+            v16 = np.where(entry["has_fine"], values, values * 257)
+        else:
+            v16 = values * 65535.0 + 0.5
+        v16 = np.clip(v16, 0, 65535).astype(np.uint16)
+        flat[entry["coarse"]] = (v16 >> 8).astype(np.uint8)
+        flat[entry["fine"]] = (v16[entry["has_fine"]] & 0xff).astype(np.uint8)
+
+    def write_defaults(self, buffer):
+        """Write every attribute's default for every fixture."""
+        if self.dirty:
+            self._build()
+        flat = buffer.reshape(-1)
+        for entry in self._attrs.values():
+            default = entry["default"]
+            if entry["wide"]:
+                has_fine = entry["has_fine"]
+                flat[entry["coarse"]] = np.where(has_fine, default >> 8, default).astype(np.uint8)
+                flat[entry["fine"]] = (default[has_fine] & 0xff).astype(np.uint8)
+            else:
+                flat[entry["coarse"]] = default.astype(np.uint8)
+
+
+# run from the project root: python -m res.compiler.fixture [fixtures]
+if __name__ == "__main__":
+    import sys
+    import time
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    profiles = load_profiles(os.path.join(os.path.dirname(__file__), "..", "objects"))
+    for profile in profiles.values():
+        print(profile)
+
+    patch = FixturePatch(profiles)
+    names = list(profiles)
+    universe, address = 0, 1
+    for i in range(count):
+        profile = profiles[names[i % len(names)]]
+        if address - 1 + profile.footprint > DMX_SLOTS:
+            universe, address = universe + 1, 1
+        patch.add(f"fx{i}", profile, universe, address)
+        address += profile.footprint
+
+    buffer = np.zeros((universe + 1, DMX_SLOTS), dtype=np.uint8)
+    patch.write_defaults(buffer)
+    dimmers = np.random.default_rng(0).random(patch.attribute("dimmer")["coarse"].size)
+
+    t0 = time.perf_counter()
+    for _ in range(1000):
+        patch.write(buffer, "dimmer", dimmers)
+        patch.write(buffer, "pan", 0.25)
+    dt = (time.perf_counter() - t0) / 1000
+    print(f"{count} fixtures over {universe + 1} universes: dimmer+pan write {dt * 1e6:.1f} us")
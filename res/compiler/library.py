@@ -0,0 +1,213 @@
+# Shared, read-only library of compiled resource objects.
+#
+# Resource files repeat themselves: truss variants differ only in length, airburst colours
+# only in colour, and every rack file carries the same empty title/setup/RACK/data skeleton.
+# Parsed on their own, each becomes a full tree of fresh dicts and strings.
+#
+# Everything loaded through an Interner is hash-consed bottom up: strings go through
+# sys.intern, and a block whose keys and (already canonical) values match one seen before
+# is replaced by that block, so identical subtrees exist once however many objects contain
+# them. Shared blocks are FrozenDicts (dict subclasses that refuse to change) and lists
+# become tuples, so a caller that wants to edit one takes a copy first. Compiled JSON is
+# interned while it is read (object_pairs_hook; mapdata.load_map and the show package's
+# JSON sections go through it), sources after parse_custom_format; `inherits:` is resolved
+# first, so an object and its base share every block the object does not override.
+
+import json
+import sys
+from pathlib import Path
+
+from res.compiler.compiler import parse_custom_format, resolve_inherits
+
+OBJECT_ROOTS = ("res/objects", "res/rack")
+OBJECT_SUFFIXES = (".lco", ".fx", ".lcrck")
+
+
+class FrozenDict(dict):
+    """A dict that can be shared: every mutator raises TypeError."""
+
+    __slots__ = ()
+
+    def _frozen(self, *args, **kwargs):
+        raise TypeError("shared compiled block is read-only, copy() it first")
+
+    __setitem__ = __delitem__ = __ior__ = _frozen
+    update = pop = popitem = clear = setdefault = _frozen
+
+    def __reduce__(self):
+        return FrozenDict, (dict(self),)
+
+
+class Interner:
+    """Canonical strings, numbers and blocks; one table can serve many loads."""
+
+    def __init__(self):
+        self.table = {}
+        self.blocks = 0  # blocks offered
+        self.shared = 0  # of which already known
+
+    def value(self, value):
+        kind = type(value)
+        if kind is str:
+            return sys.intern(value)
+        if kind is dict or kind is FrozenDict:
+            return self.pairs(value.items())
+        if kind is list or kind is tuple:
+            return self.sequence([self.value(v) for v in value])
+        if kind is float or kind is int:
+            return self.table.setdefault((kind, value), value)
+        return value
+
+    @staticmethod
+    def _key(value):
+        # canonical blocks and tuples live as long as the table, so their id() identifies them
+        kind = type(value)
+        return kind, id(value) if kind is FrozenDict or kind is tuple else value
+
+    def sequence(self, values):
+        """Canonical tuple for a list whose values are already canonical."""
+        values = tuple(values)
+        return self.table.setdefault((tuple, tuple(map(self._key, values))), values)
+
+    def pairs(self, pairs):
+        """Canonical block for (key, value) pairs whose values are already canonical."""
+        pairs = [(sys.intern(k), v) for k, v in pairs]
+        key = tuple((k, *self._key(v)) for k, v in pairs)
+        self.blocks += 1
+        block = self.table.get(key)
+        if block is None:
+            block = self.table[key] = FrozenDict(pairs)
+        else:
+            self.shared += 1
+        return block
+
+    def intern(self, obj):
+        """Canonical copy of a parsed tree (children first, so subtrees share)."""
+        if type(obj) in (dict, FrozenDict):
+            return self.pairs((k, self.intern(v)) for k, v in obj.items())
+        if type(obj) in (list, tuple):
+            return self.sequence([self.intern(v) for v in obj])
+        return self.value(obj)
+
+    def loads(self, text):
+        """Compiled JSON text, interned while it is decoded."""
+        # blocks arrive children first, already canonical; lists are still plain lists
+        decoded = json.loads(text, object_pairs_hook=lambda pairs: self.pairs(
+            (k, v if type(v) is FrozenDict else self.value(v)) for k, v in pairs))
+        return decoded if type(decoded) is FrozenDict else self.value(decoded)
+
+    def load_json(self, path):
+        """A compiled .json file, interned while it is decoded."""
+        with open(path, "r", encoding="utf-8") as f:
+            return self.loads(f.read())
+
+
+class ObjectLibrary:
+    """
+    Every object under `roots` (source files with one of `suffixes`), `inherits:` resolved
+    and interned. Objects are keyed by file name ("airburst-blue.fx"); `paths` keeps where
+    each came from.
+    """
+
+    def __init__(self, roots=OBJECT_ROOTS, suffixes=OBJECT_SUFFIXES, interner=None):
+        self.interner = interner if interner is not None else Interner()
+        self.paths = {}
+        for root in roots:
+            for path in sorted(Path(root).rglob("*")):
+                if path.suffix in suffixes and path.is_file():
+                    self.paths.setdefault(path.name, path)
+        self._parsed = {}
+        self.objects = {}
+        for name in self.paths:
+            self.objects[name] = self.interner.intern(resolve_inherits(self._parse(name), self._base, name))
+        self._parsed.clear()
+
+    def _parse(self, name):
+        parsed = self._parsed.get(name)
+        if parsed is None:
+            with open(self.paths[name], "r", encoding="utf-8") as f:
+                parsed = self._parsed[name] = parse_custom_format(f.read())
+        return parsed
+
+    def _base(self, name):
+        return self._parse(name) if name in self.paths else None
+
+    def __getitem__(self, name):
+        return self.objects[name]
+
+    def __contains__(self, name):
+        return name in self.objects
+
+    def __len__(self):
+        return len(self.objects)
+
+    def items(self, suffix=None):
+        """(name, object) pairs, optionally only files with `suffix`."""
+        return [(n, o) for n, o in self.objects.items() if suffix is None or n.endswith(suffix)]
+
+
+def deep_size(obj, seen=None):
+    """Bytes held by a parsed tree, counting every shared object once."""
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        for k, v in obj.items():
+            size += deep_size(k, seen) + deep_size(v, seen)
+    elif isinstance(obj, (list, tuple)):
+        for v in obj:
+            size += deep_size(v, seen)
+    return size
+
+
+# run from the project root: python -m res.compiler.library [variants]
+if __name__ == "__main__":
+    import tempfile
+    import time
+
+    variants = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+    t0 = time.perf_counter()
+    plain = {}
+    for root in OBJECT_ROOTS:
+        for path in Path(root).rglob("*"):
+            if path.suffix in OBJECT_SUFFIXES:
+                plain[path.name] = parse_custom_format(path.read_text(encoding="utf-8"))
+    t1 = time.perf_counter()
+    library = ObjectLibrary()
+    t2 = time.perf_counter()
+    print(f"shipped objects: {len(library)} files, {deep_size(plain) / 1024:.0f} KiB parsed "
+          f"({(t1 - t0) * 1000:.0f} ms) -> {deep_size(library.objects) / 1024:.0f} KiB interned "
+          f"({(t2 - t1) * 1000:.0f} ms), {library.interner.shared}/{library.interner.blocks} blocks shared")
+
+    # a fixture range: one base profile and many variants that change a few values,
+    # written out flat (every file complete) and with `inherits:`
+    base = Path("res/objects/light/controllable/turret/simpleMovingHeadWash.lco").read_text(encoding="utf-8")
+    with tempfile.TemporaryDirectory() as tmp:
+        flat, derived = Path(tmp, "flat"), Path(tmp, "derived")
+        flat.mkdir()
+        derived.mkdir()
+        (derived / "wash-base.lco").write_text(base, encoding="utf-8")
+        for i in range(variants):
+            header = f'.header {{\n    name: "wash {i}"\n    weight: {10 + i % 7}.5\n}}\n'
+            zoom = f'.channels {{\n    zoom {{\n        default: {i % 256}\n    }}\n}}\n'
+            flat_text = base.replace(".header {\n\n}", header.strip()).replace(
+                "zoom {\n        offset: 12\n        width: 1\n        default: 0",
+                f"zoom {{\n        offset: 12\n        width: 1\n        default: {i % 256}")
+            (flat / f"wash-{i}.lco").write_text(flat_text, encoding="utf-8")
+            (derived / f"wash-{i}.lco").write_text('inherits: "wash-base"\n' + header + zoom, encoding="utf-8")
+
+        t0 = time.perf_counter()
+        parsed = {p.name: parse_custom_format(p.read_text(encoding="utf-8")) for p in flat.iterdir()}
+        t1 = time.perf_counter()
+        shared = ObjectLibrary([flat], (".lco",))
+        t2 = time.perf_counter()
+        inherited = ObjectLibrary([derived], (".lco",))
+        t3 = time.perf_counter()
+        same = all(dict(inherited[n][".channels"]["zoom"]) == parsed[n][".channels"]["zoom"] for n in parsed)
+        print(f"{variants} fixture variants: {deep_size(parsed) / 1024:.0f} KiB as separate trees "
+              f"({(t1 - t0) * 1000:.0f} ms), {deep_size(shared.objects) / 1024:.0f} KiB interned "
+              f"({(t2 - t1) * 1000:.0f} ms), {deep_size(inherited.objects) / 1024:.0f} KiB from `inherits:` "
+              f"({(t3 - t2) * 1000:.0f} ms), resolved values match: {same}")
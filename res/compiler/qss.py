@@ -0,0 +1,236 @@
+# Stylesheet pipeline: strips rules for widget classes we never create, drops overridden
+# declarations and duplicate selectors, minifies, and caches the result in ./temp/qss/
+# keyed by a hash of the source sheet and the set of classes it was built for (crc32:
+# hashlib costs more to import than a cache hit takes).
+#
+# The app-level sheet is built for the classes of the main window; panels built from other
+# .ui files get their own sheet, applied the first time the panel is shown
+# (apply_on_first_show).
+
+import os
+import re
+import zlib
+
+PIPELINE_VERSION = 1
+CACHE_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "temp", "qss")
+
+# Widgets Qt or our own code creates without them appearing in a .ui file: children of
+# scroll areas, item views, combo/spin boxes, tab widgets, the QScrollArea page of every
+# QToolBox item and the QStackedWidget of a QTabWidget, plus dialogs, splash and tooltips.
+ALWAYS = {
+    "QWidget", "QMainWindow", "QStatusBar", "QMenuBar", "QMenu", "QToolTip", "QLabel",
+    "QScrollBar", "QHeaderView", "QToolButton", "QLineEdit", "QTabBar", "QSizeGrip", "QFrame",
+    "QDialog", "QMessageBox", "QFileDialog", "QDialogButtonBox", "QPushButton", "QSplashScreen",
+    "QTreeView", "QListView", "QComboBox", "QSplitter", "QProgressBar", "QOpenGLWidget",
+    "QScrollArea", "QStackedWidget",
+}
+
+_COMMENT = re.compile(r"/\*.*?\*/", re.S)
+_UI_CLASS = re.compile(r'<widget class="(\w+)"')
+_TYPE = re.compile(r"^\.?([A-Za-z_][\w-]*)")
+
+
+##########################
+# PARSING
+##########################
+
+def parse_rules(text):
+    """Split a stylesheet into [(selector group, [(property, value)])]."""
+    text = _COMMENT.sub("", text)
+    rules = []
+    for chunk in text.split("}"):
+        if "{" not in chunk:
+            continue
+        selector, body = chunk.split("{", 1)
+        selector = re.sub(r"\s+", " ", selector).strip()
+        if not selector:
+            continue
+        decls = []
+        for decl in body.split(";"):
+            if ":" not in decl:
+                continue
+            prop, value = decl.split(":", 1)
+            prop = prop.strip()
+            value = re.sub(r"\s+", " ", value).strip()
+            if prop and value:
+                decls.append((prop, value))
+        rules.append((selector, decls))
+    return rules
+
+
+def split_selectors(group):
+    return [re.sub(r"\s*>\s*", ">", s.strip()) for s in group.split(",") if s.strip()]
+
+
+def selector_types(selector):
+    """Type names used by a selector (`QMenuBar QToolButton:hover` -> [QMenuBar, QToolButton])."""
+    types = []
+    for part in re.split(r"[\s>]+", selector):
+        m = _TYPE.match(part)
+        if m:
+            types.append(m.group(1))
+    return types
+
+
+##########################
+# CLASSES
+##########################
+
+def ui_classes(ui_paths):
+    """Widget classes instantiated by the given Qt Designer files."""
+    classes = set()
+    for path in ui_paths:
+        with open(path, "r", encoding="utf-8") as f:
+            classes.update(_UI_CLASS.findall(f.read()))
+    return classes
+
+
+def class_closure(classes):
+    """
+    Every class a type selector may name and still match one of `classes` (the classes
+    themselves and all their Qt base classes). Unknown names are returned unchanged.
+    """
+    from PyQt5 import QtWidgets
+
+    closure = set()
+    for name in classes:
+        cls = getattr(QtWidgets, name, None)
+        if cls is None:
+            closure.add(name)
+            continue
+        for base in cls.__mro__:
+            if base.__name__.startswith("Q"):
+                closure.add(base.__name__)
+    return closure
+
+
+def _known(name):
+    from PyQt5 import QtWidgets
+
+    return isinstance(getattr(QtWidgets, name, None), type)
+
+
+##########################
+# PIPELINE
+##########################
+
+def strip_unused(rules, closure):
+    """Drop selectors naming a Qt widget class that no created widget is or derives from."""
+    kept = []
+    for group, decls in rules:
+        selectors = []
+        for selector in split_selectors(group):
+            types = selector_types(selector)
+            # names Qt does not export (ads--*, QPrevNextCalButton, ...) are kept as-is
+            if all(t in closure or not _known(t) for t in types):
+                if selector not in selectors:
+                    selectors.append(selector)
+        if selectors:
+            kept.append((",".join(selectors), decls))
+    return kept
+
+
+def dedupe(rules):
+    """
+    Remove declarations that a later rule with the same selector group overrides, drop
+    empty rules, and merge adjacent rules with identical bodies.
+    """
+    later = {}
+    result = []
+    for group, decls in reversed(rules):
+        seen = later.setdefault(group, set())
+        props = {}
+        for prop, value in decls:
+            if prop not in seen:
+                props[prop] = value  # last one in a rule wins
+        seen.update(props)
+        if props:
+            result.append((group, list(props.items())))
+    result.reverse()
+
+    merged = []
+    for group, decls in result:
+        if merged and merged[-1][1] == decls:
+            selectors = split_selectors(merged[-1][0])
+            selectors += [s for s in split_selectors(group) if s not in selectors]
+            merged[-1] = (",".join(selectors), decls)
+        else:
+            merged.append((group, decls))
+    return merged
+
+
+def minify(rules):
+    out = []
+    for group, decls in rules:
+        out.append(group + "{" + ";".join(f"{p}:{v}" for p, v in decls) + "}")
+    return "\n".join(out)
+
+
+def compile_stylesheet(qss_path, classes, cache_root=CACHE_ROOT):
+    """
+    Return the minified stylesheet of `qss_path` for widgets of `classes`, from the cache
+    when the source and class set are unchanged.
+    """
+    with open(qss_path, "rb") as f:
+        source = f.read()
+    classes = set(classes) | ALWAYS
+    key = zlib.crc32(",".join(sorted(classes)).encode(), zlib.crc32(source))
+    cached = os.path.join(cache_root, f"{PIPELINE_VERSION}-{len(source)}-{key:08x}.qss")
+    if os.path.exists(cached):
+        with open(cached, "r", encoding="utf-8") as f:
+            return f.read()
+
+    rules = parse_rules(source.decode("utf-8"))
+    text = minify(dedupe(strip_unused(rules, class_closure(classes))))
+
+    os.makedirs(cache_root, exist_ok=True)
+    tmp = cached + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, cached)
+    return text
+
+
+def stylesheet_for_ui(qss_path, ui_paths, cache_root=CACHE_ROOT):
+    return compile_stylesheet(qss_path, ui_classes(ui_paths), cache_root)
+
+
+##########################
+# LAZY PANELS
+##########################
+
+def apply_on_first_show(widget, qss_path, ui_paths):
+    """
+    Build and set the panel's own sheet the first time `widget` is shown, so panels that
+    are never opened cost nothing at startup.
+    """
+    from PyQt5.QtCore import QObject, QEvent
+
+    class _FirstShow(QObject):
+        def eventFilter(self, obj, event):
+            if event.type() == QEvent.Show:
+                obj.removeEventFilter(self)
+                obj.setStyleSheet(stylesheet_for_ui(qss_path, ui_paths))
+            return False
+
+    widget._qss_filter = _FirstShow(widget)
+    widget.installEventFilter(widget._qss_filter)
+    return widget._qss_filter
+
+
+# python -m res.compiler.qss <stylesheet.qss> <file.ui> [...]
+if __name__ == "__main__":
+    import sys
+    import time
+
+    qss = sys.argv[1] if len(sys.argv) > 1 else "stylesheet.qss"
+    uis = sys.argv[2:] or ["MapMaker/MapDesigner.ui"]
+    src = open(qss, encoding="utf-8").read()
+    rules = parse_rules(src)
+    t0 = time.perf_counter()
+    text = compile_stylesheet(qss, ui_classes(uis), cache_root=os.path.join(CACHE_ROOT, "bench"))
+    t1 = time.perf_counter()
+    compile_stylesheet(qss, ui_classes(uis), cache_root=os.path.join(CACHE_ROOT, "bench"))
+    t2 = time.perf_counter()
+    print(f"{qss}: {len(src)} bytes / {len(rules)} rules -> {len(text)} bytes / {text.count('{')} rules")
+    print(f"compile {(t1 - t0) * 1000:.1f} ms, cached {(t2 - t1) * 1000:.1f} ms")
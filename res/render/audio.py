@@ -3,7 +3,10 @@ from PyQt5.QtCore import Qt
 import sys
 import numpy as np
 # import wave # Not needed when using Librosa for loading
-import librosa  # Import the Librosa library
+from modules import lazy_import
+import tracing
+from res.render.batchspec import waveform_peaks
+librosa = lazy_import("librosa")  # Librosa is slow to import, load it on first use
 from PyQt5.QtWidgets import QApplication, QOpenGLWidget
 from PyQt5.QtCore import QTimer, QPointF
 from OpenGL.GL import *
@@ -25,6 +28,7 @@ class AudioHistogramWidget(QOpenGLWidget):
     def resizeGL(self, w, h):
         glViewport(0, 0, w, h)  # Set the viewport
 
+    @tracing.traced("paint.histogram")
     def paintGL(self):
         glClear(GL_COLOR_BUFFER_BIT)
 
@@ -51,7 +55,8 @@ class AudioHistogramWidget(QOpenGLWidget):
         try:
             # Load the audio file using Librosa
             # librosa.load returns the audio time series (y) and the sampling rate (sr)
-            y, sr = librosa.load(filename, sr=None)  # sr=None preserves the original sampling rate
+            with tracing.span("audio.decode"):
+                y, sr = librosa.load(filename, sr=None)  # sr=None preserves the original sampling rate
 
             # Perform FFT
             # Use Short-Time Fourier Transform (STFT) for spectral analysis
@@ -111,6 +116,7 @@ class WaveformTimelineWidget(QOpenGLWidget):
         glMatrixMode(GL_MODELVIEW)
         glLoadIdentity()
 
+    @tracing.traced("paint.timeline")
     def paintGL(self):
 
         if len(self.audio_data) > 0:
@@ -131,22 +137,12 @@ class WaveformTimelineWidget(QOpenGLWidget):
         if end_sample <= start_sample:
             return
 
-        samples_per_pixel = (end_sample - start_sample) / self.width()
+        pixels, mins, maxs = waveform_peaks(self.audio_data, start_sample, end_sample, self.width())
+        times = start_time_s + pixels / self.x_scale_px_per_s
         glBegin(GL_TRIANGLE_STRIP)
-        current_time_s = start_time_s
-        current_pixel_x = 0
-        while current_pixel_x < self.width():
-            sample_idx_start = start_sample + int(current_pixel_x * samples_per_pixel)
-            sample_idx_end = min(start_sample + int((current_pixel_x + 1) * samples_per_pixel), end_sample)
-            if sample_idx_end > sample_idx_start:
-                window_samples = self.audio_data[sample_idx_start:sample_idx_end]
-                if window_samples.size > 0:
-                    max_val = np.max(window_samples)
-                    min_val = np.min(window_samples)
-                    glVertex2f(current_time_s, max_val)
-                    glVertex2f(current_time_s, min_val)
-            current_time_s += 1.0 / self.x_scale_px_per_s
-            current_pixel_x += 1
+        for t, max_val, min_val in zip(times.tolist(), maxs.tolist(), mins.tolist()):
+            glVertex2f(t, max_val)
+            glVertex2f(t, min_val)
         glEnd()
 
         # Draw Playhead
@@ -162,7 +158,8 @@ class WaveformTimelineWidget(QOpenGLWidget):
     def load_audio_and_process(self, filename):
         if isinstance(filename, list): filename = filename[0]
         try:
-            self.audio_data, self.sr = librosa.load(filename, sr=None)
+            with tracing.span("audio.decode"):
+                self.audio_data, self.sr = librosa.load(filename, sr=None)
             if np.max(np.abs(self.audio_data)) > 0:
                 self.audio_data = self.audio_data / np.max(np.abs(self.audio_data))
             self.playhead_position_s = 0.0
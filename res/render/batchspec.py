@@ -0,0 +1,350 @@
+# Headless batch analysis of show tracks: for every audio file in a folder, one pass that
+# decodes in chunks, computes a blocked STFT spectrogram and a min/max waveform envelope,
+# and writes <track>.spec.npy, <track>.wave.npy and a <track>.png thumbnail, where <track>
+# is the full file name (song.wav.spec.npy), so song.wav and song.mp3 do not collide.
+#
+# Decoding streams: .wav through the wave module, anything else through ffmpeg (res/bin on
+# Windows, PATH elsewhere) piping mono float32, CHUNK samples at a time, so memory stays
+# flat whatever the track length. Each chunk is cut into hop-spaced frames with a stride
+# view (the last N_FFT - HOP samples carry over to the next chunk), windowed and
+# transformed with one rfft per chunk. Tracks are spread over a process pool; outputs
+# newer than their track are skipped unless --force. A track that fails to decode or
+# analyse is reported and the rest of the batch carries on.
+#
+# PNGs are encoded with zlib directly, so workers need neither Qt nor matplotlib.
+
+import argparse
+import os
+import shutil
+import struct
+import subprocess
+import sys
+import time
+import wave
+import zlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+AUDIO_EXTENSIONS = (".wav", ".mp3", ".flac", ".ogg", ".m4a", ".aac", ".aiff", ".aif")
+N_FFT = 2048
+HOP = 512
+CHUNK = 1 << 18  # samples decoded per read
+WAVE_RATE = 200  # waveform envelope columns per second
+DB_RANGE = 90.0
+THUMB_SIZE = (1024, 256)  # width, height; top quarter waveform, rest spectrogram
+ANALYSIS_DIR = "analysis"
+
+
+##########################
+# DECODING
+##########################
+
+def ffmpeg_binary():
+    bundled = os.path.join("res", "bin", "ffmpeg.exe")
+    if os.name == "nt" and os.path.exists(bundled):
+        return bundled
+    return shutil.which("ffmpeg")
+
+
+def _wav_chunks(path, chunk):
+    with wave.open(path, "rb") as w:
+        channels, width, rate = w.getnchannels(), w.getsampwidth(), w.getframerate()
+        yield rate
+        dtype = {1: np.uint8, 2: np.int16, 4: np.int32}.get(width)
+        while True:
+            data = w.readframes(chunk)
+            if not data:
+                return
+            if dtype is None:  # 24-bit: widen to int32
+                raw = np.frombuffer(data, np.uint8).reshape(-1, 3)
+                samples = (raw[:, 0].astype(np.int32) << 8 | raw[:, 1].astype(np.int32) << 16
+                           | raw[:, 2].astype(np.int8).astype(np.int32) << 24)
+                scale = 2.0 ** 31
+            else:
+                samples = np.frombuffer(data, dtype)
+                scale = 128.0 if width == 1 else float(2 ** (8 * width - 1))
+                if width == 1:
+                    samples = samples.astype(np.int16) - 128
+            frames = samples.reshape(-1, channels).astype(np.float32)
+            yield frames.mean(axis=1) / scale if channels > 1 else frames[:, 0] / scale
+
+
+def _ffmpeg_chunks(path, chunk):
+    binary = ffmpeg_binary()
+    if binary is None:
+        raise RuntimeError(f"ffmpeg is needed to decode {os.path.basename(path)}")
+    probe = subprocess.run([binary, "-hide_banner", "-i", path], capture_output=True, text=True).stderr
+    rate = 44100
+    for part in probe.split(","):
+        if part.strip().endswith(" Hz"):
+            rate = int(part.split()[0])
+            break
+    yield rate
+    process = subprocess.Popen([binary, "-v", "error", "-i", path, "-f", "f32le", "-ac", "1", "-"],
+                               stdout=subprocess.PIPE)
+    try:
+        while True:
+            data = process.stdout.read(chunk * 4)
+            if not data:
+                break
+            yield np.frombuffer(data[:len(data) // 4 * 4], np.float32)
+    finally:
+        process.stdout.close()
+        process.wait()
+
+
+def decode_chunks(path, chunk=CHUNK):
+    """Yields the sample rate, then mono float32 chunks of up to `chunk` samples."""
+    if path.lower().endswith(".wav"):
+        return _wav_chunks(path, chunk)
+    return _ffmpeg_chunks(path, chunk)
+
+
+##########################
+# ANALYSIS
+##########################
+
+def analyse(chunks, n_fft=N_FFT, hop=HOP, wave_rate=WAVE_RATE):
+    """
+    Spectrogram ((frames, n_fft // 2 + 1) float16 dBFS, 0 = a full-scale sine, floored at
+    -DB_RANGE) and waveform envelope ((columns, 2) float32 min/max) from a decode_chunks()
+    stream; also returns the rate.
+    """
+    rate = next(chunks)
+    window = np.hanning(n_fft).astype(np.float32)
+    full_scale = window.sum() / 2
+    floor = full_scale * 10.0 ** (-DB_RANGE / 20.0)
+    per_column = max(1, rate // wave_rate)
+    tail = np.zeros(n_fft // 2, np.float32)  # centred frames: the first is centred on sample 0
+    carry = np.zeros(0, np.float32)  # samples not yet in a full envelope column
+    spectra, envelope = [], []
+    for chunk in chunks:
+        buffer = np.concatenate((tail, chunk))
+        count = (len(buffer) - n_fft) // hop + 1
+        if count > 0:
+            frames = np.lib.stride_tricks.sliding_window_view(buffer, n_fft)[::hop][:count]
+            magnitude = np.abs(np.fft.rfft(frames * window, axis=1))
+            np.maximum(magnitude, floor, out=magnitude)
+            spectra.append((20.0 * np.log10(magnitude / full_scale)).astype(np.float16))
+            tail = buffer[count * hop:]
+        else:
+            tail = buffer
+
+        samples = np.concatenate((carry, chunk)) if len(carry) else chunk
+        columns = len(samples) // per_column
+        if columns:
+            block = samples[:columns * per_column].reshape(columns, per_column)
+            envelope.append(np.column_stack((block.min(axis=1), block.max(axis=1))))
+        carry = samples[columns * per_column:]
+    if len(carry):
+        envelope.append(np.array([[carry.min(), carry.max()]], np.float32))
+
+    spectrogram = np.concatenate(spectra) if spectra else np.zeros((0, n_fft // 2 + 1), np.float16)
+    wave_env = np.concatenate(envelope).astype(np.float32) if envelope else np.zeros((0, 2), np.float32)
+    return spectrogram, wave_env, rate
+
+
+def waveform_peaks(samples, start, end, width):
+    """
+    Per-pixel min/max of samples[start:end] drawn `width` pixels wide, the way the timeline
+    widget draws them: pixel x covers [start + int(x * spp), start + int((x + 1) * spp)).
+    Returns (pixels, mins, maxs) for the pixels whose window is not empty.
+    """
+    empty = np.zeros(0, samples.dtype)
+    end = min(end, len(samples))
+    if end <= start or width <= 0:
+        return np.zeros(0, np.intp), empty, empty
+    spp = (end - start) / width
+    edges = start + (np.arange(width + 1) * spp).astype(np.intp)
+    np.minimum(edges, end, out=edges)
+    pixels = np.flatnonzero(edges[1:] > edges[:-1])
+    if pixels.size == 0:  # fewer samples than pixels can leave every window empty
+        return pixels, empty, empty
+    # the non-empty windows tile [first, last) back to back, so one reduceat covers them
+    starts = edges[pixels]
+    span = samples[starts[0]:edges[pixels[-1] + 1]]
+    offsets = starts - starts[0]
+    return pixels, np.minimum.reduceat(span, offsets), np.maximum.reduceat(span, offsets)
+
+
+##########################
+# THUMBNAILS
+##########################
+
+def _colormap(levels=256):
+    """Dark blue -> purple -> orange -> pale yellow, (levels, 3) uint8."""
+    stops = np.array([(0.0, 8, 10, 30), (0.35, 80, 20, 110), (0.7, 230, 90, 40), (1.0, 255, 245, 180)], np.float32)
+    x = np.linspace(0, 1, levels)
+    return np.stack([np.interp(x, stops[:, 0], stops[:, c]) for c in (1, 2, 3)], axis=1).astype(np.uint8)
+
+
+COLORMAP = _colormap()
+
+
+def thumbnail(spectrogram, envelope, rate, size=THUMB_SIZE, n_fft=N_FFT):
+    """(height, width, 3) uint8: waveform on top, log-frequency spectrogram below."""
+    width, height = size
+    wave_h = height // 4
+    image = np.zeros((height, width, 3), np.uint8)
+    image[:wave_h] = (18, 22, 30)
+
+    if len(envelope):
+        edges = np.linspace(0, len(envelope), width + 1).astype(np.int64)
+        edges[1:] = np.maximum(edges[1:], edges[:-1] + 1)
+        edges = np.minimum(edges, len(envelope))
+        lo = np.minimum.reduceat(envelope[:, 0], np.minimum(edges[:-1], len(envelope) - 1))
+        hi = np.maximum.reduceat(envelope[:, 1], np.minimum(edges[:-1], len(envelope) - 1))
+        rows = np.arange(wave_h)[:, None]
+        top = ((1 - np.clip(hi, -1, 1)) * (wave_h - 1) / 2)[None, :]
+        bottom = ((1 - np.clip(lo, -1, 1)) * (wave_h - 1) / 2)[None, :]
+        image[:wave_h][(rows >= np.floor(top)) & (rows <= np.ceil(bottom))] = (120, 200, 170)
+
+    spec_h = height - wave_h
+    if len(spectrogram):
+        # columns: max over the frames in each; rows: log-spaced bins from 30 Hz to Nyquist
+        edges = np.linspace(0, len(spectrogram), width + 1).astype(np.int64)
+        starts = np.minimum(edges[:-1], len(spectrogram) - 1)
+        columns = np.maximum.reduceat(spectrogram.astype(np.float32), starts, axis=0)
+        freqs = np.geomspace(30.0, rate / 2, spec_h)[::-1]
+        bins = np.clip(np.rint(freqs * n_fft / rate).astype(np.int64), 0, spectrogram.shape[1] - 1)
+        level = np.clip(columns[:, bins].T / DB_RANGE + 1.0, 0.0, 1.0)
+        image[wave_h:] = COLORMAP[(level * 255).astype(np.uint8)]
+    return image
+
+
+def write_png(path, rgb):
+    """Minimal PNG (8-bit RGB, no filtering) written straight from an (h, w, 3) array."""
+    height, width = rgb.shape[:2]
+    raw = np.zeros((height, width * 3 + 1), np.uint8)
+    raw[:, 1:] = rgb.reshape(height, -1)
+
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF)
+
+    with open(path, "wb") as f:
+        f.write(b"\x89PNG\r\n\x1a\n")
+        f.write(chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)))
+        f.write(chunk(b"IDAT", zlib.compress(raw.tobytes(), 6)))
+        f.write(chunk(b"IEND", b""))
+    return path
+
+
+##########################
+# BATCH
+##########################
+
+def outputs_for(track, out_dir):
+    stem = os.path.join(out_dir, os.path.basename(track))
+    return stem + ".spec.npy", stem + ".wave.npy", stem + ".png"
+
+
+def process_track(track, out_dir, force=False):
+    """
+    Analyse one track; returns (track, seconds of audio, seconds taken, skipped, error),
+    error being None or the message of what went wrong with this track.
+    """
+    outputs = outputs_for(track, out_dir)
+    t0 = time.perf_counter()
+    try:
+        if not force and all(os.path.exists(p) and os.path.getmtime(p) >= os.path.getmtime(track) for p in outputs):
+            return track, None, 0.0, True, None
+        spectrogram, envelope, rate = analyse(decode_chunks(track))
+        spec_path, wave_path, png_path = outputs
+        np.save(spec_path, spectrogram)
+        np.save(wave_path, envelope)
+        write_png(png_path, thumbnail(spectrogram, envelope, rate))
+    except Exception as e:  # one bad file must not stop the batch
+        return track, None, time.perf_counter() - t0, False, f"{type(e).__name__}: {e}"
+    duration = len(envelope) / WAVE_RATE
+    return track, duration, time.perf_counter() - t0, False, None
+
+
+def find_tracks(folder):
+    return sorted(os.path.join(folder, name) for name in os.listdir(folder)
+                  if name.lower().endswith(AUDIO_EXTENSIONS) and os.path.isfile(os.path.join(folder, name)))
+
+
+def run_batch(folder, out_dir=None, jobs=None, force=False, report=print):
+    """Analyse every track in `folder` into `out_dir` (default <folder>/analysis) over `jobs` processes."""
+    tracks = find_tracks(folder)
+    out_dir = out_dir or os.path.join(folder, ANALYSIS_DIR)
+    os.makedirs(out_dir, exist_ok=True)
+    jobs = jobs or os.cpu_count() or 1
+    results = []
+    if jobs == 1 or len(tracks) < 2:
+        for track in tracks:
+            results.append(process_track(track, out_dir, force))
+            report_result(results[-1], report)
+        return results
+    with ProcessPoolExecutor(max_workers=min(jobs, len(tracks))) as pool:
+        futures = {pool.submit(process_track, track, out_dir, force): track for track in tracks}
+        for future in as_completed(futures):
+            try:
+                results.append(future.result())
+            except Exception as e:  # the worker itself died (BrokenProcessPool, ...)
+                results.append((futures[future], None, 0.0, False, f"{type(e).__name__}: {e}"))
+            report_result(results[-1], report)
+    return results
+
+
+def report_result(result, report):
+    if report is None:
+        return
+    track, duration, taken, skipped, error = result
+    name = os.path.basename(track)
+    if error:
+        report(f"{name}: failed ({error})")
+    elif skipped:
+        report(f"{name}: up to date")
+    else:
+        report(f"{name}: {duration:.0f} s of audio in {taken:.2f} s")
+
+
+def synthetic_track(path, seconds=240.0, rate=44100, seed=0):
+    """A stereo 16-bit WAV with a tone sweep, a beat and noise, for benchmarks."""
+    rng = np.random.default_rng(seed)
+    with wave.open(path, "wb") as w:
+        w.setnchannels(2)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        for start in range(0, int(seconds * rate), CHUNK):
+            t = (start + np.arange(min(CHUNK, int(seconds * rate) - start))) / rate
+            sweep = 0.3 * np.sin(2 * np.pi * (80 + 40 * t) * t)
+            beat = 0.4 * np.sin(2 * np.pi * 55 * t) * (np.mod(t, 0.5) < 0.1)
+            mono = sweep + beat + 0.05 * rng.standard_normal(len(t))
+            w.writeframes((np.column_stack((mono, mono * 0.8)) * 32767 * 0.8).astype(np.int16).tobytes())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batch spectrogram/waveform analysis of a folder of show tracks.")
+    parser.add_argument("folder")
+    parser.add_argument("-o", "--out", help=f"output folder (default <folder>/{ANALYSIS_DIR})")
+    parser.add_argument("-j", "--jobs", type=int, help="worker processes (default: one per core)")
+    parser.add_argument("--force", action="store_true", help="re-analyse tracks whose outputs are up to date")
+    parser.add_argument("--bench", type=int, metavar="N", help="fill the folder with N synthetic 4-minute tracks first")
+    args = parser.parse_args(argv)
+
+    if args.bench:
+        os.makedirs(args.folder, exist_ok=True)
+        for i in range(args.bench):
+            synthetic_track(os.path.join(args.folder, f"track{i + 1:02d}.wav"), seed=i)
+    t0 = time.perf_counter()
+    results = run_batch(args.folder, args.out, args.jobs, args.force)
+    done = [r for r in results if not r[3] and not r[4]]
+    failed = [r for r in results if r[4]]
+    total = time.perf_counter() - t0
+    if done:
+        print(f"{len(done)} tracks ({sum(r[1] for r in done) / 60:.1f} min of audio) in {total:.1f} s, "
+              f"{total / len(done):.2f} s per track")
+    elif not failed:
+        print(f"nothing to do ({len(results)} tracks up to date)")
+    if failed:
+        print(f"{len(failed)} tracks failed: " + ", ".join(os.path.basename(r[0]) for r in failed))
+        return 1
+    return 0
+
+
+# run from the project root: python -m res.render.batchspec <folder> [-o out] [-j jobs] [--force] [--bench N]
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,140 @@
+# Headless OpenGL for benchmarks and CI: a GL 3.3 core context rendering into a
+# framebuffer object, with no window.
+#
+# On Linux without a display server the context comes from EGL on Mesa's surfaceless
+# platform (llvmpipe when there is no GPU), which needs PyOpenGL's EGL backend. PyOpenGL
+# picks its backend when OpenGL.GL is first imported, so modules that may be driven
+# headless import this one before `from OpenGL.GL import *`. Everywhere else a Qt
+# QOffscreenSurface context is used.
+
+import os
+import sys
+
+HEADLESS_EGL = sys.platform.startswith("linux") and not (os.environ.get("DISPLAY") or os.environ.get("WAYLAND_DISPLAY"))
+if HEADLESS_EGL:
+    os.environ.setdefault("PYOPENGL_PLATFORM", "egl")
+
+EGL_PLATFORM_SURFACELESS_MESA = 0x31DD
+
+
+class HeadlessGL:
+    """
+    An offscreen GL context with a colour + depth FBO of `width` x `height`; `profile` is
+    "core" or "compat".
+
+        gl = HeadlessGL(1280, 720)
+        ... draw ...
+        pixels = gl.read_pixels()
+    """
+
+    def __init__(self, width=1280, height=720, version=(3, 3), profile="core"):
+        self.width = width
+        self.height = height
+        self.version = version
+        self.profile = profile  # "compat" for fixed-function code (glBegin, glMatrixMode)
+        self._qt = None
+        self._egl = None
+        if os.environ.get("PYOPENGL_PLATFORM") == "egl":
+            self._create_egl()
+        else:
+            self._create_qt()
+        self._create_fbo()
+
+    def _create_qt(self):
+        from PyQt5.QtGui import QGuiApplication, QOpenGLContext, QOffscreenSurface, QSurfaceFormat
+
+        self._app = QGuiApplication.instance() or QGuiApplication(sys.argv[:1])
+        fmt = QSurfaceFormat()
+        fmt.setVersion(*self.version)
+        fmt.setProfile(QSurfaceFormat.CoreProfile if self.profile == "core" else QSurfaceFormat.CompatibilityProfile)
+        context = QOpenGLContext()
+        context.setFormat(fmt)
+        if not context.create():
+            raise RuntimeError("could not create an OpenGL context")
+        surface = QOffscreenSurface()
+        surface.setFormat(context.format())
+        surface.create()
+        self._qt = (context, surface)
+        self.make_current()
+
+    def _create_egl(self):
+        import ctypes
+        from OpenGL import EGL
+
+        display = EGL.eglGetPlatformDisplay(EGL_PLATFORM_SURFACELESS_MESA, EGL.EGL_DEFAULT_DISPLAY, None)
+        major, minor = EGL.EGLint(), EGL.EGLint()
+        if not EGL.eglInitialize(display, ctypes.pointer(major), ctypes.pointer(minor)):
+            raise RuntimeError("could not initialise EGL")
+        attribs = (EGL.EGLint * 5)(EGL.EGL_SURFACE_TYPE, EGL.EGL_PBUFFER_BIT,
+                                   EGL.EGL_RENDERABLE_TYPE, EGL.EGL_OPENGL_BIT, EGL.EGL_NONE)
+        config, count = EGL.EGLConfig(), EGL.EGLint()
+        EGL.eglChooseConfig(display, attribs, ctypes.pointer(config), 1, ctypes.pointer(count))
+        if not count.value:
+            raise RuntimeError("no EGL config for desktop OpenGL")
+        EGL.eglBindAPI(EGL.EGL_OPENGL_API)
+        context_attribs = (EGL.EGLint * 7)(
+            EGL.EGL_CONTEXT_MAJOR_VERSION, self.version[0], EGL.EGL_CONTEXT_MINOR_VERSION, self.version[1],
+            EGL.EGL_CONTEXT_OPENGL_PROFILE_MASK,
+            EGL.EGL_CONTEXT_OPENGL_CORE_PROFILE_BIT if self.profile == "core" else
+            EGL.EGL_CONTEXT_OPENGL_COMPATIBILITY_PROFILE_BIT, EGL.EGL_NONE)
+        context = EGL.eglCreateContext(display, config, EGL.EGL_NO_CONTEXT, context_attribs)
+        if not context:
+            raise RuntimeError("could not create an EGL context")
+        self._egl = (display, context)
+        self.make_current()
+
+    def _create_fbo(self):
+        from OpenGL import GL
+
+        self.fbo = GL.glGenFramebuffers(1)
+        self.color, self.depth = GL.glGenRenderbuffers(2)
+        GL.glBindRenderbuffer(GL.GL_RENDERBUFFER, self.color)
+        GL.glRenderbufferStorage(GL.GL_RENDERBUFFER, GL.GL_RGBA8, self.width, self.height)
+        GL.glBindRenderbuffer(GL.GL_RENDERBUFFER, self.depth)
+        GL.glRenderbufferStorage(GL.GL_RENDERBUFFER, GL.GL_DEPTH_COMPONENT24, self.width, self.height)
+        GL.glBindFramebuffer(GL.GL_FRAMEBUFFER, self.fbo)
+        GL.glFramebufferRenderbuffer(GL.GL_FRAMEBUFFER, GL.GL_COLOR_ATTACHMENT0, GL.GL_RENDERBUFFER, self.color)
+        GL.glFramebufferRenderbuffer(GL.GL_FRAMEBUFFER, GL.GL_DEPTH_ATTACHMENT, GL.GL_RENDERBUFFER, self.depth)
+        if GL.glCheckFramebufferStatus(GL.GL_FRAMEBUFFER) != GL.GL_FRAMEBUFFER_COMPLETE:
+            raise RuntimeError("incomplete framebuffer")
+        GL.glViewport(0, 0, self.width, self.height)
+
+    def make_current(self):
+        if self._qt:
+            context, surface = self._qt
+            context.makeCurrent(surface)
+        else:
+            from OpenGL import EGL
+
+            display, context = self._egl
+            EGL.eglMakeCurrent(display, EGL.EGL_NO_SURFACE, EGL.EGL_NO_SURFACE, context)
+
+    def renderer(self):
+        from OpenGL import GL
+
+        return f"{GL.glGetString(GL.GL_RENDERER).decode()} / OpenGL {GL.glGetString(GL.GL_VERSION).decode()}"
+
+    def finish(self):
+        from OpenGL import GL
+
+        GL.glFinish()
+
+    def read_pixels(self):
+        """The framebuffer as a (height, width, 4) uint8 array, top row first."""
+        import numpy as np
+        from OpenGL import GL
+
+        GL.glBindFramebuffer(GL.GL_READ_FRAMEBUFFER, self.fbo)
+        data = GL.glReadPixels(0, 0, self.width, self.height, GL.GL_RGBA, GL.GL_UNSIGNED_BYTE)
+        return np.frombuffer(data, np.uint8).reshape(self.height, self.width, 4)[::-1]
+
+    def close(self):
+        if self._qt:
+            self._qt[0].doneCurrent()
+        elif self._egl:
+            from OpenGL import EGL
+
+            display, context = self._egl
+            EGL.eglMakeCurrent(display, EGL.EGL_NO_SURFACE, EGL.EGL_NO_SURFACE, EGL.EGL_NO_CONTEXT)
+            EGL.eglDestroyContext(display, context)
+        self._qt = self._egl = None
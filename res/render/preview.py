@@ -0,0 +1,270 @@
+# Live output preview: colours the stage visualiser's fixtures and aims their beams from
+# the DMX buffer the console is sending.
+#
+# Patched fixtures are matched to scene items by name (FixturePatch name == map item key).
+# Each frame, update() gathers every attribute for all fixtures at once through the
+# patch's address arrays (FixturePatch.read), derives colour, intensity and pan/tilt as
+# (fixtures,) arrays, and scatters the result into the instance arrays of the fixture and
+# beam batches. Only rows whose value changed are marked dirty, so StageRenderer.sync()
+# uploads just those.
+#
+# render_frames() drives the same path headless (res.render.headless) and returns RGBA
+# frames, for regression tests of show output against stored .npy references.
+
+import math
+
+import numpy as np
+
+from res.render import headless  # before anything imports OpenGL.GL
+from res.render.stage import StageRenderer, OrbitCamera, Mesh, model_matrices
+import tracing
+
+BEAM = "beam"
+BEAM_LENGTH = 360.0
+BEAM_ANGLE = 14.0  # degrees, full cone
+BEAM_SIDES = 10
+BEAM_ALPHA = 0.35
+BODY = 0.15  # share of an unlit fixture's colour that stays visible
+
+PAN_RANGE = 540.0
+TILT_RANGE = 270.0
+
+# colour wheel slots, 32 dmx values each; slot 0 is open (white)
+COLOR_WHEEL = np.array([
+    (1.0, 1.0, 1.0), (1.0, 0.1, 0.1), (1.0, 0.55, 0.0), (1.0, 1.0, 0.1),
+    (0.1, 1.0, 0.2), (0.1, 0.9, 1.0), (0.15, 0.2, 1.0), (0.9, 0.2, 1.0),
+], np.float32)
+
+
+def beam_mesh(length=BEAM_LENGTH, angle=BEAM_ANGLE, sides=BEAM_SIDES):
+    """An open cone from the origin along -Z."""
+    radius = length * math.tan(math.radians(angle) / 2)
+    ring = [(radius * math.cos(2 * math.pi * i / sides), radius * math.sin(2 * math.pi * i / sides), -length)
+            for i in range(sides)]
+    indices = []
+    for i in range(sides):
+        indices += [0, 1 + (i + 1) % sides, 1 + i]
+    return Mesh([(0.0, 0.0, 0.0)] + ring, indices)
+
+
+class DmxPreview:
+    """
+    Binds a FixturePatch and a (universes, 512) buffer to a StageScene. Fixtures in the patch
+    without a scene item of the same name are ignored.
+    """
+
+    def __init__(self, scene, patch, buffer, beams=True):
+        self.scene = scene
+        self.patch = patch
+        self.buffer = buffer
+        count = len(patch.fixtures)
+        self.count = count
+
+        # fixture index -> scene batch; grouped so each batch is one scatter
+        groups = {}
+        for i, (name, _, _, _) in enumerate(patch.fixtures):
+            target = scene.items.get(name)
+            if target is not None:
+                batch, slot = target
+                groups.setdefault(batch.name, (batch, [], []))
+                groups[batch.name][1].append(i)
+                groups[batch.name][2].append(slot)
+        self.groups = [(batch, np.array(fx, np.intp), np.array(slots, np.intp)) for batch, fx, slots in groups.values()]
+
+        self.beams = None
+        if beams:
+            self.beams = scene.batches.get(BEAM) or scene.add_batch(BEAM, beam_mesh(), blend=True)
+            self.beam_slots = np.full(count, -1, np.intp)
+            for batch, fixtures, slots in self.groups:
+                for i, slot in zip(fixtures.tolist(), slots.tolist()):
+                    key = patch.fixtures[i][0] + ".beam"
+                    self.beam_slots[i] = self.beams.add(key, (0, 0, 0), (0, 0, 0), (0, 0, 0, 0))
+                    scene.items[key] = (self.beams, self.beam_slots[i])
+
+        self.rgb = np.ones((count, 3), np.float32)
+        self.intensity = np.ones(count, np.float32)
+        self.pan = np.zeros(count, np.float32)
+        self.tilt = np.zeros(count, np.float32)
+        self._aim = np.full((count, 2), np.nan, np.float32)
+        self._anchor = np.full((count, 4, 4), np.nan, np.float32)  # fixture matrix the beam was aimed from
+
+    def _gather(self, attr, out, scale=1.0, offset=0.0):
+        """Fill `out` for the fixtures that have `attr`; returns their indexes or None."""
+        if not self.patch.has(attr):
+            return None
+        fixtures = self.patch.attribute(attr)["fixtures"]
+        out[fixtures] = self.patch.read(self.buffer, attr) * scale + offset
+        return fixtures
+
+    def evaluate(self):
+        """Colour, intensity and pan/tilt (degrees) of every fixture from the buffer."""
+        rgb, intensity = self.rgb, self.intensity
+        rgb[:] = 1.0
+        intensity[:] = 1.0
+        for channel, attr in enumerate(("red", "green", "blue")):
+            self._gather(attr, rgb[:, channel])
+        if self.patch.has("white"):
+            fixtures = self.patch.attribute("white")["fixtures"]
+            rgb[fixtures] = np.minimum(rgb[fixtures] + self.patch.read(self.buffer, "white")[:, None], 1.0)
+        if self.patch.has("color"):
+            fixtures = self.patch.attribute("color")["fixtures"]
+            slot = self.patch.read(self.buffer, "color", raw=True) >> 5
+            rgb[fixtures] = COLOR_WHEEL[np.minimum(slot, len(COLOR_WHEEL) - 1)]
+        self._gather("dimmer", intensity)
+        self._gather("pan", self.pan, PAN_RANGE, -PAN_RANGE / 2)
+        self._gather("tilt", self.tilt, TILT_RANGE, -TILT_RANGE / 2)
+        return rgb, intensity, self.pan, self.tilt
+
+    def update(self):
+        """Push the current buffer into the scene; returns the number of rows changed."""
+        with tracing.span("preview.update"):
+            rgb, intensity, pan, tilt = self.evaluate()
+            lit = rgb * intensity[:, None]
+            changed = 0
+            for batch, fixtures, slots in self.groups:
+                colors = np.empty((len(fixtures), 4), np.float32)
+                colors[:, :3] = BODY + (1.0 - BODY) * lit[fixtures]
+                colors[:, 3] = 1.0
+                rows = np.flatnonzero(np.any(batch.colors[slots] != colors, axis=1))
+                if len(rows):
+                    batch.set_colors(slots[rows], colors[rows])
+                    changed += len(rows)
+                if self.beams is not None:
+                    changed += self._update_beams(batch, fixtures, slots, lit, intensity)
+        tracing.counter("preview.changed", changed)
+        return changed
+
+    def _update_beams(self, batch, fixtures, slots, lit, intensity):
+        beams, beam_slots = self.beams, self.beam_slots[fixtures]
+        colors = np.empty((len(fixtures), 4), np.float32)
+        colors[:, :3] = lit[fixtures]
+        colors[:, 3] = intensity[fixtures] * BEAM_ALPHA
+        rows = np.flatnonzero(np.any(beams.colors[beam_slots] != colors, axis=1))
+        if len(rows):
+            beams.set_colors(beam_slots[rows], colors[rows])
+
+        # re-aim where pan/tilt changed or the fixture itself was moved since the last aim
+        # (not on batch.dirty, which colour changes set too)
+        aim = np.column_stack([self.pan[fixtures], self.tilt[fixtures]])
+        anchor = batch.matrices[slots]
+        moved = np.flatnonzero(np.any(self._aim[fixtures] != aim, axis=1) |
+                               np.any(self._anchor[fixtures] != anchor, axis=(1, 2)))
+        if len(moved):
+            self._aim[fixtures[moved]] = aim[moved]
+            self._anchor[fixtures[moved]] = anchor[moved]
+            local = model_matrices(np.zeros((len(moved), 3)), np.column_stack(
+                [aim[moved, 1], np.zeros(len(moved)), aim[moved, 0]]))
+            # both are stored transposed, so (fixture @ local)^T = local^T @ fixture^T
+            beams.matrices[beam_slots[moved]] = local @ batch.matrices[slots[moved]]
+            beams.dirty[beam_slots[moved]] = True
+        return len(rows) + len(moved)
+
+
+def render_frames(scene, preview, buffers, width=640, height=360, camera=None):
+    """
+    Render one off-screen frame per DMX buffer in `buffers` (each copied into the preview's
+    buffer first); returns a list of (height, width, 4) uint8 frames.
+    """
+    gl = headless.HeadlessGL(width, height)
+    try:
+        renderer = StageRenderer()
+        renderer.initialize()
+        if camera is None:
+            camera = OrbitCamera()
+            camera.frame(*scene.bounds())
+        view_projection = camera.view_projection(width / height)
+        frames = []
+        for buffer in buffers:
+            preview.buffer[...] = buffer
+            preview.update()
+            renderer.sync(scene)
+            renderer.draw(scene, view_projection)
+            frames.append(gl.read_pixels().copy())
+        renderer.release()
+        return frames
+    finally:
+        gl.close()
+
+
+def frame_difference(a, b):
+    """Mean absolute difference of two frames, 0..255."""
+    return float(np.abs(a.astype(np.int16) - b.astype(np.int16)).mean())
+
+
+def save_png(frame, path):
+    from PyQt5.QtGui import QImage
+
+    frame = np.ascontiguousarray(frame)
+    QImage(frame.data, frame.shape[1], frame.shape[0], frame.strides[0], QImage.Format_RGBA8888).save(path)
+    return path
+
+
+def patch_scene(scene, profiles, obj):
+    """Patch every `obj` item of `scene` in item order, filling universes from address 1."""
+    from res.compiler.fixture import FixturePatch, DMX_SLOTS
+
+    patch = FixturePatch(profiles)
+    profile = profiles[obj]
+    universe, address = 0, 1
+    for key in scene.batches[obj].keys:
+        if address - 1 + profile.footprint > DMX_SLOTS:
+            universe, address = universe + 1, 1
+        patch.add(key, profile, universe, address)
+        address += profile.footprint
+    return patch, universe + 1
+
+
+# run from the project root: python -m res.render.preview [fixtures] [frames] [out.png|reference.npy]
+if __name__ == "__main__":
+    import os
+    import sys
+    import time
+
+    from res.compiler.fixture import load_profiles
+    from res.render.stage import synthetic_stage
+    from process.output.dmxout import make_universe_buffer
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    frames = int(sys.argv[2]) if len(sys.argv) > 2 else 120
+    out = sys.argv[3] if len(sys.argv) > 3 else None
+
+    obj = "basicTurretLEDLightRGBW"
+    scene = synthetic_stage(count)
+    profiles = load_profiles(os.path.join("res", "objects"))
+    patch, universes = patch_scene(scene, profiles, obj)
+    buffer = make_universe_buffer(universes)
+    patch.write_defaults(buffer)
+    preview = DmxPreview(scene, patch, buffer)
+
+    # a colour chase: hue and dimmer move along the rig
+    phase = np.arange(count) / count
+    shows = []
+    for f in range(frames):
+        frame = buffer.copy()
+        t = f / frames
+        for channel, attr in enumerate(("red", "green", "blue")):
+            patch.write(frame, attr, 0.5 + 0.5 * np.cos(2 * np.pi * (phase + t + channel / 3)))
+        patch.write(frame, "dimmer", 0.5 + 0.5 * np.sin(2 * np.pi * (phase * 4 - t)))
+        shows.append(frame)
+
+    t0 = time.perf_counter()
+    for frame in shows:
+        buffer[...] = frame
+        preview.update()
+    dt = (time.perf_counter() - t0) / frames
+    print(f"{count} fixtures over {universes} universes: update {dt * 1000:.2f} ms/frame")
+
+    t0 = time.perf_counter()
+    rendered = render_frames(scene, preview, shows)
+    dt = (time.perf_counter() - t0) / frames
+    print(f"headless 640x360: {dt * 1000:.1f} ms/frame including readback")
+
+    if out and out.endswith(".npy"):
+        if os.path.exists(out):
+            diff = frame_difference(np.load(out), rendered[-1])
+            print(f"difference to {out}: {diff:.3f}")
+            sys.exit(0 if diff < 1.0 else 1)
+        np.save(out, rendered[-1])
+        print(f"reference written to {out}")
+    elif out:
+        print(f"last frame written to {save_png(rendered[-1], out)}")
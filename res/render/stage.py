@@ -0,0 +1,616 @@
+# 3D stage visualiser for MapDesigner's openGLWidget.
+#
+# Every map item using the same .lco object is drawn by one instanced draw call: the
+# object's mesh is uploaded once, and each instance gets a model matrix and a colour in a
+# per-batch NumPy array that mirrors a GL instance buffer. Moving or recolouring an item
+# only rewrites its row and marks it dirty; before a frame, dirty rows are coalesced into
+# contiguous runs and uploaded with glBufferSubData, so a frame where nothing changed
+# uploads nothing and costs one draw call per object type.
+#
+# The .lco files carry no geometry yet, so meshes are proxies built from the object name
+# (truss cross-section and length from `24SquareTruss_xl` etc., a body for fixtures).
+# register_mesh() replaces a proxy with a real mesh.
+#
+# Units are inches, Z up, as in the .map files. A truss runs along its local +Y, so the
+# `rotX: 90` tower in test-1.map stands up and its `posZ: 240` light sits on top.
+
+import ctypes
+import math
+
+import numpy as np
+
+from res.render import headless  # selects PyOpenGL's backend before OpenGL.GL is imported
+from OpenGL.GL import *
+from PyQt5.QtGui import QSurfaceFormat
+from PyQt5.QtWidgets import QOpenGLWidget
+
+import tracing
+from process.map.mapdata import map_items, item_position, item_rotation, euler_matrices, truss_spec
+from process.map.spatial import FIXTURE_BOUNDS, OBJECT_BOUNDS
+
+DEFAULT_COLOR = (0.75, 0.75, 0.78, 1.0)
+LIGHT_COLOR = (0.95, 0.85, 0.55, 1.0)
+INITIAL_CAPACITY = 64
+MERGE_GAP = 16  # dirty runs closer than this many instances are uploaded as one
+
+VERTEX_SHADER = """
+#version 330 core
+layout(location = 0) in vec3 position;
+layout(location = 2) in mat4 model;
+layout(location = 6) in vec4 color;
+uniform mat4 viewProj;
+out vec3 vWorld;
+out vec4 vColor;
+void main() {
+    vec4 world = model * vec4(position, 1.0);
+    gl_Position = viewProj * world;
+    vWorld = world.xyz;
+    vColor = color;
+}
+"""
+
+FRAGMENT_SHADER = """
+#version 330 core
+in vec3 vWorld;
+in vec4 vColor;
+uniform bool unlit;
+out vec4 fragColor;
+const vec3 lightDir = normalize(vec3(0.4, -0.5, 0.75));
+void main() {
+    if (unlit) {
+        fragColor = vColor;
+        return;
+    }
+    // flat shading from screen-space derivatives, so meshes need no per-face vertices
+    vec3 normal = normalize(cross(dFdx(vWorld), dFdy(vWorld)));
+    float diffuse = abs(dot(normal, lightDir));
+    fragColor = vec4(vColor.rgb * (0.3 + 0.7 * diffuse), vColor.a);
+}
+"""
+
+
+##########################
+# MESHES
+##########################
+
+_meshes = {}
+
+
+class Mesh:
+    """Indexed triangles: (n, 3) float32 vertex positions and uint32 indices."""
+
+    def __init__(self, vertices, indices):
+        self.vertices = np.ascontiguousarray(vertices, np.float32)
+        self.indices = np.ascontiguousarray(indices, np.uint32)
+
+    @staticmethod
+    def join(meshes):
+        offsets = np.cumsum([0] + [len(m.vertices) for m in meshes[:-1]])
+        return Mesh(np.concatenate([m.vertices for m in meshes]),
+                    np.concatenate([m.indices + offset for m, offset in zip(meshes, offsets)]))
+
+
+# corner i of a box has x from bit 0, y from bit 1, z from bit 2; faces wound outwards
+_BOX_FACES = [(1, 3, 7, 5), (2, 0, 4, 6), (3, 2, 6, 7), (0, 1, 5, 4), (4, 5, 7, 6), (2, 3, 1, 0)]
+
+
+def box(lo, hi):
+    """An axis-aligned box (8 vertices; the fragment shader derives face normals)."""
+    vertices = [(hi[0] if i & 1 else lo[0], hi[1] if i & 2 else lo[1], hi[2] if i & 4 else lo[2]) for i in range(8)]
+    indices = []
+    for a, b, c, d in _BOX_FACES:
+        indices += [a, b, c, a, c, d]
+    return Mesh(vertices, indices)
+
+
+def truss_mesh(width, length, triangle=False):
+    """Chords of a truss section along +Y, centred on the Y axis."""
+    chord = max(width * 0.08, 1.0)
+    half = width / 2.0
+    if triangle:
+        corners = [(-half, -half), (half, -half), (0.0, half)]
+    else:
+        corners = [(-half, -half), (half, -half), (half, half), (-half, half)]
+    parts = [box((x - chord / 2, 0.0, z - chord / 2), (x + chord / 2, length, z + chord / 2)) for x, z in corners]
+    return Mesh.join(parts)
+
+
+def fixture_mesh(moving=False):
+    """A fixture body hanging below its mounting point; moving heads get a yoke on top."""
+    if moving:
+        return Mesh.join([box((-7, -7, -4), (7, 7, 0)), box((-5, -5, -18), (5, 5, -4))])
+    return box(*FIXTURE_BOUNDS)
+
+
+def register_mesh(name, vertices, indices=None):
+    """Use `vertices` ((n, 3) positions) for object `name`, as triangles unless `indices` are given."""
+    if indices is None:
+        indices = np.arange(len(vertices))
+    _meshes[name] = Mesh(vertices, indices)
+
+
+def mesh_for(name):
+    mesh = _meshes.get(name)
+    if mesh is not None:
+        return mesh
+    truss = truss_spec(name)
+    if truss:
+        mesh = truss_mesh(*truss)
+    elif "Light" in (name or ""):
+        mesh = fixture_mesh(moving="MovingHead" in name)
+    else:
+        mesh = box(*OBJECT_BOUNDS)
+    _meshes[name] = mesh
+    return mesh
+
+
+##########################
+# TRANSFORMS
+##########################
+
+def model_matrices(positions, rotations, out=None):
+    """
+    Model matrices for (n, 3) positions and (n, 3) rotX/Y/Z in degrees (applied X, then
+    Y, then Z), as an (n, 4, 4) float32 array in GL column-major order.
+    """
+    positions = np.asarray(positions, np.float64).reshape(-1, 3)
+    n = len(positions)
+    if out is None:
+        out = np.zeros((n, 4, 4), np.float32)
+    # out[i] is the transpose of the rotation with the translation in the last row
+    out[:, :3, :3] = euler_matrices(rotations).transpose(0, 2, 1)
+    out[:, 3, :3] = positions
+    out[:, 0:3, 3] = 0.0
+    out[:, 3, 3] = 1.0
+    return out
+
+
+def perspective(fov_deg, aspect, near, far):
+    f = 1.0 / math.tan(math.radians(fov_deg) / 2)
+    m = np.zeros((4, 4), np.float32)
+    m[0, 0] = f / aspect
+    m[1, 1] = f
+    m[2, 2] = (far + near) / (near - far)
+    m[2, 3] = 2 * far * near / (near - far)
+    m[3, 2] = -1.0
+    return m
+
+
+def look_at(eye, target, up=(0.0, 0.0, 1.0)):
+    eye, target, up = (np.asarray(v, np.float64) for v in (eye, target, up))
+    f = target - eye
+    f /= np.linalg.norm(f)
+    s = np.cross(f, up)
+    s /= np.linalg.norm(s) or 1.0
+    u = np.cross(s, f)
+    m = np.eye(4, dtype=np.float32)
+    m[0, :3], m[1, :3], m[2, :3] = s, u, -f
+    m[:3, 3] = -m[:3, :3] @ eye
+    return m
+
+
+class OrbitCamera:
+    """Yaw/pitch/distance around a target point; view_projection() is row-major."""
+
+    def __init__(self, target=(0.0, 0.0, 0.0), distance=1500.0, yaw=-60.0, pitch=30.0, fov=45.0):
+        self.target = np.asarray(target, np.float64)
+        self.distance = distance
+        self.yaw = yaw
+        self.pitch = pitch
+        self.fov = fov
+
+    def frame(self, lo, hi):
+        lo, hi = np.asarray(lo, np.float64), np.asarray(hi, np.float64)
+        self.target = (lo + hi) / 2
+        radius = max(np.linalg.norm(hi - lo) / 2, 100.0)
+        self.distance = radius / math.sin(math.radians(self.fov) / 2)
+
+    def eye(self):
+        yaw, pitch = math.radians(self.yaw), math.radians(self.pitch)
+        offset = np.array([math.cos(pitch) * math.cos(yaw), math.cos(pitch) * math.sin(yaw), math.sin(pitch)])
+        return self.target + offset * self.distance
+
+    def view_projection(self, aspect):
+        near = max(self.distance / 1000.0, 1.0)
+        return perspective(self.fov, aspect, near, self.distance * 4) @ look_at(self.eye(), self.target)
+
+
+##########################
+# SCENE
+##########################
+
+class InstanceBatch:
+    """
+    All instances of one object: CPU mirror of the instance buffers plus a dirty mask.
+    `blend` batches (beams) are drawn unlit and additively after the solid ones.
+    """
+
+    def __init__(self, name, mesh, capacity=INITIAL_CAPACITY, blend=False):
+        self.name = name
+        self.mesh = mesh
+        self.blend = blend
+        self.count = 0
+        self.keys = []
+        self.generation = 0  # bumped when the arrays are reallocated
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        old = self.count
+        matrices = np.zeros((capacity, 4, 4), np.float32)
+        colors = np.zeros((capacity, 4), np.float32)
+        positions = np.zeros((capacity, 3), np.float64)
+        rotations = np.zeros((capacity, 3), np.float64)
+        if old:
+            matrices[:old] = self.matrices[:old]
+            colors[:old] = self.colors[:old]
+            positions[:old] = self.positions[:old]
+            rotations[:old] = self.rotations[:old]
+        self.matrices, self.colors = matrices, colors
+        self.positions, self.rotations = positions, rotations
+        self.dirty = np.zeros(capacity, bool)
+        self.capacity = capacity
+        self.generation += 1
+
+    def add(self, key, position, rotation, color=DEFAULT_COLOR):
+        if self.count == self.capacity:
+            self._allocate(self.capacity * 2)
+        slot = self.count
+        self.count += 1
+        self.keys.append(key)
+        self.colors[slot] = color
+        self.set_transforms([slot], [position], [rotation])
+        return slot
+
+    def set_transforms(self, slots, positions=None, rotations=None):
+        slots = np.asarray(slots, np.intp)
+        if positions is not None:
+            self.positions[slots] = positions
+        if rotations is not None:
+            self.rotations[slots] = rotations
+        self.matrices[slots] = model_matrices(self.positions[slots], self.rotations[slots])
+        self.dirty[slots] = True
+
+    def set_colors(self, slots, colors):
+        self.colors[slots] = colors
+        self.dirty[slots] = True
+
+    def dirty_runs(self, gap=MERGE_GAP):
+        """Contiguous [start, stop) slot ranges to upload, merging runs less than `gap` apart."""
+        slots = np.flatnonzero(self.dirty[:self.count])
+        if not len(slots):
+            return []
+        breaks = np.flatnonzero(np.diff(slots) > gap)
+        starts = np.concatenate(([slots[0]], slots[breaks + 1]))
+        stops = np.concatenate((slots[breaks], [slots[-1]])) + 1
+        return list(zip(starts.tolist(), stops.tolist()))
+
+    def clear_dirty(self):
+        self.dirty[:] = False
+
+
+class StageScene:
+    """Map items grouped into one InstanceBatch per object."""
+
+    def __init__(self, parsed_map=None):
+        self.batches = {}
+        self.items = {}  # item key -> (batch, slot)
+        if parsed_map is not None:
+            self.load(parsed_map)
+
+    def load(self, parsed_map):
+        for key, item in map_items(parsed_map).items():
+            light = "light" in str((item.get("props") or {}).get("type", "")).lower()
+            self.add(key, item.get("object", "none"), item_position(item), item_rotation(item),
+                     LIGHT_COLOR if light else DEFAULT_COLOR)
+
+    def add_batch(self, name, mesh, blend=False):
+        batch = self.batches[name] = InstanceBatch(name, mesh, blend=blend)
+        return batch
+
+    def add(self, key, obj, position, rotation=(0, 0, 0), color=DEFAULT_COLOR):
+        batch = self.batches.get(obj)
+        if batch is None:
+            batch = self.add_batch(obj, mesh_for(obj))
+        self.items[key] = (batch, batch.add(key, position, rotation, color))
+
+    def move(self, key, position=None, rotation=None):
+        batch, slot = self.items[key]
+        batch.set_transforms([slot], None if position is None else [position], None if rotation is None else [rotation])
+
+    def set_color(self, key, rgba):
+        batch, slot = self.items[key]
+        batch.set_colors([slot], [rgba])
+
+    def instances(self):
+        return sum(b.count for b in self.batches.values())
+
+    def bounds(self):
+        points = [b.positions[:b.count] for b in self.batches.values() if b.count and not b.blend]
+        if not points:
+            return (-100.0, -100.0, 0.0), (100.0, 100.0, 100.0)
+        points = np.concatenate(points)
+        return points.min(axis=0), points.max(axis=0)
+
+
+##########################
+# RENDERER
+##########################
+
+def _compile(source, kind):
+    shader = glCreateShader(kind)
+    glShaderSource(shader, source)
+    glCompileShader(shader)
+    if not glGetShaderiv(shader, GL_COMPILE_STATUS):
+        raise RuntimeError(glGetShaderInfoLog(shader).decode())
+    return shader
+
+
+def _link(vertex, fragment):
+    program = glCreateProgram()
+    for source, kind in ((vertex, GL_VERTEX_SHADER), (fragment, GL_FRAGMENT_SHADER)):
+        glAttachShader(program, _compile(source, kind))
+    glLinkProgram(program)
+    if not glGetProgramiv(program, GL_LINK_STATUS):
+        raise RuntimeError(glGetProgramInfoLog(program).decode())
+    return program
+
+
+class _BatchBuffers:
+    __slots__ = ("vao", "mesh", "elements", "matrices", "colors", "generation", "indices")
+
+
+class StageRenderer:
+    """
+    GL side of the visualiser; needs a current 3.3 core context and draws into whatever
+    framebuffer is bound (the QOpenGLWidget's, or a HeadlessGL FBO).
+    """
+
+    def __init__(self):
+        self.program = None
+        self.buffers = {}
+        self.draw_calls = 0
+        self.uploaded = 0  # bytes sent to instance buffers during the last sync()
+
+    def initialize(self):
+        self.program = _link(VERTEX_SHADER, FRAGMENT_SHADER)
+        self.view_proj = glGetUniformLocation(self.program, "viewProj")
+        self.unlit = glGetUniformLocation(self.program, "unlit")
+        glEnable(GL_DEPTH_TEST)
+        glEnable(GL_CULL_FACE)
+        glClearColor(0.1, 0.12, 0.15, 1.0)
+
+    def _create(self, batch):
+        b = _BatchBuffers()
+        b.vao = glGenVertexArrays(1)
+        b.mesh, b.elements, b.matrices, b.colors = glGenBuffers(4)
+        b.indices = len(batch.mesh.indices)
+        glBindVertexArray(b.vao)
+
+        glBindBuffer(GL_ARRAY_BUFFER, b.mesh)
+        glBufferData(GL_ARRAY_BUFFER, batch.mesh.vertices.nbytes, batch.mesh.vertices, GL_STATIC_DRAW)
+        glBindBuffer(GL_ELEMENT_ARRAY_BUFFER, b.elements)
+        glBufferData(GL_ELEMENT_ARRAY_BUFFER, batch.mesh.indices.nbytes, batch.mesh.indices, GL_STATIC_DRAW)
+        glEnableVertexAttribArray(0)
+        glVertexAttribPointer(0, 3, GL_FLOAT, GL_FALSE, 12, ctypes.c_void_p(0))
+
+        glBindBuffer(GL_ARRAY_BUFFER, b.matrices)
+        for column in range(4):
+            glEnableVertexAttribArray(2 + column)
+            glVertexAttribPointer(2 + column, 4, GL_FLOAT, GL_FALSE, 64, ctypes.c_void_p(16 * column))
+            glVertexAttribDivisor(2 + column, 1)
+
+        glBindBuffer(GL_ARRAY_BUFFER, b.colors)
+        glEnableVertexAttribArray(6)
+        glVertexAttribPointer(6, 4, GL_FLOAT, GL_FALSE, 16, ctypes.c_void_p(0))
+        glVertexAttribDivisor(6, 1)
+        glBindVertexArray(0)
+        b.generation = None
+        self.buffers[batch.name] = b
+        return b
+
+    def sync(self, scene):
+        """Upload new and dirty instances."""
+        uploaded = 0
+        with tracing.span("stage.sync"):
+            for batch in scene.batches.values():
+                b = self.buffers.get(batch.name) or self._create(batch)
+                if b.generation != batch.generation:
+                    # reallocated: resize the GL buffers and send everything
+                    for buf, data in ((b.matrices, batch.matrices), (b.colors, batch.colors)):
+                        glBindBuffer(GL_ARRAY_BUFFER, buf)
+                        glBufferData(GL_ARRAY_BUFFER, data.nbytes, data, GL_DYNAMIC_DRAW)
+                        uploaded += data.nbytes
+                    b.generation = batch.generation
+                else:
+                    for start, stop in batch.dirty_runs():
+                        for buf, data in ((b.matrices, batch.matrices), (b.colors, batch.colors)):
+                            chunk = data[start:stop]
+                            glBindBuffer(GL_ARRAY_BUFFER, buf)
+                            glBufferSubData(GL_ARRAY_BUFFER, start * data[0].nbytes, chunk.nbytes, chunk)
+                            uploaded += chunk.nbytes
+                batch.clear_dirty()
+        self.uploaded = uploaded
+        tracing.counter("stage.uploaded", uploaded)
+        return uploaded
+
+    def draw(self, scene, view_projection):
+        with tracing.span("stage.draw"):
+            glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
+            glUseProgram(self.program)
+            glUniformMatrix4fv(self.view_proj, 1, GL_TRUE, np.ascontiguousarray(view_projection, np.float32))
+            glUniform1i(self.unlit, 0)
+            calls = self._draw_batches(scene, False)
+            if any(batch.blend for batch in scene.batches.values()):
+                # beams: additive, unlit, tested against but not writing depth, both faces
+                glEnable(GL_BLEND)
+                glBlendFunc(GL_SRC_ALPHA, GL_ONE)
+                glDepthMask(GL_FALSE)
+                glDisable(GL_CULL_FACE)
+                glUniform1i(self.unlit, 1)
+                calls += self._draw_batches(scene, True)
+                glEnable(GL_CULL_FACE)
+                glDepthMask(GL_TRUE)
+                glDisable(GL_BLEND)
+            glBindVertexArray(0)
+        self.draw_calls = calls
+
+    def _draw_batches(self, scene, blend):
+        calls = 0
+        for batch in scene.batches.values():
+            if not batch.count or batch.blend != blend:
+                continue
+            b = self.buffers[batch.name]
+            glBindVertexArray(b.vao)
+            glDrawElementsInstanced(GL_TRIANGLES, b.indices, GL_UNSIGNED_INT, None, batch.count)
+            calls += 1
+        return calls
+
+    def release(self):
+        for b in self.buffers.values():
+            glDeleteBuffers(4, [b.mesh, b.elements, b.matrices, b.colors])
+            glDeleteVertexArrays(1, [b.vao])
+        self.buffers.clear()
+        if self.program:
+            glDeleteProgram(self.program)
+            self.program = None
+
+
+##########################
+# WIDGET
+##########################
+
+class StageView(QOpenGLWidget):
+    """
+    QOpenGLWidget showing a StageScene; drag to orbit, wheel to zoom. Call update() after
+    changing the scene.
+    """
+
+    def __init__(self, scene=None, parent=None):
+        super().__init__(parent)
+        fmt = QSurfaceFormat()
+        fmt.setVersion(3, 3)
+        fmt.setProfile(QSurfaceFormat.CoreProfile)
+        fmt.setDepthBufferSize(24)
+        fmt.setSamples(4)
+        self.setFormat(fmt)
+        self.scene = scene or StageScene()
+        self.renderer = StageRenderer()
+        self.camera = OrbitCamera()
+        self.camera.frame(*self.scene.bounds())
+        self._drag = None
+
+    @classmethod
+    def replace(cls, placeholder, scene=None):
+        """Swap a Designer placeholder widget (MapDesigner's openGLWidget) for a StageView."""
+        view = cls(scene, placeholder.parentWidget())
+        view.setObjectName(placeholder.objectName())
+        view.setSizePolicy(placeholder.sizePolicy())
+        view.setMinimumSize(placeholder.minimumSize())
+        layout = placeholder.parentWidget().layout() if placeholder.parentWidget() else None
+        if layout is not None:
+            layout.replaceWidget(placeholder, view)
+        else:
+            view.setGeometry(placeholder.geometry())
+        placeholder.hide()
+        placeholder.deleteLater()
+        view.show()
+        return view
+
+    def set_scene(self, scene):
+        self.scene = scene
+        self.camera.frame(*scene.bounds())
+        if self.renderer.program:
+            self.makeCurrent()
+            self.renderer.release()
+            self.renderer.initialize()
+            self.doneCurrent()
+        self.update()
+
+    def initializeGL(self):
+        self.renderer.initialize()
+
+    def resizeGL(self, w, h):
+        glViewport(0, 0, w, h)
+
+    def paintGL(self):
+        self.renderer.sync(self.scene)
+        aspect = self.width() / max(self.height(), 1)
+        self.renderer.draw(self.scene, self.camera.view_projection(aspect))
+
+    def mousePressEvent(self, event):
+        self._drag = event.pos()
+
+    def mouseMoveEvent(self, event):
+        if self._drag is None:
+            return
+        delta = event.pos() - self._drag
+        self._drag = event.pos()
+        self.camera.yaw -= delta.x() * 0.4
+        self.camera.pitch = min(89.0, max(-89.0, self.camera.pitch + delta.y() * 0.4))
+        self.update()
+
+    def mouseReleaseEvent(self, event):
+        self._drag = None
+
+    def wheelEvent(self, event):
+        self.camera.distance *= 0.9 ** (event.angleDelta().y() / 120)
+        self.update()
+
+
+def synthetic_stage(fixtures=5000, truss_every=10):
+    """A scene of `fixtures` lights in rows, with a truss section over every `truss_every`."""
+    scene = StageScene()
+    side = int(math.ceil(math.sqrt(fixtures)))
+    for i in range(fixtures):
+        x, y = (i % side) * 30.0, (i // side) * 30.0
+        scene.add(f"item.l{i}", "basicTurretLEDLightRGBW", (x, y, 240.0), (0, 0, 0), LIGHT_COLOR)
+        if i % truss_every == 0:
+            scene.add(f"item.t{i}", "24SquareTruss_med", (x, y, 252.0), (0, 0, -90))
+    return scene
+
+
+# run from the project root: python -m res.render.stage [fixtures] [frames] [moved per frame] [WxH]
+if __name__ == "__main__":
+    import sys
+    import time
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    frames = int(sys.argv[2]) if len(sys.argv) > 2 else 240
+    moved = int(sys.argv[3]) if len(sys.argv) > 3 else 50
+    size = sys.argv[4] if len(sys.argv) > 4 else "1280x720"
+    WIDTH, HEIGHT = (int(v) for v in size.split("x"))
+
+    gl = headless.HeadlessGL(WIDTH, HEIGHT)
+    print(gl.renderer())
+    t0 = time.perf_counter()
+    scene = synthetic_stage(count)
+    print(f"{scene.instances()} instances in {len(scene.batches)} batches, built in {time.perf_counter() - t0:.3f}s")
+
+    renderer = StageRenderer()
+    renderer.initialize()
+    camera = OrbitCamera()
+    camera.frame(*scene.bounds())
+    vp = camera.view_projection(gl.width / gl.height)
+    renderer.sync(scene)
+    renderer.draw(scene, vp)
+    gl.finish()
+
+    lights = scene.batches["basicTurretLEDLightRGBW"]
+    rng = np.random.default_rng(0)
+    times, uploads = [], []
+    for frame in range(frames):
+        t = time.perf_counter()
+        slots = rng.integers(0, lights.count, moved)
+        lights.set_transforms(slots, rotations=np.column_stack([rng.random(moved) * 90, np.zeros(moved), rng.random(moved) * 360]))
+        lights.set_colors(slots, rng.random((moved, 4), np.float32))
+        uploads.append(renderer.sync(scene))
+        renderer.draw(scene, vp)
+        gl.finish()
+        times.append(time.perf_counter() - t)
+
+    times = np.array(times) * 1000
+    print(f"{frames} frames, {moved} changed/frame: mean {times.mean():.2f} ms, p95 {np.percentile(times, 95):.2f} ms, "
+          f"{1000 / times.mean():.0f} FPS, {renderer.draw_calls} draw calls, {np.mean(uploads) / 1024:.1f} KiB uploaded/frame")
+    lit = (gl.read_pixels()[..., :3].astype(int).sum(axis=2) > 150).mean()
+    print(f"{lit:.1%} of pixels lit")
+    gl.close()
@@ -0,0 +1,53 @@
+# Audio analysis and processing: timeline waveform peaks across zoom levels, the STFT
+# spectrogram pass of batchspec, one mixer block and one metering block.
+
+import numpy as np
+
+from data import track, RATE
+from res.render.batchspec import analyse, waveform_peaks, CHUNK
+from res.audio.mixer import MixerEngine, ArraySource
+from res.audio.meter import MeteringService
+
+TRACK_SECONDS = 240.0
+WIDTH = 1920  # timeline pixels
+
+
+def setup():
+    samples = track(TRACK_SECONDS)
+    mixer = MixerEngine(32)
+    for c in range(32):
+        mixer.set_source(c, ArraySource(samples[c * RATE:(c + 2) * RATE]))
+        mixer.set_pan(c, -1.0 + 2.0 * c / 31)
+    metering = MeteringService(36)
+    block = np.ascontiguousarray(np.tile(samples[:metering.block], (36, 1)))
+    return {"track": samples, "mixer": mixer, "metering": metering, "meter_block": block}
+
+
+def time_waveform_peaks(fixture, zoom):
+    samples = fixture["track"]
+    span = len(samples) if zoom == "fit" else min(int(zoom) * WIDTH, len(samples))
+    start = (len(samples) - span) // 2
+    waveform_peaks(samples, start, start + span, WIDTH)
+
+
+# samples per pixel, from sample level to the whole track on screen
+time_waveform_peaks.params = ["1", "16", "256", "4096", "fit"]
+
+
+def time_stft_30s(fixture):
+    samples = fixture["track"][:30 * RATE]
+
+    def chunks():
+        yield RATE
+        for start in range(0, len(samples), CHUNK):
+            yield samples[start:start + CHUNK]
+
+    analyse(chunks())
+
+
+def time_mixer_block(fixture):
+    fixture["mixer"].render()
+
+
+def time_meter_block(fixture):
+    fixture["metering"].measure(fixture["meter_block"])
@@ -0,0 +1,64 @@
+# Compiler: parse_custom_format on generated maps and nesting, the shipped resources,
+# run_bulk over a generated resource tree and the interned object library.
+
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+from data import map_text, deep_text, object_tree
+from res.compiler.compiler import parse_custom_format, tokenize, run_bulk
+from res.compiler.library import ObjectLibrary
+
+SHIPPED = ("res/objects", "res/rack", "res/map", "res/sequences")
+
+
+def setup():
+    tmp = tempfile.mkdtemp(prefix="lc-bench-")
+    object_tree(os.path.join(tmp, "res"))
+    shipped = [p.read_text(encoding="utf-8") for root in SHIPPED for p in sorted(Path(root).rglob("*")) if p.is_file()]
+    return {"tmp": tmp, "wide": {n: map_text(n) for n in time_parse_wide.params},
+            "deep": {n: deep_text(n) for n in time_parse_deep.params}, "shipped": shipped}
+
+
+def teardown(fixture):
+    if fixture:
+        shutil.rmtree(fixture["tmp"], ignore_errors=True)
+
+
+def time_parse_wide(fixture, items):
+    parse_custom_format(fixture["wide"][items])
+
+
+time_parse_wide.params = [1000, 10000]
+
+
+def time_tokenize_wide(fixture, items):
+    tokenize(fixture["wide"][items])
+
+
+time_tokenize_wide.params = [10000]
+
+
+def time_parse_deep(fixture, depth):
+    parse_custom_format(fixture["deep"][depth])
+
+
+time_parse_deep.params = [1000, 10000]
+
+
+def time_parse_shipped(fixture):
+    for text in fixture["shipped"]:
+        parse_custom_format(text)
+
+
+def time_run_bulk(fixture):
+    base = os.path.join(fixture["tmp"], "res") + "/"
+    with contextlib.redirect_stdout(io.StringIO()):
+        run_bulk(base, ["objects"], os.path.join(fixture["tmp"], "temp"))
+
+
+def time_object_library(fixture):
+    ObjectLibrary([os.path.join(fixture["tmp"], "res", "objects")], (".lco",))
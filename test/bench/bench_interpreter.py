@@ -0,0 +1,27 @@
+# Interpreter front end: lexing generated expressions and parsing their tokens.
+
+from data import expression
+
+
+def setup():
+    from process.interpreter import interpreter
+    texts = {n: expression(n) for n in time_lex.params}
+    tokens = {n: interpreter.Lexer("<bench>", text).make_tokens()[0] for n, text in texts.items()}
+    return {"interpreter": interpreter, "text": texts, "tokens": tokens}
+
+
+def time_lex(fixture, terms):
+    fixture["interpreter"].run("<bench>", fixture["text"][terms])
+
+
+time_lex.params = [100, 10000]
+
+
+def time_parse(fixture, terms):
+    # the parser is still being written: bin_op over factors is the part that runs today
+    interpreter = fixture["interpreter"]
+    parser = interpreter.Parser(fixture["tokens"][terms])
+    parser.bin_op(parser.factor, (interpreter.TOKEN_MUL, interpreter.TOKEN_DIV))
+
+
+time_parse.params = [100, 10000]
@@ -0,0 +1,45 @@
+# DMX output: the sequence engine filling the channel buffer and one sACN frame of 256
+# changed universes sent over loopback.
+
+import socket
+
+import numpy as np
+
+from process.output.dmxout import OutputSink, make_universe_buffer
+from process.sequence.sequencer import SequenceEngine, load_sequences
+
+UNIVERSES = 256
+
+
+def setup():
+    buffer = make_universe_buffer(UNIVERSES)
+    curves = load_sequences()
+    engine = SequenceEngine(buffer, curves)
+    rng = np.random.default_rng(7)
+    for name, curve in curves.items():
+        for _ in range(200):
+            addresses = rng.integers(0, buffer.size, curve.lanes).tolist()
+            engine.start(name, addresses, now=0.0, loop=True)
+    listener = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    listener.bind(("127.0.0.1", 0))
+    sink = OutputSink("sacn", "127.0.0.1", port=listener.getsockname()[1]).open()
+    for u in range(UNIVERSES):
+        sink.patch(u + 1, row=u, destination="127.0.0.1")
+    return {"buffer": buffer, "engine": engine, "sink": sink, "listener": listener, "frame": [0]}
+
+
+def teardown(fixture):
+    if fixture:
+        fixture["sink"].close()
+        fixture["listener"].close()
+
+
+def time_sequence_tick(fixture):
+    fixture["frame"][0] += 1
+    fixture["engine"].tick(fixture["frame"][0] / 44.0)
+
+
+def time_sacn_frame(fixture):
+    frame = fixture["frame"][0] = fixture["frame"][0] + 1
+    fixture["buffer"][:, frame % 512] = frame & 0xff  # every universe changed
+    fixture["sink"].send(fixture["buffer"], now=frame / 44.0)
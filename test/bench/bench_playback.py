@@ -0,0 +1,28 @@
+# The timeline's playback path (res/render/audio.py): the pyaudio callback for one block
+# and the amplitude histogram. Needs pyaudio; the module is skipped without it.
+
+from types import SimpleNamespace
+
+from data import track
+
+
+def setup():
+    from res.render import audio
+    samples = track(60.0)
+    player = SimpleNamespace(audio_data_buffer=samples, playback_position_samples=0, is_playing=True,
+                             volume_level_signal=SimpleNamespace(emit=lambda level: None))
+    return {"audio": audio, "player": player, "track": samples}
+
+
+def time_audio_callback(fixture, frames):
+    player = fixture["player"]
+    if player.playback_position_samples + frames > len(player.audio_data_buffer):
+        player.playback_position_samples = 0
+    fixture["audio"]._audio_callback(player, None, frames, None, 0)
+
+
+time_audio_callback.params = [256, 1024]
+
+
+def time_histogram(fixture):
+    fixture["audio"].calculateHistogramW(fixture["track"])
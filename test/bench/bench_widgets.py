@@ -0,0 +1,47 @@
+# Audio widgets: one paintGL + glFinish of the timeline and the histogram in a headless
+# compatibility context, halfway through each scenario of render_widgets.py (which has the
+# frame-time percentiles and the pixel checks). Skipped where librosa/pyaudio are missing.
+
+import os
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from render_widgets import SIZE, TRACK_SECONDS, prepare
+from data import track
+from res.render import headless
+
+
+def setup():
+    from PyQt5.QtWidgets import QApplication
+
+    fixture = {"app": QApplication.instance() or QApplication([]), "widgets": {}}
+    samples = track(TRACK_SECONDS)
+    try:
+        for name in ("timeline", "histogram"):
+            gl = headless.HeadlessGL(*SIZE, (2, 1), "compat")
+            fixture["widgets"][name] = (gl, *prepare(gl, name, samples)[:2])
+    except BaseException:
+        teardown(fixture)
+        raise
+    return fixture
+
+
+def teardown(fixture):
+    if fixture:
+        for gl, _, _ in fixture["widgets"].values():
+            gl.close()
+
+
+def time_paint(fixture, case):
+    from OpenGL import GL
+
+    name, scenario = case.split(".")
+    gl, widget, scenarios = fixture["widgets"][name]
+    gl.make_current()
+    GL.glBindFramebuffer(GL.GL_FRAMEBUFFER, gl.fbo)
+    scenarios[scenario][0](0.5)
+    widget.paintGL()
+    GL.glFinish()
+
+
+time_paint.params = ["timeline.pan", "timeline.zoom", "timeline.playhead", "histogram.static", "histogram.update"]
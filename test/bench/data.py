@@ -0,0 +1,67 @@
+# Synthetic inputs for the benchmark suite. Everything is generated from a fixed seed, so
+# two runs (or two commits) time exactly the same work.
+
+import os
+
+import numpy as np
+
+SEED = 1234
+RATE = 48000
+
+
+def map_text(items):
+    """A .map source with `items` item blocks, like a large rig."""
+    item = ('    item.light{0} {{\n        object: "basicTurretLEDLight"\n        posX: {0}.5\n'
+            '        posY: -{1}\n        posZ: 250\n        rotZ: {2}.25\n        visible: true\n    }};\n')
+    body = "".join(item.format(i, i % 97, i % 360) for i in range(items))
+    return f'.map {{\n    name: "bench"\n}};\nitems {{\n{body}}};\ntriggers {{\n}};\n'
+
+
+def deep_text(depth):
+    """`depth` nested blocks, one value per level."""
+    return "".join(f"level{i} {{\n    index: {i}\n" for i in range(depth)) + "}\n" * depth
+
+
+def object_text(i):
+    """A light object (.lco) whose channel defaults vary with `i`."""
+    channels = "".join(f"    ch{c} {{\n        offset: {c}\n        width: 1\n        default: {(i * 7 + c) % 256}\n    }}\n"
+                       for c in range(12))
+    return f'.header {{\n    name: "bench {i}"\n}}\n\n.object {{\n}}\n\n.channels {{\n{channels}}}\n'
+
+
+def object_tree(root, folders=4, per_folder=50):
+    """Write a resource tree of .lco files under `root`; returns the number of files."""
+    count = 0
+    for f in range(folders):
+        folder = os.path.join(root, "objects", f"group{f}")
+        os.makedirs(folder, exist_ok=True)
+        for i in range(per_folder):
+            with open(os.path.join(folder, f"object{i}.lco"), "w", encoding="utf-8") as out:
+                out.write(object_text(count))
+            count += 1
+    return count
+
+
+def track(seconds, rate=RATE, seed=SEED):
+    """Mono float32 programme material: a few partials with vibrato over noise, -1..1."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * rate), dtype=np.float64) / rate
+    signal = np.zeros_like(t)
+    for f, a in ((110.0, 0.3), (220.0, 0.2), (440.0, 0.12), (1760.0, 0.05)):
+        signal += a * np.sin(2 * np.pi * f * t + 0.3 * np.sin(2 * np.pi * 5.0 * t))
+    signal += 0.05 * rng.standard_normal(len(t))
+    return (signal / np.max(np.abs(signal))).astype(np.float32)
+
+
+def expression(terms, seed=SEED):
+    """An arithmetic expression for the interpreter's lexer: ints, floats, + - * / and brackets."""
+    rng = np.random.default_rng(seed)
+    ops = "+-*/"
+    parts = []
+    for i in range(terms):
+        number = f"{rng.integers(1000)}" if i % 3 else f"{rng.integers(100)}.{rng.integers(1000):03d}"
+        if i % 5 == 0:
+            number = f"({number} {ops[rng.integers(4)]} {rng.integers(1, 50)})"
+        parts.append(number)
+        parts.append(ops[rng.integers(4)])
+    return " ".join(parts[:-1])
@@ -0,0 +1,271 @@
+# Headless render harness for the audio OpenGL widgets.
+#
+#   python test/bench/render_widgets.py [--frames N] [--size 1280x240] [--out result.json]
+#                                       [--golden DIR] [--only timeline,histogram,prototype]
+#
+# Each widget (AudioHistogramWidget and WaveformTimelineWidget from res/render/audio.py, the
+# WaveformWidget prototype in test/audio2.py) is created without being shown, fed synthetic
+# audio from data.py, given a GL context of its own, and painted into a HeadlessGL
+# framebuffer (EGL surfaceless + llvmpipe on a Linux box without a display, a
+# QOffscreenSurface context elsewhere) with a compatibility profile, as the widgets use
+# fixed-function GL. Scripted scenarios move the view every frame (pan, zoom, playhead);
+# every paintGL is followed by glFinish so the frame time includes the rasterisation, and
+# the process CPU time per frame includes the llvmpipe threads. The last frame of each
+# scenario must contain the colours the scenario draws (waveform, bars, playhead), and
+# with --golden it is compared against (or saved as) a reference PNG. Failures, including
+# widgets that raise, give exit status 1; a widget whose dependencies are missing
+# (librosa, pyaudio) is skipped, as in run.py.
+#
+# The default run covers the widgets the app uses. The prototype is run only on request
+# (--only prototype): its resizeGL reads x_scale_px_per_s, which it never sets, so it
+# fails until test/audio2.py is fixed.
+
+import argparse
+import importlib.util
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+for path in (ROOT, BENCH_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from res.render import headless  # selects PyOpenGL's backend before OpenGL.GL is imported
+from data import track, RATE
+
+SIZE = (1280, 240)
+FRAMES = 120
+TRACK_SECONDS = 180.0
+GOLDEN_TOLERANCE = 1.0  # mean absolute difference, 0..255
+COLOR_TOLERANCE = 12
+
+
+##########################
+# WIDGETS
+##########################
+
+def _spectrum(samples, n_fft=2048, hop=512):
+    """Mean STFT magnitude, normalised to 0..2 the way AudioHistogramWidget does it."""
+    frames = np.lib.stride_tricks.sliding_window_view(samples, n_fft)[::hop]
+    magnitude = np.abs(np.fft.rfft(frames * np.hanning(n_fft).astype(np.float32), axis=1)).mean(axis=0)
+    peak = magnitude.max()
+    return magnitude / peak * 2.0 if peak > 0 else magnitude
+
+
+def _timeline(samples):
+    from res.render.audio import WaveformTimelineWidget
+
+    widget = WaveformTimelineWidget()
+    widget.audio_data = samples / np.max(np.abs(samples))
+    widget.sr = RATE
+
+    def pan(t):
+        widget.x_offset_s = (len(samples) / RATE) * 0.9 * t
+        widget.update_projection(widget.width(), widget.height())
+
+    def zoom(t):
+        widget.x_scale_px_per_s = 10.0 * (1000.0 ** t)
+        widget.update_projection(widget.width(), widget.height())
+
+    def playhead(t):  # the view starts at 0 s, the playhead moves through it
+        widget.x_offset_s = 0.0
+        widget.update_projection(widget.width(), widget.height())
+        widget.playhead_position_s = 1.5 * t
+
+    colors = {"background": (0.1, 0.1, 0.2), "waveform": (0.6, 0.8, 0.9), "playhead": (1.0, 0.0, 0.0)}
+    return widget, {"pan": (pan, ("waveform",)), "zoom": (zoom, ("waveform",)),
+                    "playhead": (playhead, ("waveform", "playhead"))}, colors
+
+
+def _histogram(samples):
+    from res.render.audio import AudioHistogramWidget
+
+    widget = AudioHistogramWidget()
+    window = 10 * RATE
+    widget.audio_data = _spectrum(samples[:window])
+
+    def static(t):
+        pass
+
+    def update(t):  # a new analysis window every frame, as a live display would
+        start = int((len(samples) - window) * t)
+        widget.audio_data = _spectrum(samples[start:start + window // 20])
+
+    colors = {"background": (0.1, 0.2, 0.3), "bars": (0.5, 0.8, 0.6)}
+    return widget, {"static": (static, ("bars",)), "update": (update, ("bars",))}, colors
+
+
+def _prototype(samples):
+    spec = importlib.util.spec_from_file_location("audio2", os.path.join(ROOT, "test", "audio2.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    widget = module.WaveformWidget()
+    widget.samples = samples
+    widget.sample_rate = RATE
+
+    def zoom(t):
+        widget.samples_per_pixel = 10 * (200 ** t)
+
+    def pan(t):
+        widget.h_offset = int((len(samples) - widget.width() * widget.samples_per_pixel) * t)
+
+    def playhead(t):
+        widget.position = int(1.5 * t * RATE)
+
+    colors = {"background": (0.1, 0.1, 0.2), "waveform": (0.5, 0.8, 1.0), "playhead": (1.0, 0.0, 0.0)}
+    return widget, {"zoom": (zoom, ("waveform",)), "pan": (pan, ("waveform",)),
+                    "playhead": (playhead, ("waveform", "playhead"))}, colors
+
+
+WIDGETS = {"timeline": _timeline, "histogram": _histogram, "prototype": _prototype}
+DEFAULT_WIDGETS = ("timeline", "histogram")
+
+
+##########################
+# MEASURING
+##########################
+
+def percentiles(values):
+    values = np.asarray(values) * 1000.0
+    return {"p50": float(np.percentile(values, 50)), "p95": float(np.percentile(values, 95)),
+            "p99": float(np.percentile(values, 99)), "max": float(values.max()), "mean": float(values.mean())}
+
+
+def color_coverage(frame, rgb):
+    """Share of columns with at least one pixel of colour `rgb` (0..1 floats)."""
+    target = np.round(np.asarray(rgb) * 255).astype(np.int16)
+    hit = np.all(np.abs(frame[:, :, :3].astype(np.int16) - target) <= COLOR_TOLERANCE, axis=2)
+    return float(hit.any(axis=0).mean())
+
+
+def load_png(path):
+    from PyQt5.QtGui import QImage
+
+    image = QImage(path).convertToFormat(QImage.Format_RGBA8888)
+    data = np.frombuffer(image.constBits().asstring(image.byteCount()), np.uint8)
+    return data.reshape(image.height(), image.bytesPerLine() // 4, 4)[:, :image.width()].copy()
+
+
+def prepare(gl, name, samples):
+    """Widget `name` on `samples`, initialised in `gl`: (widget, scenarios, colours)."""
+    from OpenGL import GL
+
+    widget, scenarios, colors = WIDGETS[name](samples)
+    widget.resize(gl.width, gl.height)
+    gl.make_current()
+    GL.glBindFramebuffer(GL.GL_FRAMEBUFFER, gl.fbo)
+    widget.initializeGL()
+    widget.resizeGL(gl.width, gl.height)
+    return widget, scenarios, colors
+
+
+def render(gl, name, frames=FRAMES, golden=None, report=print):
+    """Run every scenario of widget `name`; returns {scenario: result}."""
+    from OpenGL import GL
+    from res.render.preview import frame_difference, save_png
+
+    widget, scenarios, colors = prepare(gl, name, track(TRACK_SECONDS))
+
+    results = {}
+    for scenario, (step, expected) in scenarios.items():
+        wall, cpu = [], []
+        for i in range(frames):
+            step(i / max(1, frames - 1))  # the last frame is the same view whatever `frames` is
+            t0, c0 = time.perf_counter(), time.process_time()
+            widget.paintGL()
+            GL.glFinish()
+            wall.append(time.perf_counter() - t0)
+            cpu.append(time.process_time() - c0)
+        frame = gl.read_pixels()
+        result = {"frames": frames, "wall_ms": percentiles(wall), "cpu_ms": percentiles(cpu),
+                  "coverage": {label: color_coverage(frame, rgb) for label, rgb in colors.items()},
+                  "expected": list(expected)}
+        if golden:
+            path = os.path.join(golden, f"{name}-{scenario}-{gl.width}x{gl.height}.png")
+            if os.path.exists(path):
+                result["golden_diff"] = frame_difference(frame, load_png(path))
+            else:
+                os.makedirs(golden, exist_ok=True)
+                save_png(frame, path)
+                result["golden_saved"] = path
+        results[scenario] = result
+        w, c = result["wall_ms"], result["cpu_ms"]
+        drawn = ", ".join(f"{label} {share:.1%}" for label, share in result["coverage"].items())
+        extra = f", golden diff {result['golden_diff']:.2f}" if "golden_diff" in result else ""
+        report(f"{name + '.' + scenario:<22} p50 {w['p50']:7.2f} ms  p95 {w['p95']:7.2f}  p99 {w['p99']:7.2f}  "
+               f"cpu {c['mean']:7.2f} ms/frame  columns: {drawn}{extra}")
+    return results
+
+
+def failures(results):
+    """Problems found in a run: widgets that failed, colours missing from a frame, golden mismatches."""
+    problems = []
+    for name, scenarios in results.items():
+        if "skipped" in scenarios:
+            continue
+        if "error" in scenarios:
+            problems.append(f"{name}: {scenarios['error']}")
+            continue
+        for scenario, result in scenarios.items():
+            for label in result["expected"]:
+                if result["coverage"][label] == 0:
+                    problems.append(f"{name}.{scenario}: no {label} in the last frame")
+            if result.get("golden_diff", 0.0) > GOLDEN_TOLERANCE:
+                problems.append(f"{name}.{scenario}: differs from golden ({result['golden_diff']:.2f})")
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless render benchmark for the audio OpenGL widgets.")
+    parser.add_argument("--frames", type=int, default=FRAMES)
+    parser.add_argument("--size", default=f"{SIZE[0]}x{SIZE[1]}")
+    parser.add_argument("--only", help=f"comma separated, from {', '.join(WIDGETS)} "
+                                       f"(default {','.join(DEFAULT_WIDGETS)})")
+    parser.add_argument("--golden", help="directory of reference frames (written when missing)")
+    parser.add_argument("--out", help="write the results as JSON")
+    args = parser.parse_args(argv)
+
+    os.chdir(ROOT)
+    from PyQt5.QtWidgets import QApplication
+
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    width, height = (int(v) for v in args.size.lower().split("x"))
+
+    results = {}
+    renderer = None
+    for name in (args.only.split(",") if args.only else DEFAULT_WIDGETS):
+        # a context per widget, as in the app: the widgets leave matrices and state behind
+        gl = headless.HeadlessGL(width, height, (2, 1), "compat")
+        if renderer is None:
+            renderer = gl.renderer()
+            print(renderer)
+        try:
+            results[name] = render(gl, name, args.frames, args.golden)
+        except ImportError as e:
+            results[name] = {"skipped": str(e)}
+            print(f"{name:<22} skipped ({e})")
+        except Exception as e:  # a widget that cannot run is reported, the rest still run
+            results[name] = {"error": f"{type(e).__name__}: {e}"}
+            print(f"{name:<22} error ({type(e).__name__}: {e})")
+        finally:
+            gl.close()
+    del app
+
+    problems = failures(results)
+    for problem in problems:
+        print("FAIL", problem)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"renderer": renderer, "size": [width, height],
+                       "frames": args.frames, "widgets": results, "failures": problems}, f, indent=4)
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,234 @@
+# Benchmark runner for the hot paths (compiler, audio, render, output, interpreter).
+#
+#   python test/bench/run.py                      run everything, save results JSON
+#   python test/bench/run.py -k parse --quick     only names containing "parse", fewer samples
+#   python test/bench/run.py --compare old.json   run and compare against an earlier result
+#   python test/bench/run.py --compare a.json b.json
+#
+# Benchmarks live in test/bench/bench_*.py, asv style: every `time_<name>(fixture, *params)`
+# function is one benchmark, `time_<name>.params = [...]` runs it once per value, and an
+# optional module `setup()` builds the fixture (an ImportError or OSError there skips the
+# module, e.g. when pyaudio is missing) with `teardown(fixture)` to clean up. Each benchmark
+# is warmed up, the loop count is raised until one sample takes MIN_TIME, then REPEAT
+# samples are taken with the garbage collector off; the stats are per call, in seconds.
+# Results go to test/bench/results/<date>-<commit>.json with the machine they ran on.
+
+import argparse
+import datetime
+import gc
+import importlib.util
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+MIN_TIME = 0.1  # seconds per sample
+REPEAT = 7
+QUICK_REPEAT = 3
+THRESHOLD = 1.2  # median ratio that counts as a regression
+
+
+def discover():
+    """[(module name, path)] of the bench_*.py files, sorted."""
+    return sorted((name[len("bench_"):-3], os.path.join(BENCH_DIR, name))
+                  for name in os.listdir(BENCH_DIR) if name.startswith("bench_") and name.endswith(".py"))
+
+
+def load(name, path):
+    spec = importlib.util.spec_from_file_location(f"bench_{name}", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def benchmarks(module):
+    """[(name, function, params)] in definition order."""
+    found = []
+    for attr, value in vars(module).items():
+        if attr.startswith("time_") and callable(value):
+            found.append((attr[len("time_"):], value, getattr(value, "params", None)))
+    return found
+
+
+def _sample(call, loops):
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        t0 = time.perf_counter()
+        for _ in range(loops):
+            call()
+        return time.perf_counter() - t0
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def measure(call, repeat=REPEAT, min_time=MIN_TIME):
+    """Per-call timing stats of `call`."""
+    call()  # warm up caches and lazy imports
+    loops = 1
+    while True:
+        elapsed = _sample(call, loops)
+        if elapsed >= min_time:
+            break
+        # same progression as timeit.autorange: 1, 2, 5, 10, 20, 50, ...
+        loops = loops * 5 // 2 if str(loops)[0] == "2" else loops * 2
+    samples = [elapsed / loops] + [_sample(call, loops) / loops for _ in range(repeat - 1)]
+    return {
+        "min": min(samples),
+        "median": statistics.median(samples),
+        "mean": statistics.fmean(samples),
+        "stdev": statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        "loops": loops,
+        "repeat": len(samples),
+    }
+
+
+def machine():
+    cpu = platform.processor()
+    try:
+        with open("/proc/cpuinfo", encoding="utf-8") as f:
+            cpu = next((line.split(":", 1)[1].strip() for line in f if line.startswith("model name")), cpu)
+    except OSError:
+        pass
+    import numpy
+    return {"platform": platform.platform(), "python": platform.python_version(), "numpy": numpy.__version__,
+            "cpu": cpu, "cpus": os.cpu_count()}
+
+
+def commit():
+    def git(*args):
+        try:
+            return subprocess.run(["git", *args], cwd=ROOT, capture_output=True, text=True, timeout=30).stdout.strip()
+        except (OSError, subprocess.SubprocessError):
+            return ""
+    return git("rev-parse", "HEAD"), bool(git("status", "--porcelain", "--untracked-files=no"))
+
+
+def run(pattern=None, repeat=REPEAT, min_time=MIN_TIME, report=print):
+    results = {}
+    for module_name, path in discover():
+        try:
+            module = load(module_name, path)
+        except ImportError as e:
+            if pattern is None or pattern in module_name:
+                results[module_name] = {"skipped": str(e)}
+                report(f"{module_name:<48} skipped ({e})")
+            continue
+        selected = [(name, fn, params) for name, fn, params in benchmarks(module)
+                    if pattern is None or pattern in f"{module_name}.{name}"]
+        if not selected:
+            continue
+        fixture = None
+        try:
+            if hasattr(module, "setup"):
+                fixture = module.setup()
+        except (ImportError, OSError) as e:
+            for name, _, params in selected:
+                for param in params or [None]:
+                    key = f"{module_name}.{name}" + ("" if param is None else f"[{param}]")
+                    results[key] = {"skipped": str(e)}
+                    report(f"{key:<48} skipped ({e})")
+            continue
+        try:
+            for name, fn, params in selected:
+                for param in params or [None]:
+                    key = f"{module_name}.{name}" + ("" if param is None else f"[{param}]")
+                    args = (fixture,) if param is None else (fixture, param)
+                    try:
+                        stats = measure(lambda: fn(*args), repeat, min_time)
+                    except Exception as e:  # a broken benchmark should not stop the suite
+                        results[key] = {"error": f"{type(e).__name__}: {e}"}
+                        report(f"{key:<48} error ({type(e).__name__}: {e})")
+                        continue
+                    results[key] = stats
+                    report(f"{key:<48} {format_time(stats['median']):>10} median  "
+                           f"{format_time(stats['min']):>10} min  +-{format_time(stats['stdev'])}")
+        finally:
+            if hasattr(module, "teardown"):
+                module.teardown(fixture)
+    return results
+
+
+def format_time(seconds):
+    for unit, scale in (("s", 1.0), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.3g} {unit}"
+    return f"{seconds / 1e-9:.3g} ns"
+
+
+def compare(base, new, threshold=THRESHOLD, report=print):
+    """Print median ratios new/base; returns the names that regressed past `threshold`."""
+    regressed = []
+    report(f"{'benchmark':<48}{'base':>12}{'new':>12}{'ratio':>9}")
+    for key in sorted(set(base["benchmarks"]) | set(new["benchmarks"])):
+        a, b = base["benchmarks"].get(key, {}), new["benchmarks"].get(key, {})
+        if "median" not in a or "median" not in b:
+            report(f"{key:<48}{'-' if 'median' not in a else format_time(a['median']):>12}"
+                   f"{'-' if 'median' not in b else format_time(b['median']):>12}")
+            continue
+        ratio = b["median"] / a["median"]
+        flag = "  REGRESSED" if ratio > threshold else ("  improved" if ratio < 1 / threshold else "")
+        if ratio > threshold:
+            regressed.append(key)
+        report(f"{key:<48}{format_time(a['median']):>12}{format_time(b['median']):>12}{ratio:>8.2f}x{flag}")
+    if base.get("machine") != new.get("machine"):
+        report("note: the two results come from different machines or interpreters")
+    return regressed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the LightCommander benchmark suite.")
+    parser.add_argument("-k", dest="pattern", help="only benchmarks whose name contains this")
+    parser.add_argument("--quick", action="store_true", help=f"{QUICK_REPEAT} samples instead of {REPEAT}")
+    parser.add_argument("--out", help="results file (default test/bench/results/<date>-<commit>.json)")
+    parser.add_argument("--compare", nargs="+", metavar="RESULT", help="BASE [NEW]: compare results")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD, help="median ratio counted as a regression")
+    parser.add_argument("--list", action="store_true", help="list benchmarks and exit")
+    args = parser.parse_args(argv)
+
+    os.chdir(ROOT)
+    for path in (ROOT, BENCH_DIR):  # the app's packages, and data.py for the bench modules
+        if path not in sys.path:
+            sys.path.insert(0, path)
+
+    if args.list:
+        for module_name, path in discover():
+            for name, _, params in benchmarks(load(module_name, path)):
+                print(f"{module_name}.{name}" + (f" {params}" if params else ""))
+        return 0
+
+    if args.compare and len(args.compare) > 1:
+        with open(args.compare[0], encoding="utf-8") as f:
+            base = json.load(f)
+        with open(args.compare[1], encoding="utf-8") as f:
+            new = json.load(f)
+        return 1 if compare(base, new, args.threshold) else 0
+
+    head, dirty = commit()
+    started = datetime.datetime.now()
+    results = run(args.pattern, QUICK_REPEAT if args.quick else REPEAT)
+    document = {"version": 1, "commit": head, "dirty": dirty, "date": started.isoformat(timespec="seconds"),
+                "machine": machine(), "benchmarks": results}
+    out = args.out or os.path.join(RESULTS_DIR, f"{started:%Y%m%d-%H%M%S}-{head[:8] or 'nogit'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(document, f, indent=4)
+    print(f"\nsaved {out}")
+
+    if args.compare:
+        with open(args.compare[0], encoding="utf-8") as f:
+            base = json.load(f)
+        print()
+        return 1 if compare(base, document, args.threshold) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
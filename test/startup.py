@@ -0,0 +1,68 @@
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+# Cold start benchmark for LightCommander.py.
+# Runs the app N times with --exit-after-start and collects the `[t] text` markers printed
+# by modules.term, then reports each phase (time since the previous marker).
+#
+#   python test/startup.py [runs] [out.json] [--app-flags ...]
+# e.g. `--raw-qss` to compare against applying the unprocessed stylesheet.
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+MARKER = re.compile(r"^\[(\d+(?:\.\d+)?)\] (.*)$")
+SPLASH_BUDGET = 0.2
+
+
+def run_once(extra=()):
+    env = dict(os.environ)
+    env.setdefault("QT_QPA_PLATFORM", "offscreen")
+    out = subprocess.run([sys.executable, "LightCommander.py", "--exit-after-start", "--no-prewarm", *extra],
+                         cwd=ROOT, env=env, capture_output=True, text=True, timeout=120).stdout
+    markers = []
+    for line in out.splitlines():
+        m = MARKER.match(line.strip())
+        if m:
+            markers.append((m.group(2), float(m.group(1))))
+    return markers
+
+
+def phases(markers):
+    result = []
+    last = 0.0
+    for text, t in markers:
+        result.append((text, t, t - last))
+        last = t
+    return result
+
+
+if __name__ == "__main__":
+    flags = [a for a in sys.argv[1:] if a.startswith("--")]
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    runs = int(args[0]) if args else 5
+    results = [phases(run_once(flags)) for _ in range(runs)]
+    if not results or not results[0]:
+        print("no markers captured")
+        sys.exit(1)
+
+    names = [text for text, _, _ in results[0]]
+    report = {}
+    print(f"{'phase':<40}{'at (med)':>12}{'took (med)':>12}{'took (max)':>12}")
+    for i, name in enumerate(names):
+        at = [r[i][1] for r in results if len(r) > i]
+        took = [r[i][2] for r in results if len(r) > i]
+        report[name] = {"at": statistics.median(at), "took": statistics.median(took), "took_max": max(took)}
+        print(f"{name[:39]:<40}{report[name]['at'] * 1000:>10.1f}ms{report[name]['took'] * 1000:>10.1f}ms"
+              f"{max(took) * 1000:>10.1f}ms")
+
+    if "splash ok" in report:
+        splash = report["splash ok"]["at"]
+        print(f"\nsplash shown at {splash * 1000:.1f} ms ({'ok' if splash < SPLASH_BUDGET else 'OVER'} "
+              f"{SPLASH_BUDGET * 1000:.0f} ms budget)")
+
+    if len(args) > 1:
+        with open(args[1], "w", encoding="utf-8") as f:
+            json.dump({"runs": runs, "flags": flags, "phases": report}, f, indent=4)
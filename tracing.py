@@ -0,0 +1,232 @@
+"""
+Low-overhead trace recording for LightCommander.
+
+Spans, counters and marks go into a preallocated ring buffer with perf_counter_ns
+timestamps and can be dumped as Chrome trace-event JSON (chrome://tracing, Perfetto).
+While disabled, span() hands back a shared no-op context manager and counter() returns
+straight away, so instrumentation can stay in hot paths.
+
+Marks (mark()) are also passed to the sinks, which is how modules.term prints its
+`[t] text` lines whether or not recording is on.
+"""
+
+import itertools
+import json
+import os
+import threading
+from array import array
+from time import perf_counter_ns
+
+DEFAULT_CAPACITY = 1 << 16
+
+SPAN = 0
+COUNTER = 1
+MARK = 2
+
+_enabled = False
+_names = []
+_ids = {}
+_sinks = []
+_start_ns = perf_counter_ns()
+
+
+##########################
+# RING BUFFER
+##########################
+
+class _Ring:
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.ts = array("q", bytes(8 * capacity))
+        self.dur = array("q", bytes(8 * capacity))
+        self.value = array("d", bytes(8 * capacity))
+        self.name = array("i", bytes(4 * capacity))
+        self.kind = array("b", bytes(capacity))
+        self.tid = array("q", bytes(8 * capacity))
+        self.text = [None] * capacity
+        self.next = itertools.count().__next__  # atomic under the GIL
+        self.written = 0
+
+    def push(self, kind, name, ts, dur=0, value=0.0, text=None):
+        n = self.next()
+        i = n % self.capacity
+        self.ts[i] = ts
+        self.dur[i] = dur
+        self.value[i] = value
+        self.name[i] = name
+        self.kind[i] = kind
+        self.tid[i] = threading.get_ident()
+        self.text[i] = text
+        self.written = n + 1
+
+    def events(self):
+        """Recorded slots, oldest first."""
+        n = self.written
+        first = max(0, n - self.capacity)
+        return [i % self.capacity for i in range(first, n)]
+
+
+_ring = _Ring(DEFAULT_CAPACITY)
+
+
+def _name_id(name):
+    nid = _ids.get(name)
+    if nid is None:
+        nid = _ids[name] = len(_names)
+        _names.append(name)
+    return nid
+
+
+##########################
+# CONTROL
+##########################
+
+def enable(capacity=DEFAULT_CAPACITY):
+    """Start recording into a fresh ring of `capacity` events."""
+    global _enabled, _ring
+    if capacity != _ring.capacity or _ring.written:
+        _ring = _Ring(capacity)
+    _enabled = True
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def enabled():
+    return _enabled
+
+
+def add_sink(sink):
+    """`sink(seconds_since_start, text)` is called for every mark()."""
+    if sink not in _sinks:
+        _sinks.append(sink)
+
+
+def remove_sink(sink):
+    if sink in _sinks:
+        _sinks.remove(sink)
+
+
+##########################
+# RECORDING
+##########################
+
+class _Span:
+    __slots__ = ("nid", "t0")
+
+    def __init__(self, nid):
+        self.nid = nid
+
+    def __enter__(self):
+        self.t0 = perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        t1 = perf_counter_ns()
+        _ring.push(SPAN, self.nid, self.t0, t1 - self.t0)
+        return False
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+def span(name):
+    """`with tracing.span("compile"): ...` records the block's duration."""
+    if not _enabled:
+        return _NO_SPAN
+    return _Span(_name_id(name))
+
+
+def complete(name, t0_ns, t1_ns=None):
+    """Record a span measured by the caller with perf_counter_ns()."""
+    if not _enabled:
+        return
+    if t1_ns is None:
+        t1_ns = perf_counter_ns()
+    _ring.push(SPAN, _name_id(name), t0_ns, t1_ns - t0_ns)
+
+
+def counter(name, value):
+    if not _enabled:
+        return
+    _ring.push(COUNTER, _name_id(name), perf_counter_ns(), 0, value)
+
+
+def mark(text, name="mark", seconds=None):
+    """Record an instant event and pass `text` to the sinks."""
+    now = perf_counter_ns()
+    if _enabled:
+        _ring.push(MARK, _name_id(name), now, 0, 0.0, text)
+    if _sinks:
+        if seconds is None:
+            seconds = round((now - _start_ns) / 1e9, 3)
+        for sink in _sinks:
+            sink(seconds, text)
+
+
+def traced(name=None):
+    """Decorator form of span()."""
+    def wrap(fn):
+        label = name or fn.__qualname__
+
+        def inner(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            with _Span(_name_id(label)):
+                return fn(*args, **kwargs)
+
+        inner.__name__ = fn.__name__
+        inner.__doc__ = fn.__doc__
+        inner.__wrapped__ = fn
+        return inner
+    return wrap
+
+
+##########################
+# EXPORT
+##########################
+
+def events():
+    """Recorded events as dicts, oldest first."""
+    r = _ring
+    out = []
+    for i in r.events():
+        out.append({"kind": r.kind[i], "name": _names[r.name[i]], "ts": r.ts[i], "dur": r.dur[i],
+                    "value": r.value[i], "tid": r.tid[i], "text": r.text[i]})
+    return out
+
+
+def chrome_trace():
+    """The recorded events as a Chrome trace-event dict (timestamps in microseconds)."""
+    pid = os.getpid()
+    trace = []
+    for e in events():
+        ts = (e["ts"] - _start_ns) / 1000.0
+        if e["kind"] == SPAN:
+            trace.append({"name": e["name"], "ph": "X", "ts": ts, "dur": e["dur"] / 1000.0,
+                          "pid": pid, "tid": e["tid"]})
+        elif e["kind"] == COUNTER:
+            trace.append({"name": e["name"], "ph": "C", "ts": ts, "pid": pid, "tid": e["tid"],
+                          "args": {"value": e["value"]}})
+        else:
+            trace.append({"name": e["text"] or e["name"], "ph": "i", "s": "g", "ts": ts,
+                          "pid": pid, "tid": e["tid"], "args": {"category": e["name"]}})
+    return {"traceEvents": trace, "displayTimeUnit": "ms"}
+
+
+def dump_chrome(path):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(chrome_trace(), f)
+    return path